@@ -1 +1 @@
-from . import config, logger, db, processor, schemas, locks, cleaner
\ No newline at end of file
+from . import config, logger, db, processor, schemas, locks, cleaner, cpu_pool, embed_cache, extract, tokens, lanes, watcher, job_queue, jobs, metrics
\ No newline at end of file
@@ -1,43 +1,136 @@
+import os
+import time
+import asyncio
+import threading
 import requests
 from pathlib import Path
-from fastapi import FastAPI, BackgroundTasks
+from fastapi import FastAPI, BackgroundTasks, HTTPException, Response
 from .logger import setup_logging
-from .config import SCHEDULE_MINUTES, UPLOADS_DIR, QDRANT_COLLECTION, QDRANT_VECTOR_SIZE, OLLAMA_EMBED_MODEL, TIKA_URL, OLLAMA_EMBED_MODEL
+from .config import (
+    NLTK_PRELOAD, SCHEDULE_MINUTES, UPLOADS_DIR, QDRANT_COLLECTION, QDRANT_VECTOR_SIZE, QDRANT_DISTANCE,
+    INGEST_TARGETS, TIKA_URL, ADAPTIVE_CONCURRENCY, WATCH_ENABLED, WATCH_INITIAL_SCAN, QUEUE_ENABLED, CHUNK_MODE
+)
 from .schemas import IngestRequest
-from .db import ensure_processed_table, get_db_conn
-from .scheduler import start_scheduler
-from .locks import guarded_process_all, guarded_process_all_for_paths
-from .clients.qdrant_client import create_collection
-from .clients.ollama_client import embed_text, ensure_ollama_model
+from .db import ensure_processed_table, migrate_db, db_conn, close_pool
+from .scheduler import start_scheduler, stop_scheduler
+from .watcher import start_watcher, stop_watcher, watcher_stats
+from .job_queue import (
+    enqueue_paths, enqueue_all, start_queue_workers, stop_queue_workers, queue_stats,
+    new_job_id, queue_job_snapshot, queue_jobs
+)
+from .jobs import create_job, get_job, list_jobs
+from .processor import resolve_targets
+from .cpu_pool import warm_pool, shutdown_pool, lemma_stats
+from .cleaner import preload as preload_cleaner
+from .embed_cache import cache_stats as embed_cache_stats
+from .extract import extract_stats
+from .tokens import token_stats
+from .lanes import lane_stats
+from .locks import guarded_process_all, guarded_process_all_for_paths, aguarded_process_all, aguarded_process_all_for_paths
+from .clients.qdrant_client import create_collection, storage_settings
+from .clients.ollama_client import embed_text, ensure_ollama_model, calibrate_tokens
+from .clients.adaptive import limiter_stats
+from .metrics import render as render_metrics
+
+_import_started = time.perf_counter()
 
 log = setup_logging()
 app = FastAPI(title="Ingest Service")
 
+# Startup timings in seconds, reported by /health
+startup_stats = {}
+
+# (model, collection) targets whose model is available and whose collection exists
+_ready_targets = set()
+_ready_lock = threading.Lock()
+
+def _preload_cleaner():
+    t0 = time.perf_counter()
+    try:
+        preload_cleaner()
+        startup_stats["nltk_preload_seconds"] = round(time.perf_counter() - t0, 3)
+    except Exception:
+        log.exception("NLTK preload failed; resources will be loaded on first use")
+
+def _warm_pool():
+    t0 = time.perf_counter()
+    try:
+        warm_pool()
+        startup_stats["pool_warm_seconds"] = round(time.perf_counter() - t0, 3)
+    except Exception:
+        log.exception("Warming the cleaning pool failed; workers start on first use")
+
+def ensure_targets(targets):
+    """
+    Pull each target's model if needed and create its collection with the model's vector size.
+    """
+    with _ready_lock:
+        for model, collection in targets:
+            if (model, collection) in _ready_targets:
+                continue
+            ensure_ollama_model(model)
+
+            vector_size = QDRANT_VECTOR_SIZE
+
+            try:
+                log.info(f"Inferring vector size of {model} by calling embed on sample text...")
+                vector_size = len(embed_text("test", model=model))
+                log.info(f"Inferred vector size: {vector_size}")
+            except Exception as e:
+                log.exception("Failed to infer vector size from Ollama. Falling back to default.")
+                vector_size = QDRANT_VECTOR_SIZE
+
+            create_collection(collection, vector_size=vector_size, distance=QDRANT_DISTANCE)
+            if CHUNK_MODE == "tokens":
+                calibrate_tokens(model)
+            _ready_targets.add((model, collection))
+
 @app.on_event("startup")
 def startup():
-    ensure_ollama_model(OLLAMA_EMBED_MODEL)
-    
-    vector_size = QDRANT_VECTOR_SIZE
+    t0 = time.perf_counter()
+    if NLTK_PRELOAD:
+        # loads from local disk in the background; first use blocks until it is done
+        threading.Thread(target=_preload_cleaner, name="nltk-preload", daemon=True).start()
 
-    try:
-        log.info("Inferring vector size by calling embed on sample text...")
-        vector_size = len(embed_text("test", model=OLLAMA_EMBED_MODEL))
-        log.info(f"Inferred vector size: {vector_size}")
-    except Exception as e:
-        log.exception("Failed to infer vector size from Ollama. Falling back to default.")
-        vector_size = QDRANT_VECTOR_SIZE
-
-    create_collection(QDRANT_COLLECTION, vector_size=vector_size, distance="Cosine")
-    ensure_processed_table()
+    ensure_targets(INGEST_TARGETS)
+    migrate_db()
+    # workers load NLTK in the background; the first documents wait for them if needed
+    threading.Thread(target=_warm_pool, name="pool-warm", daemon=True).start()
+    if QUEUE_ENABLED:
+        # files are queued here and ingested by the queue workers of every replica
+        start_queue_workers()
+        scan_all, ingest_paths = enqueue_all, enqueue_paths
+    else:
+        scan_all, ingest_paths = guarded_process_all, guarded_process_all_for_paths
     if SCHEDULE_MINUTES and SCHEDULE_MINUTES > 0:
-        start_scheduler(lambda: guarded_process_all(UPLOADS_DIR), SCHEDULE_MINUTES)
+        start_scheduler(lambda: scan_all(UPLOADS_DIR), SCHEDULE_MINUTES)
+    if WATCH_ENABLED:
+        start_watcher(UPLOADS_DIR, ingest_paths)
+        if WATCH_INITIAL_SCAN:
+            threading.Thread(target=scan_all, args=(UPLOADS_DIR,), name="initial-scan", daemon=True).start()
+
+    now = time.perf_counter()
+    startup_stats["startup_seconds"] = round(now - t0, 3)
+    startup_stats["import_to_ready_seconds"] = round(now - _import_started, 3)
+    log.info(f"Startup finished in {startup_stats['startup_seconds']}s "
+             f"({startup_stats['import_to_ready_seconds']}s since import)")
+
+@app.on_event("shutdown")
+def shutdown():
+    stop_watcher()
+    stop_scheduler()
+    stop_queue_workers()
+    shutdown_pool()
+    close_pool()
 
 @app.get("/health") 
 def health(): 
     # basic health info: DB connectivity and Tika reachable 
     try: 
-        conn = get_db_conn() 
-        conn.close() 
+        with db_conn() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT 1;")
+            cur.close()
         db_ok = True 
     except Exception as e: 
         db_ok = False 
@@ -49,28 +142,79 @@ def health():
     except Exception: 
         tika_ok = False 
     
-    return {"status": "ok" if db_ok and tika_ok else "degraded", "db": db_ok, "tika": tika_ok}
+    return {"status": "ok" if db_ok and tika_ok else "degraded", "db": db_ok, "tika": tika_ok,
+            "startup": startup_stats, "embed_cache": embed_cache_stats(), "extract": extract_stats(),
+            "chunking": token_stats(), "lemma_cache": lemma_stats(), "lanes": lane_stats(), "watcher": watcher_stats(),
+            "queue": queue_stats() if QUEUE_ENABLED else None,
+            "qdrant": {"distance": QDRANT_DISTANCE, **storage_settings()},
+            "targets": [{"model": m, "collection": c} for m, c in INGEST_TARGETS]}
+
+@app.get("/backends")
+def backends():
+    # current in-flight limits and observed latency/error rates per backend
+    return {"adaptive": ADAPTIVE_CONCURRENCY, "backends": limiter_stats()}
+
+@app.get("/metrics")
+def metrics():
+    rendered = render_metrics()
+    if rendered is None:
+        raise HTTPException(status_code=404, detail="metrics are disabled")
+    body, content_type = rendered
+    return Response(content=body, headers={"Content-Type": content_type})
 
 @app.post("/ingest")
-def ingest(req: IngestRequest = None, background_tasks: BackgroundTasks = None):
+async def ingest(req: IngestRequest = None, background_tasks: BackgroundTasks = None):
+    # async endpoint: ingestion awaits the async clients instead of holding a threadpool worker
     req = req or IngestRequest()
-    model_to_use = req.model_id or OLLAMA_EMBED_MODEL
+    # explicit targets, else model_id into QDRANT_COLLECTION, else INGEST_TARGETS
+    targets = resolve_targets(req.model_id, [(t.model_id, t.collection or QDRANT_COLLECTION) for t in req.targets or []])
+    await asyncio.to_thread(ensure_targets, targets)
+    target_label = ", ".join(f"{m}@{c}" for m, c in targets)
 
     if req.paths:
         paths = [Path(p if os.path.isabs(p) else UPLOADS_DIR / p) for p in req.paths]
-        def run_paths():
-            ensure_processed_table()
+        if QUEUE_ENABLED and not req.sync:
+            return await asyncio.to_thread(enqueue_paths, paths, None, new_job_id(), targets)
+
+        job = create_job("paths", target_label)
+        async def run_paths():
+            await asyncio.to_thread(ensure_processed_table)
             # If want locking even for partial paths, we can still use guarded wrapper:
-            return guarded_process_all_for_paths(paths, embed_model=model_to_use)
+            return await job.arun(aguarded_process_all_for_paths(paths, tracker=job, targets=targets))
 
         if req.sync:
-            return run_paths()
+            return await run_paths()
         else:
             background_tasks.add_task(run_paths)
-            return {"status": "accepted", "message": "ingest started in background for specified paths"}
+            return {"status": "accepted", "job_id": job.id,
+                    "message": "ingest started in background for specified paths"}
+
+    if QUEUE_ENABLED and not req.sync:
+        return await asyncio.to_thread(enqueue_all, UPLOADS_DIR, None, new_job_id(), targets)
+
+    job = create_job("all", target_label)
+    async def run_all():
+        return await job.arun(aguarded_process_all(UPLOADS_DIR, tracker=job, targets=targets))
 
     if req.sync:
-        return guarded_process_all(UPLOADS_DIR, embed_model=model_to_use)
+        return await run_all()
     else:
-        background_tasks.add_task(guarded_process_all, UPLOADS_DIR, model_to_use)
-        return {"status": "accepted", "message": "ingest started in background (processing all files)"}
\ No newline at end of file
+        background_tasks.add_task(run_all)
+        return {"status": "accepted", "job_id": job.id,
+                "message": "ingest started in background (processing all files)"}
+
+@app.get("/jobs")
+def jobs():
+    # in-process jobs of this replica, plus queued jobs of every replica
+    return {"jobs": [j.snapshot() for j in list_jobs()],
+            "queued_jobs": queue_jobs() if QUEUE_ENABLED else []}
+
+@app.get("/jobs/{job_id}")
+def job_status(job_id: str, files: bool = False):
+    job = get_job(job_id)
+    if job is not None:
+        return job.snapshot(files=files)
+    snap = queue_job_snapshot(job_id, files=files) if QUEUE_ENABLED else None
+    if snap is None:
+        raise HTTPException(status_code=404, detail="job not found")
+    return snap
@@ -1,35 +1,50 @@
-from typing import List
+import re
+from typing import Iterator, List, Tuple
+
+_BREAKS = (". ", "? ", "! ", "\n\n")
+_NEWLINE_RUN_RE = re.compile(r"(?:\r?\n)+")
+
+def _collapse_newlines(m: "re.Match") -> str:
+    # \r\n -> \n, then runs of 3+ newlines -> exactly 2
+    n = m.group().count("\n")
+    return "\n\n" if n >= 3 else "\n" * n
+
+def normalize_text(raw: str) -> str:
+    """
+    Normalize line endings and collapse runs of blank lines in a single pass.
+    """
+    return _NEWLINE_RUN_RE.sub(_collapse_newlines, raw).strip()
 
 def _find_safe_break(s: str, start: int, end: int, max_chars: int) -> int:
-    slice_ = s[start:end]
-    idx = max(
-        slice_.rfind(". "),
-        slice_.rfind("? "),
-        slice_.rfind("! "),
-        slice_.rfind("\n\n"),
-    )
-    if idx > int(max_chars * 0.3):
-        return start + idx + 1
+    # Only breaks past 30% of the window are accepted, so only scan that part
+    # of s in place instead of copying the window.
+    lo = start + int(max_chars * 0.3) + 1
+    idx = max(s.rfind(b, lo, end) for b in _BREAKS)
+    if idx >= lo:
+        return idx + 1
     return end
 
-def chunk_text(raw: str, max_chars: int, overlap: int) -> List[str]:
-    text = raw.replace("\r\n", "\n")
-    while "\n\n\n" in text:
-        text = text.replace("\n\n\n", "\n\n")
-    text = text.strip()
-    if not text:
-        return []
-    chunks: List[str] = []
+def iter_chunks(raw: str, max_chars: int, overlap: int) -> Iterator[Tuple[int, str]]:
+    """
+    Split text into overlapping chunks, preferring sentence/paragraph breaks.
+    Yields (offset, chunk) as it goes, where offset is the position of the chunk
+    in the normalized text.
+    """
+    text = normalize_text(raw)
     start = 0
     L = len(text)
     while start < L:
         end = min(start + max_chars, L)
         if end < L:
             end = _find_safe_break(text, start, end, max_chars)
-        chunk = text[start:end].strip()
+        seg = text[start:end]
+        lstripped = seg.lstrip()
+        chunk = lstripped.rstrip()
         if chunk:
-            chunks.append(chunk)
+            yield start + len(seg) - len(lstripped), chunk
         start = max(0, end - overlap)
         if end == L:
             break
-    return chunks
\ No newline at end of file
+
+def chunk_text(raw: str, max_chars: int, overlap: int) -> List[str]:
+    return [chunk for _, chunk in iter_chunks(raw, max_chars, overlap)]
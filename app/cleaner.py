@@ -1,57 +1,152 @@
 import re
 import ftfy
+import threading
 import unicodedata
 import nltk
+from functools import lru_cache
+from typing import Dict, Optional
 from nltk.corpus import stopwords
 from nltk.stem import WordNetLemmatizer
+from .config import LEMMA_CACHE_SIZE, NLTK_DATA_DIR, NLTK_DOWNLOAD_MISSING
+from .logger import setup_logging
 
-nltk.download('punkt')
-nltk.download('punkt_tab')
-nltk.download('stopwords')
-nltk.download('wordnet')
+log = setup_logging()
+
+# (ruta dentro de nltk_data, paquete de nltk.download)
+NLTK_RESOURCES = [
+    ("tokenizers/punkt", "punkt"),
+    ("tokenizers/punkt_tab", "punkt_tab"),
+    ("corpora/stopwords", "stopwords"),
+    ("corpora/wordnet", "wordnet"),
+]
+
+_nltk_ready = False
+_nltk_lock = threading.Lock()
+
+def ensure_nltk_data():
+    """
+    Verifica (una sola vez por proceso) que los recursos de NLTK estén disponibles
+    en NLTK_DATA_DIR o en las rutas por defecto. Solo descarga lo que falte, y
+    únicamente si NLTK_DOWNLOAD_MISSING está activo; en nodos sin red falla con
+    un LookupError claro en lugar de quedarse esperando.
+    """
+    global _nltk_ready
+    if _nltk_ready:
+        return
+    with _nltk_lock:
+        if _nltk_ready:
+            return
+        if NLTK_DATA_DIR and NLTK_DATA_DIR not in nltk.data.path:
+            nltk.data.path.insert(0, NLTK_DATA_DIR)
+        for resource, package in NLTK_RESOURCES:
+            try:
+                nltk.data.find(resource)
+            except LookupError:
+                if not NLTK_DOWNLOAD_MISSING:
+                    raise LookupError(
+                        f"NLTK resource '{package}' not found in {nltk.data.path} and NLTK_DOWNLOAD_MISSING is off"
+                    )
+                log.info(f"Downloading missing NLTK resource '{package}'")
+                nltk.download(package, download_dir=NLTK_DATA_DIR, quiet=True)
+                try:
+                    nltk.data.find(resource)
+                except LookupError:
+                    raise LookupError(f"NLTK resource '{package}' could not be downloaded to {NLTK_DATA_DIR}")
+        _nltk_ready = True
 
-stop_words_es = set(stopwords.words('spanish'))
 lemmatizer = WordNetLemmatizer()
 
-def clean_text(s: str) -> str:
+class TextCleaner:
     """
-    Normaliza, limpia y sanitiza texto jurídico.
-    Incluye normalización Unicode, corrección, lowercasing,
-    eliminación de stopwords y lematización.
+    Limpiador reutilizable de texto jurídico.
+    Compila las expresiones regulares una sola vez, comparte el conjunto de
+    stopwords y memoriza la lematización por token en una caché LRU acotada.
     """
-    # Normalización y corrección Unicode
-    s = unicodedata.normalize("NFC", s)
-    s = ftfy.fix_text(s)
 
-    # Convertir a minúsculas
-    s = s.lower()
+    _ws_re = re.compile(r"[^\S\r\n\t]+")
+    _ctrl_re = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f\x7f]+")
+    _url_re = re.compile(r'http\S+|www.\S+')
+    _newlines_re = re.compile(r"\n{3,}")
+
+    def __init__(self, stop_words: Optional[frozenset] = None, lemma_cache_size: int = LEMMA_CACHE_SIZE):
+        self._stop_words = stop_words
+        self.lemmatizer = lemmatizer
+        self._lemmatize = lru_cache(maxsize=lemma_cache_size)(self.lemmatizer.lemmatize)
+
+    @property
+    def stop_words(self) -> frozenset:
+        # Carga perezosa: el corpus se lee en el primer uso, no al importar el módulo
+        if self._stop_words is None:
+            ensure_nltk_data()
+            self._stop_words = frozenset(stopwords.words('spanish'))
+        return self._stop_words
+
+    def preload(self):
+        """
+        Carga corpus, stopwords, tokenizador y WordNet por adelantado.
+        """
+        ensure_nltk_data()
+        _ = self.stop_words
+        nltk.word_tokenize("precarga")
+        self.lemmatizer.lemmatize("precarga")
+
+    def lemma_cache_stats(self) -> Dict[str, int]:
+        info = self._lemmatize.cache_info()
+        return {"hits": info.hits, "misses": info.misses, "size": info.currsize, "maxsize": info.maxsize}
+
+    def clean(self, s: str) -> str:
+        """
+        Normaliza, limpia y sanitiza texto jurídico.
+        Incluye normalización Unicode, corrección, lowercasing,
+        eliminación de stopwords y lematización.
+        """
+        # Normalización y corrección Unicode
+        s = unicodedata.normalize("NFC", s)
+        s = ftfy.fix_text(s)
 
-    # Colapsar espacios y eliminar caracteres de control
-    s = re.sub(r"[^\S\r\n\t]+", " ", s)
-    s = re.sub(r"[\x00-\x08\x0b\x0c\x0e-\x1f\x7f]+", "", s)
+        # Convertir a minúsculas
+        s = s.lower()
 
-    # Eliminar URLs y cualquier cosa que se parezca a una URL
-    s = re.sub(r'http\S+|www.\S+', '', s)
+        # Colapsar espacios y eliminar caracteres de control
+        s = self._ws_re.sub(" ", s)
+        s = self._ctrl_re.sub("", s)
 
-    # Tokenizar para lematización y eliminación de stopwords
-    tokens = nltk.word_tokenize(s)
-    
-    # Eliminar stopwords
-    # Es crucial usar una lista de stopwords apropiada para español
-    stop_words_es = set(stopwords.words('spanish'))
-    filtered_tokens = [word for word in tokens if word not in stop_words_es]
+        # Eliminar URLs y cualquier cosa que se parezca a una URL
+        s = self._url_re.sub('', s)
 
-    # Lematización
-    # Para textos jurídicos, la lematización es útil pero a veces puede ser
-    # demasiado agresiva. Se puede usar stemming como alternativa si es necesario
-    # nltk.stem.snowball.SpanishStemmer().stem()
-    lemmatizer = WordNetLemmatizer()
-    lemmas = [lemmatizer.lemmatize(word) for word in filtered_tokens]
+        # Tokenizar para lematización y eliminación de stopwords
+        ensure_nltk_data()
+        tokens = nltk.word_tokenize(s)
 
-    # Reconstruir la cadena
-    s = ' '.join(lemmas)
+        # Eliminar stopwords y lematizar
+        # Para textos jurídicos, la lematización es útil pero a veces puede ser
+        # demasiado agresiva. Se puede usar stemming como alternativa si es necesario
+        # nltk.stem.snowball.SpanishStemmer().stem()
+        stop_words = self.stop_words
+        lemmatize = self._lemmatize
+        lemmas = [lemmatize(word) for word in tokens if word not in stop_words]
 
-    # Normalizar múltiples saltos de línea a un máximo de 2
-    s = re.sub(r"\n{3,}", "\n\n", s)
+        # Reconstruir la cadena
+        s = ' '.join(lemmas)
+
+        # Normalizar múltiples saltos de línea a un máximo de 2
+        s = self._newlines_re.sub("\n\n", s)
+
+        return s.strip()
+
+default_cleaner = TextCleaner()
+
+def clean_text(s: str) -> str:
+    """
+    Normaliza, limpia y sanitiza texto jurídico con el limpiador compartido.
+    """
+    return default_cleaner.clean(s)
+
+def preload():
+    """
+    Hook de arranque: deja listos los recursos de NLTK del limpiador compartido.
+    """
+    default_cleaner.preload()
 
-    return s.strip()
\ No newline at end of file
+def lemma_cache_stats() -> Dict[str, int]:
+    return default_cleaner.lemma_cache_stats()
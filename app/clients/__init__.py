@@ -1 +1 @@
-from . import http_client, tika_client, ollama_client, qdrant_client
\ No newline at end of file
+from . import http_client, async_http_client, adaptive, tika_client, ollama_client, qdrant_client
\ No newline at end of file
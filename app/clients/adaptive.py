@@ -0,0 +1,173 @@
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Dict, Iterator, AsyncIterator, List, Optional, Tuple
+from ..metrics import BACKEND_SECONDS, BACKEND_ERRORS
+
+class Slot:
+    """
+    Handle for one in-flight request; set error=True to count it as a failure
+    even when no exception escapes (e.g. a 429/5xx returned after retries).
+    """
+    __slots__ = ("error",)
+
+    def __init__(self):
+        self.error = False
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limit for one backend, shared by threads and asyncio tasks.
+
+    Every completed request feeds its latency and outcome back. A request that
+    finishes under target_latency without error grows the limit by 1/limit
+    (about +1 per round of requests); an error or a slow request shrinks it by
+    decrease_factor, at most once per observed latency so one burst of slow
+    responses only counts once. The limit stays within [min_limit, max_limit].
+    With adaptive=False the limit stays at max_limit and only stats are kept.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_limit: int,
+        min_limit: int = 1,
+        initial: Optional[int] = None,
+        target_latency: float = 10.0,
+        decrease_factor: float = 0.7,
+        ewma_alpha: float = 0.2,
+        adaptive: bool = True,
+    ):
+        self.name = name
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.target_latency = target_latency
+        self.decrease_factor = decrease_factor
+        self.ewma_alpha = ewma_alpha
+        self.adaptive = adaptive
+        if not adaptive:
+            initial = self.max_limit
+        elif initial is None:
+            initial = max(self.min_limit, self.max_limit // 2)
+        self._limit = float(min(self.max_limit, max(self.min_limit, initial)))
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._async_waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+        self._latency_ewma: Optional[float] = None
+        self._error_ewma = 0.0
+        self._requests = 0
+        self._errors = 0
+        self._last_decrease = 0.0
+        self._latency_metric = BACKEND_SECONDS.labels(name)
+        self._error_metric = BACKEND_ERRORS.labels(name)
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    def _try_acquire_locked(self) -> bool:
+        if self._in_flight < int(self._limit):
+            self._in_flight += 1
+            return True
+        return False
+
+    def _wake_locked(self):
+        self._cond.notify_all()
+        for loop, fut in self._async_waiters:
+            loop.call_soon_threadsafe(_resolve, fut)
+        self._async_waiters = []
+
+    def acquire(self):
+        with self._cond:
+            while not self._try_acquire_locked():
+                self._cond.wait()
+
+    async def aacquire(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._lock:
+                if self._try_acquire_locked():
+                    return
+                fut = loop.create_future()
+                self._async_waiters.append((loop, fut))
+            try:
+                await fut
+            finally:
+                with self._lock:
+                    self._async_waiters = [(l, f) for l, f in self._async_waiters if f is not fut]
+
+    def release(self, latency: float, error: bool = False):
+        now = time.monotonic()
+        self._latency_metric.observe(latency)
+        if error:
+            self._error_metric.inc()
+        with self._lock:
+            self._in_flight -= 1
+            self._requests += 1
+            self._errors += int(error)
+            a = self.ewma_alpha
+            self._latency_ewma = latency if self._latency_ewma is None else (1 - a) * self._latency_ewma + a * latency
+            self._error_ewma = (1 - a) * self._error_ewma + a * (1.0 if error else 0.0)
+            if self.adaptive:
+                if error or latency > self.target_latency:
+                    if now - self._last_decrease >= latency:
+                        self._limit = max(float(self.min_limit), self._limit * self.decrease_factor)
+                        self._last_decrease = now
+                else:
+                    self._limit = min(float(self.max_limit), self._limit + 1.0 / self._limit)
+            self._wake_locked()
+
+    @contextmanager
+    def slot(self) -> Iterator[Slot]:
+        self.acquire()
+        s = Slot()
+        t0 = time.monotonic()
+        try:
+            yield s
+        except BaseException:
+            s.error = True
+            raise
+        finally:
+            self.release(time.monotonic() - t0, s.error)
+
+    @asynccontextmanager
+    async def aslot(self) -> AsyncIterator[Slot]:
+        await self.aacquire()
+        s = Slot()
+        t0 = time.monotonic()
+        try:
+            yield s
+        except BaseException:
+            s.error = True
+            raise
+        finally:
+            self.release(time.monotonic() - t0, s.error)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "limit": int(self._limit),
+                "in_flight": self._in_flight,
+                "min_limit": self.min_limit,
+                "max_limit": self.max_limit,
+                "adaptive": self.adaptive,
+                "target_latency_s": self.target_latency,
+                "latency_ewma_s": round(self._latency_ewma, 4) if self._latency_ewma is not None else None,
+                "error_rate_ewma": round(self._error_ewma, 4),
+                "requests": self._requests,
+                "errors": self._errors,
+            }
+
+def _resolve(fut: asyncio.Future):
+    if not fut.done():
+        fut.set_result(None)
+
+_limiters: Dict[str, AdaptiveLimiter] = {}
+
+def register_limiter(limiter: AdaptiveLimiter) -> AdaptiveLimiter:
+    _limiters[limiter.name] = limiter
+    return limiter
+
+def limiter_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: lim.snapshot() for name, lim in _limiters.items()}
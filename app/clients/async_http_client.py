@@ -0,0 +1,170 @@
+import asyncio
+import email.utils
+import time
+import weakref
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Optional, Tuple
+import httpx
+from .adaptive import AdaptiveLimiter
+from ..metrics import RETRIES
+
+DEFAULT_STATUS_FORCELIST: Tuple[int, ...] = (429, 500, 502, 503, 504)
+BACKOFF_MAX = 120.0
+
+ContentFactory = Callable[[], AsyncIterator[bytes]]
+
+def backoff_time(backoff_factor: float, consecutive_errors: int) -> float:
+    """
+    Same formula as urllib3's Retry: no sleep before the first retry, then
+    backoff_factor * 2 ** (n - 1), capped at BACKOFF_MAX.
+    """
+    if consecutive_errors <= 1:
+        return 0.0
+    return min(BACKOFF_MAX, backoff_factor * (2 ** (consecutive_errors - 1)))
+
+def retry_after_seconds(resp: httpx.Response) -> Optional[float]:
+    value = resp.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        parsed = email.utils.parsedate_tz(value)
+        if parsed is None:
+            return None
+        return max(0.0, email.utils.mktime_tz(parsed) - time.time())
+
+class AsyncBackend:
+    """
+    asyncio HTTP client for one backend (Tika, Ollama, Qdrant).
+
+    Each backend has its own connection pool (max_connections) and a cap on
+    in-flight requests enforced by its limiter: fixed at max_in_flight, unless an
+    adaptive limiter shared with the sync client is passed in. Retries follow
+    create_session: statuses in status_forcelist and transport errors are retried
+    up to `retries` times with urllib3's backoff formula, Retry-After is honored,
+    and once retries are exhausted the last response is returned instead of raised.
+
+    httpx clients are bound to an event loop, so one client is kept per loop.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_connections: int = 16,
+        max_in_flight: int = 8,
+        retries: int = 3,
+        backoff_factor: float = 0.5,
+        status_forcelist: Tuple[int, ...] = DEFAULT_STATUS_FORCELIST,
+        timeout: Tuple[int, int] = (5, 300),
+        limiter: Optional[AdaptiveLimiter] = None,
+    ):
+        self.name = name
+        self.max_connections = max_connections
+        self.max_in_flight = max_in_flight
+        self.limiter = limiter or AdaptiveLimiter(name, max_limit=max_in_flight, adaptive=False)
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.status_forcelist = status_forcelist
+        self.timeout = timeout
+        self._per_loop = weakref.WeakKeyDictionary()
+        self._retries_metric = RETRIES.labels(name)
+
+    def _client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        client = self._per_loop.get(loop)
+        if client is None:
+            connect_timeout, read_timeout = self.timeout
+            client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections),
+                timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            )
+            self._per_loop[loop] = client
+        return client
+
+    async def _send(self, client: httpx.AsyncClient, method: str, url: str, stream: bool,
+                    content_factory: Optional[ContentFactory], **kwargs) -> httpx.Response:
+        errors = 0
+        while True:
+            if content_factory is not None:
+                kwargs["content"] = content_factory()
+            request = client.build_request(method, url, **kwargs)
+            try:
+                resp = await client.send(request, stream=stream)
+            except httpx.TransportError:
+                errors += 1
+                if errors > self.retries:
+                    raise
+                self._retries_metric.inc()
+                await asyncio.sleep(backoff_time(self.backoff_factor, errors))
+                continue
+            if resp.status_code in self.status_forcelist and errors < self.retries:
+                errors += 1
+                self._retries_metric.inc()
+                delay = retry_after_seconds(resp)
+                await resp.aclose()
+                await asyncio.sleep(delay if delay is not None else backoff_time(self.backoff_factor, errors))
+                continue
+            return resp
+
+    async def request(self, method: str, url: str, content_factory: Optional[ContentFactory] = None,
+                      **kwargs) -> httpx.Response:
+        """
+        Send a request and read the whole response body.
+        Pass content_factory (instead of content) for streamed bodies that must be
+        re-created on each retry.
+        """
+        client = self._client()
+        async with self.limiter.aslot() as slot:
+            resp = await self._send(client, method, url, False, content_factory, **kwargs)
+            slot.error = resp.status_code in self.status_forcelist
+            return resp
+
+    @asynccontextmanager
+    async def stream(self, method: str, url: str, content_factory: Optional[ContentFactory] = None,
+                     **kwargs) -> AsyncIterator[httpx.Response]:
+        """
+        Send a request and yield a streaming response; the in-flight slot is held
+        until the body has been consumed and the context exits.
+        """
+        client = self._client()
+        async with self.limiter.aslot() as slot:
+            resp = await self._send(client, method, url, True, content_factory, **kwargs)
+            slot.error = resp.status_code in self.status_forcelist
+            try:
+                yield resp
+            finally:
+                await resp.aclose()
+
+    async def aclose(self):
+        """
+        Close the client of the running loop.
+        """
+        client = self._per_loop.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+def create_async_backend(
+    name: str,
+    max_connections: int,
+    max_in_flight: int,
+    retries: int = 3,
+    backoff_factor: float = 0.5,
+    status_forcelist: Tuple[int, ...] = DEFAULT_STATUS_FORCELIST,
+    timeout: Tuple[int, int] = (5, 300),
+    limiter: Optional[AdaptiveLimiter] = None,
+) -> AsyncBackend:
+    """
+    Async counterpart of create_session, with per-backend connection and in-flight limits.
+    """
+    return AsyncBackend(
+        name,
+        max_connections=max_connections,
+        max_in_flight=max_in_flight,
+        retries=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=status_forcelist,
+        timeout=timeout,
+        limiter=limiter,
+    )
@@ -1,20 +1,38 @@
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util import Retry
-from typing import Tuple
+from typing import Optional, Tuple
+from ..metrics import ENABLED as METRICS_ENABLED, RETRIES
+
+class _CountingRetry(Retry):
+    """
+    Retry that counts every retry in the ingest_http_retries metric.
+    The backend name is a class attribute so it survives Retry.new().
+    """
+    backend = "unknown"
+
+    def increment(self, *args, **kwargs):
+        new = super().increment(*args, **kwargs)
+        RETRIES.labels(self.backend).inc()
+        return new
 
 def create_session(
     retries: int = 3,
     backoff_factor: float = 0.5,
     status_forcelist: Tuple[int, ...] = (429, 500, 502, 503, 504),
     allowed_methods=None,
-    timeout: Tuple[int, int] = (5, 300)  # (connect_timeout, read_timeout)
+    timeout: Tuple[int, int] = (5, 300),  # (connect_timeout, read_timeout)
+    name: Optional[str] = None,
 ) -> Tuple[requests.Session, Tuple[int, int]]:
     """
     Creates a requests.Session with retry logic and a default timeout tuple.
+    Retries are counted per backend name when metrics are enabled.
     """
     session = requests.Session()
-    retry_strategy = Retry(
+    retry_cls = Retry
+    if name and METRICS_ENABLED:
+        retry_cls = type(f"CountingRetry_{name}", (_CountingRetry,), {"backend": name})
+    retry_strategy = retry_cls(
         total=retries,
         backoff_factor=backoff_factor,
         status_forcelist=status_forcelist,
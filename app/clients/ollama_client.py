@@ -1,19 +1,49 @@
-from typing import Any, List, Tuple
+import asyncio
+import re
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 import requests
 from .http_client import create_session
-from ..config import OLLAMA_URL, HTTP_RETRIES, HTTP_BACKOFF_FACTOR, CONNECT_TIMEOUT, READ_TIMEOUT
+from .async_http_client import create_async_backend
+from .adaptive import AdaptiveLimiter, register_limiter
+from ..metrics import STAGE_SECONDS, EMBED_REQUEST_SECONDS, EMBED_CHUNK_SECONDS, CHUNKS, RETRIES
+from .. import tokens
+from ..config import (
+    OLLAMA_URL, HTTP_RETRIES, HTTP_BACKOFF_FACTOR, CONNECT_TIMEOUT, READ_TIMEOUT,
+    EMBED_BATCH_SIZE, EMBED_BATCH_MAX_CHARS, OLLAMA_MAX_CONNECTIONS, OLLAMA_MAX_IN_FLIGHT,
+    OLLAMA_TARGET_LATENCY, ADAPTIVE_CONCURRENCY, ADAPTIVE_DECREASE_FACTOR
+)
 from ..logger import setup_logging
 
 log = setup_logging()
 session, timeout = create_session(
     retries=HTTP_RETRIES,
     backoff_factor=HTTP_BACKOFF_FACTOR,
-    timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)
+    timeout=(CONNECT_TIMEOUT, READ_TIMEOUT),
+    name="ollama",
+)
+# shared by the sync and async paths, so the limit covers all embed traffic of this process
+limiter = register_limiter(AdaptiveLimiter(
+    "ollama",
+    max_limit=OLLAMA_MAX_IN_FLIGHT,
+    target_latency=OLLAMA_TARGET_LATENCY,
+    decrease_factor=ADAPTIVE_DECREASE_FACTOR,
+    adaptive=ADAPTIVE_CONCURRENCY,
+))
+async_backend = create_async_backend(
+    "ollama",
+    max_connections=OLLAMA_MAX_CONNECTIONS,
+    max_in_flight=OLLAMA_MAX_IN_FLIGHT,
+    retries=HTTP_RETRIES,
+    backoff_factor=HTTP_BACKOFF_FACTOR,
+    timeout=(CONNECT_TIMEOUT, READ_TIMEOUT),
+    limiter=limiter,
 )
 
-def extract_embedding_from_ollama_response(ollama_res: Any) -> List[float]:
+def extract_embeddings_from_ollama_response(ollama_res: Any) -> List[List[float]]:
     """
-    Normalize different Ollama embedding response formats into a flat list of floats.
+    Normalize different Ollama embedding response formats into a list of vectors,
+    one per input, in input order.
     """
     resp_item = ollama_res[0] if isinstance(ollama_res, list) and len(ollama_res) > 0 else ollama_res
 
@@ -28,16 +58,23 @@ def extract_embedding_from_ollama_response(ollama_res: Any) -> List[float]:
             raise ValueError("No embeddings key found in Ollama response")
 
         if isinstance(embs, list) and len(embs) > 0 and isinstance(embs[0], list):
-            return embs[0]
-        if isinstance(embs, list):
             return embs
+        if isinstance(embs, list):
+            return [embs]
 
     if isinstance(ollama_res, list) and all(isinstance(x, (int, float)) for x in ollama_res):
-        return ollama_res
+        return [ollama_res]
 
     raise ValueError("Unrecognized embedding shape from Ollama")
 
 
+def extract_embedding_from_ollama_response(ollama_res: Any) -> List[float]:
+    """
+    Normalize an Ollama embedding response into a single flat list of floats.
+    """
+    return extract_embeddings_from_ollama_response(ollama_res)[0]
+
+
 def embed_text(text: str, model: str) -> List[float]:
     """
     Call Ollama's /api/embed to create embeddings for the given text.
@@ -45,9 +82,136 @@ def embed_text(text: str, model: str) -> List[float]:
     url = f"{OLLAMA_URL.rstrip('/')}/api/embed"
     payload = {"model": model, "input": text}
 
-    resp = session.post(url, json=payload, timeout=timeout)
-    resp.raise_for_status()
-    return extract_embedding_from_ollama_response(resp.json())
+    with limiter.slot():
+        resp = session.post(url, json=payload, timeout=timeout)
+        resp.raise_for_status()
+        return extract_embedding_from_ollama_response(resp.json())
+
+
+def iter_embed_batches(
+    texts: Iterable[str],
+    batch_size: int = EMBED_BATCH_SIZE,
+    max_chars: int = EMBED_BATCH_MAX_CHARS,
+) -> Iterator[Tuple[int, List[str]]]:
+    """
+    Group texts into batches bounded by item count and total characters.
+    Yields (offset, batch) where offset is the index of the batch's first text.
+    A single text longer than max_chars still gets a batch of its own.
+    """
+    batch: List[str] = []
+    batch_chars = 0
+    offset = 0
+    for text in texts:
+        if batch and (len(batch) >= batch_size or batch_chars + len(text) > max_chars):
+            yield offset, batch
+            offset += len(batch)
+            batch, batch_chars = [], 0
+        batch.append(text)
+        batch_chars += len(text)
+    if batch:
+        yield offset, batch
+
+
+def _observe_batch(model: str, batch: List[str], body: Any, seconds: float):
+    EMBED_REQUEST_SECONDS.observe(seconds)
+    EMBED_CHUNK_SECONDS.observe(seconds / len(batch))
+    STAGE_SECONDS.labels("embed").observe(seconds)
+    CHUNKS.labels("embedded").inc(len(batch))
+    if isinstance(body, dict):
+        # calibrates the chars-per-token estimate used for token-aware chunking
+        tokens.observe(model, sum(len(t) for t in batch), body.get("prompt_eval_count"), len(batch))
+
+def _embed_batch(batch: List[str], model: str) -> List[List[float]]:
+    """
+    Embed one batch with a single /api/embed call, retrying the whole batch on a
+    short or malformed response. Transport errors and HTTP error statuses are
+    raised as is: the session already retried them.
+    """
+    url = f"{OLLAMA_URL.rstrip('/')}/api/embed"
+    payload = {"model": model, "input": batch}
+    attempt = 0
+    while True:
+        try:
+            t0 = time.perf_counter()
+            with limiter.slot():
+                resp = session.post(url, json=payload, timeout=timeout)
+                resp.raise_for_status()
+                body = resp.json()
+                vectors = extract_embeddings_from_ollama_response(body)
+            if len(vectors) != len(batch):
+                raise ValueError(f"Ollama returned {len(vectors)} embeddings for {len(batch)} inputs")
+            _observe_batch(model, batch, body, time.perf_counter() - t0)
+            return vectors
+        except ValueError as e:
+            attempt += 1
+            if attempt > HTTP_RETRIES:
+                raise
+            RETRIES.labels("ollama").inc()
+            log.warning(f"Embedding batch of {len(batch)} failed ({e}); retry {attempt}/{HTTP_RETRIES}")
+            time.sleep(HTTP_BACKOFF_FACTOR * (2 ** (attempt - 1)))
+
+
+def embed_texts(
+    texts: Iterable[str],
+    model: str,
+    batch_size: int = EMBED_BATCH_SIZE,
+    max_chars: int = EMBED_BATCH_MAX_CHARS,
+) -> List[List[float]]:
+    """
+    Embed many texts using batched /api/embed calls.
+    Returns one vector per text, in the same order as the input.
+    """
+    vectors: List[List[float]] = []
+    for offset, batch in iter_embed_batches(texts, batch_size, max_chars):
+        batch_vectors = _embed_batch(batch, model)
+        vectors[offset:offset + len(batch)] = batch_vectors
+    return vectors
+
+
+async def _aembed_batch(batch: List[str], model: str) -> List[List[float]]:
+    """
+    Async _embed_batch: same whole-batch retry on short or malformed responses;
+    transport errors and HTTP statuses are retried by the async backend only.
+    """
+    url = f"{OLLAMA_URL.rstrip('/')}/api/embed"
+    payload = {"model": model, "input": batch}
+    attempt = 0
+    while True:
+        try:
+            t0 = time.perf_counter()
+            resp = await async_backend.request("POST", url, json=payload)
+            resp.raise_for_status()
+            body = resp.json()
+            vectors = extract_embeddings_from_ollama_response(body)
+            if len(vectors) != len(batch):
+                raise ValueError(f"Ollama returned {len(vectors)} embeddings for {len(batch)} inputs")
+            _observe_batch(model, batch, body, time.perf_counter() - t0)
+            return vectors
+        except ValueError as e:
+            attempt += 1
+            if attempt > HTTP_RETRIES:
+                raise
+            RETRIES.labels("ollama").inc()
+            log.warning(f"Embedding batch of {len(batch)} failed ({e}); retry {attempt}/{HTTP_RETRIES}")
+            await asyncio.sleep(HTTP_BACKOFF_FACTOR * (2 ** (attempt - 1)))
+
+
+async def aembed_texts(
+    texts: Iterable[str],
+    model: str,
+    batch_size: int = EMBED_BATCH_SIZE,
+    max_chars: int = EMBED_BATCH_MAX_CHARS,
+) -> List[List[float]]:
+    """
+    Async embed_texts: batches are sent concurrently (up to OLLAMA_MAX_IN_FLIGHT)
+    and the vectors are returned in input order.
+    """
+    batches = list(iter_embed_batches(texts, batch_size, max_chars))
+    results = await asyncio.gather(*(_aembed_batch(batch, model) for _, batch in batches))
+    vectors: List[List[float]] = []
+    for (offset, batch), batch_vectors in zip(batches, results):
+        vectors[offset:offset + len(batch)] = batch_vectors
+    return vectors
 
 
 def ensure_ollama_model(model: str):
@@ -73,4 +237,52 @@ def ensure_ollama_model(model: str):
         timeout=timeout,
     )
     resp.raise_for_status()
-    log.info(f"Ollama model '{model}' pull triggered successfully")
\ No newline at end of file
+    log.info(f"Ollama model '{model}' pull triggered successfully")
+
+
+def show_model(model: str) -> Dict[str, Any]:
+    """
+    Call Ollama's /api/show for a model's details, parameters and model_info.
+    """
+    resp = session.post(f"{OLLAMA_URL.rstrip('/')}/api/show", json={"model": model}, timeout=timeout)
+    resp.raise_for_status()
+    return resp.json()
+
+
+def model_context_length(info: Dict[str, Any]) -> Optional[int]:
+    """
+    Context window from an /api/show response: the model's <arch>.context_length,
+    lowered to num_ctx when the model sets one (Ollama truncates input there).
+    """
+    lengths = [v for k, v in (info.get("model_info") or {}).items()
+               if k.endswith(".context_length") and isinstance(v, int)]
+    num_ctx = re.search(r"^num_ctx\s+(\d+)", info.get("parameters") or "", re.MULTILINE)
+    if num_ctx:
+        lengths.append(int(num_ctx.group(1)))
+    return min(lengths) if lengths else None
+
+
+def calibrate_tokens(model: str):
+    """
+    Record the model's context length for token-aware chunking and fix its
+    chars-per-token estimate by embedding tokens.CALIBRATION_TEXT once.
+    """
+    try:
+        ctx = model_context_length(show_model(model))
+        if ctx:
+            tokens.set_context_length(model, ctx)
+            log.info(f"Ollama model '{model}' context length: {ctx} tokens")
+    except Exception as e:
+        log.warning(f"Could not read the context length of '{model}': {e}")
+    try:
+        text = tokens.CALIBRATION_TEXT
+        with limiter.slot():
+            resp = session.post(f"{OLLAMA_URL.rstrip('/')}/api/embed", json={"model": model, "input": [text]},
+                                timeout=timeout)
+            resp.raise_for_status()
+            count = resp.json().get("prompt_eval_count")
+    except Exception as e:
+        log.warning(f"Could not calibrate chars per token of '{model}', chunks use the default: {e}")
+        return
+    tokens.calibrate(model, len(text), count)
+    log.info(f"Ollama model '{model}' chunk sizing: {tokens.chars_per_token(model):.2f} chars per token")
@@ -1,24 +1,289 @@
+import asyncio
+import json
+import math
+import threading
 import requests
-from typing import List, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Dict, Any, Optional
 from .http_client import create_session
-from ..config import QDRANT_URL, HTTP_RETRIES, HTTP_BACKOFF_FACTOR, CONNECT_TIMEOUT, READ_TIMEOUT
+from ..logger import setup_logging
+from .async_http_client import create_async_backend
+from .adaptive import AdaptiveLimiter, register_limiter
+from ..metrics import STAGE_SECONDS, BYTES, timed
+from ..config import (
+    QDRANT_URL, HTTP_RETRIES, HTTP_BACKOFF_FACTOR, CONNECT_TIMEOUT, READ_TIMEOUT,
+    QDRANT_MAX_CONNECTIONS, QDRANT_MAX_IN_FLIGHT,
+    UPSERT_BATCH_SIZE, UPSERT_BATCH_MAX_BYTES, UPSERT_PARALLELISM, UPSERT_WAIT,
+    QDRANT_VECTOR_DATATYPE, QDRANT_VECTORS_ON_DISK, QDRANT_PAYLOAD_ON_DISK, QDRANT_QUANTIZATION,
+    QDRANT_QUANTIZATION_QUANTILE, QDRANT_QUANTIZATION_ALWAYS_RAM, QDRANT_PQ_COMPRESSION,
+    QDRANT_NORMALIZE_VECTORS, QDRANT_PAYLOAD_INDEXES
+)
+
+try:
+    import orjson
+except ImportError:  # optional: falls back to the stdlib encoder
+    orjson = None
 
 session, timeout = create_session(
     retries=HTTP_RETRIES,
     backoff_factor=HTTP_BACKOFF_FACTOR,
-    timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)
+    timeout=(CONNECT_TIMEOUT, READ_TIMEOUT),
+    name="qdrant",
+)
+# fixed limit; registered so its latency and in-flight stats are visible too
+limiter = register_limiter(AdaptiveLimiter("qdrant", max_limit=QDRANT_MAX_IN_FLIGHT, adaptive=False))
+async_backend = create_async_backend(
+    "qdrant",
+    max_connections=QDRANT_MAX_CONNECTIONS,
+    max_in_flight=QDRANT_MAX_IN_FLIGHT,
+    retries=HTTP_RETRIES,
+    backoff_factor=HTTP_BACKOFF_FACTOR,
+    timeout=(CONNECT_TIMEOUT, READ_TIMEOUT),
+    limiter=limiter,
 )
 
-def upsert_points(points: List[Dict[str, Any]], collection: str) -> Dict[str, Any]:
+log = setup_logging()
+
+_JSON_HEADERS = {"Content-Type": "application/json"}
+# storage settings of each collection created or found by create_collection
+_collection_storage: Dict[str, Dict[str, Any]] = {}
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+def dumps(obj: Any) -> bytes:
+    """
+    Serialize to compact JSON bytes; orjson (with numpy array support) when installed.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+def normalize_vector(vec: List[float]) -> List[float]:
+    """
+    Scale a vector to unit length; a zero vector is returned unchanged.
+    """
+    norm = math.hypot(*vec)
+    if not norm or norm == 1.0:
+        return vec
+    return [x / norm for x in vec]
+
+def encode_upsert_batches(
+    points: List[Dict[str, Any]],
+    max_points: int = UPSERT_BATCH_SIZE,
+    max_bytes: int = UPSERT_BATCH_MAX_BYTES,
+) -> List[bytes]:
     """
-    Upsert points into a Qdrant collection.
+    Serialize points once each and pack them into {"points": [...]} request bodies
+    bounded by both point count and encoded size. A single point larger than
+    max_bytes still gets a body of its own.
     """
-    url = f"{QDRANT_URL.rstrip('/')}/collections/{collection}/points"
-    body = {"points": points}
-    resp = session.put(url, json=body, timeout=timeout)
+    bodies: List[bytes] = []
+    parts: List[bytes] = []
+    size = 0
+    for p in points:
+        enc = dumps(p)
+        if parts and (len(parts) >= max_points or size + len(enc) + 1 > max_bytes):
+            bodies.append(b'{"points":[' + b",".join(parts) + b"]}")
+            parts, size = [], 0
+        parts.append(enc)
+        size += len(enc) + 1
+    if parts:
+        bodies.append(b'{"points":[' + b",".join(parts) + b"]}")
+    return bodies
+
+def _points_url(collection: str) -> str:
+    return f"{QDRANT_URL.rstrip('/')}/collections/{collection}/points"
+
+def _put_body(url: str, body: bytes, wait: bool) -> Dict[str, Any]:
+    BYTES.labels("upsert").inc(len(body))
+    with timed(STAGE_SECONDS, "upsert"), limiter.slot():
+        resp = session.put(url, params={"wait": "true" if wait else "false"}, data=body,
+                           headers=_JSON_HEADERS, timeout=timeout)
+        resp.raise_for_status()
+        return resp.json()
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=max(1, UPSERT_PARALLELISM), thread_name_prefix="qdrant-upsert")
+        return _executor
+
+def upsert_points_parallel(points: List[Dict[str, Any]], collection: str, wait: bool = UPSERT_WAIT) -> int:
+    """
+    Upsert points in size-bounded batches, up to UPSERT_PARALLELISM requests at once.
+
+    With wait=False every batch but the last is sent with wait=false (acknowledged
+    once written to Qdrant's WAL). The last batch is sent with wait=true only after
+    all others were acknowledged; Qdrant applies operations in order, so when it
+    returns every point of the call has been applied. Returns the number of requests.
+    """
+    bodies = encode_upsert_batches(points)
+    if not bodies:
+        return 0
+    url = _points_url(collection)
+    head, last = bodies[:-1], bodies[-1]
+    if head:
+        futures = [_get_executor().submit(_put_body, url, body, wait) for body in head]
+        for f in futures:
+            f.result()
+    _put_body(url, last, True)
+    return len(bodies)
+
+async def _aput_body(url: str, body: bytes, wait: bool) -> Dict[str, Any]:
+    BYTES.labels("upsert").inc(len(body))
+    with timed(STAGE_SECONDS, "upsert"):
+        resp = await async_backend.request("PUT", url, params={"wait": "true" if wait else "false"},
+                                           content=body, headers=_JSON_HEADERS)
     resp.raise_for_status()
     return resp.json()
 
+async def aupsert_points_parallel(points: List[Dict[str, Any]], collection: str, wait: bool = UPSERT_WAIT) -> int:
+    """
+    Async upsert_points_parallel: batches are sent concurrently (bounded by the
+    Qdrant in-flight limit), followed by the same wait=true barrier.
+    """
+    bodies = await asyncio.to_thread(encode_upsert_batches, points)
+    if not bodies:
+        return 0
+    url = _points_url(collection)
+    await asyncio.gather(*(_aput_body(url, body, wait) for body in bodies[:-1]))
+    await _aput_body(url, bodies[-1], True)
+    return len(bodies)
+
+def scroll_points(
+    collection: str,
+    flt: Dict[str, Any],
+    with_payload: Any = True,
+    with_vector: bool = False,
+    page_size: int = 256,
+) -> Iterator[Dict[str, Any]]:
+    """
+    POST /collections/{collection}/points/scroll
+    Yield every point matching the filter, page by page.
+    """
+    url = f"{QDRANT_URL.rstrip('/')}/collections/{collection}/points/scroll"
+    offset = None
+    while True:
+        body = {"filter": flt, "limit": page_size, "with_payload": with_payload, "with_vector": with_vector}
+        if offset is not None:
+            body["offset"] = offset
+        with limiter.slot():
+            resp = session.post(url, json=body, timeout=timeout)
+            resp.raise_for_status()
+            result = resp.json().get("result") or {}
+        yield from result.get("points", [])
+        offset = result.get("next_page_offset")
+        if offset is None:
+            break
+
+def delete_points_by_filter(collection: str, flt: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    POST /collections/{collection}/points/delete
+    Delete every point matching the filter and wait until it is applied.
+    """
+    url = f"{QDRANT_URL.rstrip('/')}/collections/{collection}/points/delete"
+    with limiter.slot():
+        resp = session.post(url, params={"wait": "true"}, json={"filter": flt}, timeout=timeout)
+        resp.raise_for_status()
+        return resp.json()
+
+def _quantization_config() -> Optional[Dict[str, Any]]:
+    if QDRANT_QUANTIZATION == "scalar":
+        return {"scalar": {"type": "int8", "quantile": QDRANT_QUANTIZATION_QUANTILE,
+                           "always_ram": QDRANT_QUANTIZATION_ALWAYS_RAM}}
+    if QDRANT_QUANTIZATION == "product":
+        return {"product": {"compression": QDRANT_PQ_COMPRESSION, "always_ram": QDRANT_QUANTIZATION_ALWAYS_RAM}}
+    if QDRANT_QUANTIZATION == "binary":
+        return {"binary": {"always_ram": QDRANT_QUANTIZATION_ALWAYS_RAM}}
+    if QDRANT_QUANTIZATION not in ("", "none"):
+        raise ValueError(f"Unknown QDRANT_QUANTIZATION: {QDRANT_QUANTIZATION}")
+    return None
+
+def collection_config(vector_size: int, distance: str = "Cosine") -> Dict[str, Any]:
+    """
+    Body of a create collection request: vector size and distance plus the
+    configured datatype, on-disk and quantization options.
+    """
+    vectors: Dict[str, Any] = {"size": vector_size, "distance": distance}
+    if QDRANT_VECTOR_DATATYPE not in ("float32", "float16"):
+        # uint8 would need integer embeddings; int8 compression is QDRANT_QUANTIZATION=scalar
+        raise ValueError(f"Unsupported QDRANT_VECTOR_DATATYPE: {QDRANT_VECTOR_DATATYPE}")
+    if QDRANT_VECTOR_DATATYPE != "float32":
+        vectors["datatype"] = QDRANT_VECTOR_DATATYPE
+    if QDRANT_VECTORS_ON_DISK:
+        vectors["on_disk"] = True
+    body: Dict[str, Any] = {"vectors": vectors}
+    if QDRANT_PAYLOAD_ON_DISK:
+        body["on_disk_payload"] = True
+    quantization = _quantization_config()
+    if quantization is not None:
+        body["quantization_config"] = quantization
+    return body
+
+def _storage(body: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Storage settings of a create collection body, or of the config of an existing
+    collection (GET /collections/{collection}), in the shape /health reports.
+    """
+    params = body.get("params", body)
+    vectors = params.get("vectors") or {}
+    if "size" not in vectors and len(vectors) == 1:
+        # named vectors: report the only one
+        vectors = next(iter(vectors.values()))
+    return {"distance": vectors.get("distance"), "datatype": vectors.get("datatype") or "float32",
+            "vectors_on_disk": bool(vectors.get("on_disk")), "payload_on_disk": bool(params.get("on_disk_payload")),
+            "quantization": body.get("quantization_config")}
+
+def storage_settings() -> Dict[str, Any]:
+    """
+    Configured collection storage options, and the settings each target
+    collection actually has, reported by /health.
+    """
+    return {"datatype": QDRANT_VECTOR_DATATYPE, "vectors_on_disk": QDRANT_VECTORS_ON_DISK,
+            "payload_on_disk": QDRANT_PAYLOAD_ON_DISK, "quantization": _quantization_config(),
+            "normalize_vectors": QDRANT_NORMALIZE_VECTORS, "payload_indexes": QDRANT_PAYLOAD_INDEXES,
+            "collections": dict(_collection_storage)}
+
+def get_collection(collection: str) -> Dict[str, Any]:
+    """
+    GET /collections/{collection}
+    Return the collection's info: config, status and point counts.
+    """
+    url = f"{QDRANT_URL.rstrip('/')}/collections/{collection}"
+    with limiter.slot():
+        resp = session.get(url, timeout=timeout)
+        resp.raise_for_status()
+        return resp.json().get("result") or {}
+
+def _check_existing(collection: str, wanted: Dict[str, Any]):
+    """
+    Record the storage settings of an existing collection and warn where they
+    differ from the configured ones, which only apply to new collections.
+    """
+    try:
+        actual = _storage(get_collection(collection).get("config") or {})
+    except requests.exceptions.RequestException:
+        log.exception(f"Reading the config of collection {collection} failed")
+        return
+    _collection_storage[collection] = actual
+    differ = [k for k, v in wanted.items() if k != "distance" and actual.get(k) != v]
+    if differ:
+        log.warning(f"Collection {collection} already exists; its {', '.join(differ)} differ from the "
+                    f"configured ones and are left as they are: {actual}")
+
+def create_payload_index(collection: str, field: str, schema: str = "keyword") -> Dict[str, Any]:
+    """
+    PUT /collections/{collection}/index
+    Index a payload field; indexing a field that already has one is a no-op.
+    """
+    url = f"{QDRANT_URL.rstrip('/')}/collections/{collection}/index"
+    with limiter.slot():
+        resp = session.put(url, params={"wait": "true"}, json={"field_name": field, "field_schema": schema},
+                           timeout=timeout)
+        resp.raise_for_status()
+        return resp.json()
+
 def create_collection(
     collection: str,
     vector_size: int,
@@ -26,23 +291,32 @@ def create_collection(
 ) -> Dict[str, Any]:
     """
     PUT /collections/{collection}
-    Create a collection with the given vector size and distance metric.
-    If the collection already exists, return a neutral response.
+    Create a collection with the given vector size and distance metric and the
+    storage options of collection_config(), then index QDRANT_PAYLOAD_INDEXES.
+    If the collection already exists, return a neutral response; its storage
+    options are left as they are (a warning is logged when they differ from the
+    configured ones), but missing payload indexes are added.
     """
     url = f"{QDRANT_URL.rstrip('/')}/collections/{collection}"
-    body = {"vectors": {"size": vector_size, "distance": distance}}
+    body = collection_config(vector_size, distance)
 
     try:
         resp = session.put(url, json=body, timeout=timeout)
         resp.raise_for_status()
-        return resp.json()
+        result = resp.json()
+        _collection_storage[collection] = _storage(body)
 
     except requests.exceptions.HTTPError as e:
         if resp.status_code == 409:
             # 409 = collection already exists
-            return {"status": "already_exists", "collection": collection}
+            result = {"status": "already_exists", "collection": collection}
+            _check_existing(collection, _storage(body))
         else:
             raise e
 
     except requests.exceptions.RequestException as e:
-        raise RuntimeError(f"An error occurred during collection creation: {e}") from e
\ No newline at end of file
+        raise RuntimeError(f"An error occurred during collection creation: {e}") from e
+
+    for field in QDRANT_PAYLOAD_INDEXES:
+        create_payload_index(collection, field)
+    return result
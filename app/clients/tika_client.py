@@ -1,51 +1,147 @@
-from typing import Optional
+import asyncio
+import codecs
+from pathlib import Path
+from typing import AsyncIterator, Iterable
 from charset_normalizer import from_bytes
 from .http_client import create_session
-from ..config import TIKA_URL, HTTP_RETRIES, HTTP_BACKOFF_FACTOR, CONNECT_TIMEOUT, READ_TIMEOUT
+from .async_http_client import create_async_backend
+from .adaptive import AdaptiveLimiter, register_limiter
+from ..metrics import STAGE_SECONDS, BYTES, timed
+from ..config import (
+    TIKA_URL, HTTP_RETRIES, HTTP_BACKOFF_FACTOR, CONNECT_TIMEOUT, READ_TIMEOUT, IO_BUFFER_SIZE,
+    TIKA_MAX_CONNECTIONS, TIKA_MAX_IN_FLIGHT, TIKA_TARGET_LATENCY,
+    ADAPTIVE_CONCURRENCY, ADAPTIVE_DECREASE_FACTOR
+)
 
 session, timeout = create_session(
     retries=HTTP_RETRIES,
     backoff_factor=HTTP_BACKOFF_FACTOR,
-    timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)
+    timeout=(CONNECT_TIMEOUT, READ_TIMEOUT),
+    name="tika",
+)
+# shared by the sync and async paths, so the limit covers all Tika traffic of this process
+limiter = register_limiter(AdaptiveLimiter(
+    "tika",
+    max_limit=TIKA_MAX_IN_FLIGHT,
+    target_latency=TIKA_TARGET_LATENCY,
+    decrease_factor=ADAPTIVE_DECREASE_FACTOR,
+    adaptive=ADAPTIVE_CONCURRENCY,
+))
+async_backend = create_async_backend(
+    "tika",
+    max_connections=TIKA_MAX_CONNECTIONS,
+    max_in_flight=TIKA_MAX_IN_FLIGHT,
+    retries=HTTP_RETRIES,
+    backoff_factor=HTTP_BACKOFF_FACTOR,
+    timeout=(CONNECT_TIMEOUT, READ_TIMEOUT),
+    limiter=limiter,
 )
 
-def extract_text(file_bytes: bytes, prefer_utf8: bool = True) -> str:
+def _detect_encoding(data: bytes) -> str:
+    """
+    Guess the codec of data with charset-normalizer, falling back to UTF-8.
     """
-    PUT bytes to Tika and return cleaned unicode text.
+    try:
+        best = from_bytes(data).best()
+        if best:
+            return best.encoding
+    except Exception:
+        pass
+    return "utf-8"
 
-    Steps:
-    1) Call Tika server with Accept=text/plain
-    2) Decode bytes -> try UTF-8 first
-    3) Fallback to charset-normalizer detection
-    4) Cleanup text with ftfy + regex normalization
+class StreamDecoder:
     """
-    headers = {"Accept": "text/plain"}
-    resp = session.put(TIKA_URL, headers=headers, data=file_bytes, timeout=timeout)
-    resp.raise_for_status()
+    Decode a byte stream to text incrementally.
 
-    data = resp.content  # raw bytes
+    1) Try UTF-8 chunk by chunk with an incremental decoder
+    2) Where that fails (or without prefer_utf8, from the start), collect up to
+       IO_BUFFER_SIZE bytes, detect their charset with charset-normalizer and
+       decode the rest of the stream with that codec, replacing undecodable bytes
 
-    # 1) Try UTF-8 directly
-    text: Optional[str]
-    if prefer_utf8:
+    Only that bounded detection window is ever buffered as bytes.
+    """
+
+    def __init__(self, prefer_utf8: bool = True):
+        self._decoder = codecs.getincrementaldecoder("utf-8")() if prefer_utf8 else None
+        self._parts = []
+        self._pending = b""
+
+    def _detect(self):
+        encoding = _detect_encoding(self._pending)
+        self._decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+        self._parts.append(self._decoder.decode(self._pending))
+        self._pending = b""
+
+    def feed(self, chunk: bytes):
+        if not chunk:
+            return
+        if self._decoder is None:
+            self._pending += chunk
+            if len(self._pending) >= IO_BUFFER_SIZE:
+                self._detect()
+            return
+        buffered = self._decoder.getstate()[0]
         try:
-            text = data.decode("utf-8")
+            self._parts.append(self._decoder.decode(chunk))
         except UnicodeDecodeError:
-            text = None
-    else:
-        text = None
+            # text decoded so far was valid UTF-8; detect the codec from here on
+            self._decoder, self._pending = None, buffered + chunk
+            if len(self._pending) >= IO_BUFFER_SIZE:
+                self._detect()
 
-    # 2) Fallback: charset detection
-    if text is None:
+    def finish(self) -> str:
+        if self._decoder is None:
+            self._detect()
         try:
-            detection = from_bytes(data)  # returns CharsetMatch objects
-            best = detection.best()
-            if best:
-                text = best.read()  # decoded string
-            else:
-                text = data.decode("utf-8", errors="replace")
-        except Exception:
-            text = data.decode("utf-8", errors="replace")
-
-    # 3) Normalize/fix text
-    return text
\ No newline at end of file
+            self._parts.append(self._decoder.decode(b"", final=True))
+        except UnicodeDecodeError:
+            # truncated multi-byte sequence at the end of the stream
+            self._parts.append(self._decoder.getstate()[0].decode("utf-8", errors="replace"))
+        return "".join(self._parts)
+
+def decode_stream(chunks: Iterable[bytes], prefer_utf8: bool = True) -> str:
+    decoder = StreamDecoder(prefer_utf8)
+    for chunk in chunks:
+        decoder.feed(chunk)
+    return decoder.finish()
+
+def extract_text_from_path(path: Path, prefer_utf8: bool = True) -> str:
+    """
+    Stream a file to Tika from its file handle and decode the response incrementally,
+    so neither the upload nor the response is ever held in memory as a whole.
+    """
+    headers = {"Accept": "text/plain"}
+    with timed(STAGE_SECONDS, "extract"), limiter.slot(), open(path, "rb") as fh:
+        BYTES.labels("extract").inc(fh.seek(0, 2))
+        fh.seek(0)
+        resp = session.put(TIKA_URL, headers=headers, data=fh, timeout=timeout, stream=True)
+        try:
+            resp.raise_for_status()
+            return decode_stream(resp.iter_content(chunk_size=IO_BUFFER_SIZE), prefer_utf8=prefer_utf8)
+        finally:
+            resp.close()
+
+async def _aread_file(path: Path) -> AsyncIterator[bytes]:
+    with open(path, "rb") as fh:
+        while True:
+            chunk = await asyncio.to_thread(fh.read, IO_BUFFER_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+async def aextract_text_from_path(path: Path, prefer_utf8: bool = True) -> str:
+    """
+    Async extract_text_from_path: the file is streamed from disk in IO_BUFFER_SIZE
+    reads and the response is decoded as it arrives.
+    """
+    size = path.stat().st_size
+    headers = {"Accept": "text/plain", "Content-Length": str(size)}
+    BYTES.labels("extract").inc(size)
+    with timed(STAGE_SECONDS, "extract"):
+        async with async_backend.stream("PUT", TIKA_URL, headers=headers,
+                                        content_factory=lambda: _aread_file(path)) as resp:
+            resp.raise_for_status()
+            decoder = StreamDecoder(prefer_utf8)
+            async for chunk in resp.aiter_bytes(IO_BUFFER_SIZE):
+                decoder.feed(chunk)
+            return decoder.finish()
@@ -0,0 +1,171 @@
+import asyncio
+import time
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional, Tuple
+from .logger import setup_logging
+from .config import (
+    CHUNK_MAX_CHARS, CHUNK_OVERLAP,
+    CLEAN_POOL_ENABLED, CLEAN_POOL_WORKERS, CLEAN_POOL_START_METHOD
+)
+from .chunker import chunk_text
+from .cleaner import clean_text, preload, lemma_cache_stats
+from .metrics import ENABLED as METRICS_ENABLED, STAGE_SECONDS
+
+log = setup_logging()
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+# lemma cache hits/misses reported back by pool workers, whose caches the parent cannot see
+_lemma_totals = {"hits": 0, "misses": 0}
+_lemma_lock = threading.Lock()
+
+def _init_worker():
+    """
+    Runs once in every worker process: load NLTK corpora, stopwords and the
+    lemmatizer up front so the first document does not pay for it. A failure is
+    only logged: raising here would break the whole pool.
+    """
+    try:
+        preload()
+    except Exception:
+        log.exception("NLTK preload failed in a cleaning worker; resources will be loaded on first use")
+
+def _ping() -> bool:
+    return True
+
+def clean_and_chunk(dirty_text: str, max_chars: int = CHUNK_MAX_CHARS, overlap: int = CHUNK_OVERLAP) -> List[str]:
+    """
+    Clean extracted text and split it into chunks. Returns [] when nothing is left.
+    """
+    text = clean_text(dirty_text)
+    if not text or not text.strip():
+        return []
+    return chunk_text(text, max_chars, overlap)
+
+def _timed_clean_and_chunk(dirty_text: str, max_chars: int, overlap: int) -> Tuple[List[str], float, float]:
+    """
+    clean_and_chunk that also returns (clean seconds, chunk seconds), so the
+    parent process can record them; metrics of pool workers are not exported.
+    """
+    t0 = time.perf_counter()
+    text = clean_text(dirty_text)
+    t1 = time.perf_counter()
+    chunks = chunk_text(text, max_chars, overlap) if text and text.strip() else []
+    return chunks, t1 - t0, time.perf_counter() - t1
+
+def _pool_clean_and_chunk(dirty_text: str, max_chars: int, overlap: int) -> Tuple[List[str], float, float, int, int]:
+    """
+    _timed_clean_and_chunk for pool workers, plus the lemma cache hits and misses
+    of this call. A worker runs one task at a time, so the difference is exact.
+    """
+    before = lemma_cache_stats()
+    chunks, clean_s, chunk_s = _timed_clean_and_chunk(dirty_text, max_chars, overlap)
+    after = lemma_cache_stats()
+    return chunks, clean_s, chunk_s, after["hits"] - before["hits"], after["misses"] - before["misses"]
+
+def _observed(result: Tuple[List[str], float, float]) -> List[str]:
+    chunks, clean_s, chunk_s = result
+    STAGE_SECONDS.labels("clean").observe(clean_s)
+    STAGE_SECONDS.labels("chunk").observe(chunk_s)
+    return chunks
+
+def _observed_pool(result: Tuple[List[str], float, float, int, int]) -> List[str]:
+    chunks, clean_s, chunk_s, hits, misses = result
+    with _lemma_lock:
+        _lemma_totals["hits"] += hits
+        _lemma_totals["misses"] += misses
+    if METRICS_ENABLED:
+        _observed((chunks, clean_s, chunk_s))
+    return chunks
+
+def lemma_stats() -> Dict[str, Any]:
+    """
+    Lemma cache hits and misses of the pool workers and this process together, for /health.
+    """
+    local = lemma_cache_stats()
+    with _lemma_lock:
+        hits = _lemma_totals["hits"] + local["hits"]
+        misses = _lemma_totals["misses"] + local["misses"]
+    lookups = hits + misses
+    return {"hits": hits, "misses": misses, "hit_rate": round(hits / lookups, 4) if lookups else None,
+            "maxsize_per_process": local["maxsize"], "pool": _pool is not None}
+
+def get_pool() -> Optional[ProcessPoolExecutor]:
+    """
+    Return the shared cleaning pool, creating it on first use.
+    Returns None when the pool is disabled.
+    """
+    global _pool
+    if not CLEAN_POOL_ENABLED or CLEAN_POOL_WORKERS <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=CLEAN_POOL_WORKERS,
+                mp_context=multiprocessing.get_context(CLEAN_POOL_START_METHOD),
+                initializer=_init_worker,
+            )
+            log.info(f"Cleaning pool started with {CLEAN_POOL_WORKERS} workers ({CLEAN_POOL_START_METHOD})")
+        return _pool
+
+def _discard_pool(pool: ProcessPoolExecutor):
+    """
+    Drop a broken pool so the next call starts a fresh one.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+    log.error("Cleaning pool is broken; it is restarted on next use and this call runs in-process")
+
+def warm_pool():
+    """
+    Start every worker of the pool now (and run its initializer) instead of on the first documents.
+    """
+    pool = get_pool()
+    if pool is None:
+        return
+    try:
+        for f in [pool.submit(_ping) for _ in range(CLEAN_POOL_WORKERS)]:
+            f.result()
+    except BrokenProcessPool:
+        _discard_pool(pool)
+
+def run_clean_and_chunk(dirty_text: str, max_chars: int = CHUNK_MAX_CHARS, overlap: int = CHUNK_OVERLAP) -> List[str]:
+    pool = get_pool()
+    if pool is not None:
+        try:
+            return _observed_pool(pool.submit(_pool_clean_and_chunk, dirty_text, max_chars, overlap).result())
+        except BrokenProcessPool:
+            _discard_pool(pool)
+    if not METRICS_ENABLED:
+        return clean_and_chunk(dirty_text, max_chars, overlap)
+    return _observed(_timed_clean_and_chunk(dirty_text, max_chars, overlap))
+
+async def arun_clean_and_chunk(dirty_text: str, max_chars: int = CHUNK_MAX_CHARS, overlap: int = CHUNK_OVERLAP) -> List[str]:
+    """
+    Await clean_and_chunk without blocking the event loop, on the pool or in a worker thread.
+    """
+    pool = get_pool()
+    if pool is not None:
+        try:
+            future = pool.submit(_pool_clean_and_chunk, dirty_text, max_chars, overlap)
+            return _observed_pool(await asyncio.wrap_future(future))
+        except BrokenProcessPool:
+            _discard_pool(pool)
+    func = _timed_clean_and_chunk if METRICS_ENABLED else clean_and_chunk
+    result = await asyncio.to_thread(func, dirty_text, max_chars, overlap)
+    return _observed(result) if METRICS_ENABLED else result
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+            log.info("Cleaning pool stopped")
@@ -1,53 +1,704 @@
+import threading
 import psycopg2
+from contextlib import contextmanager
 from psycopg2.extras import execute_values
-from .config import POSTGRES_DSN, ADVISORY_LOCK_KEY
-from typing import Tuple, Optional
+from psycopg2.pool import PoolError, ThreadedConnectionPool
+from .config import (
+    POSTGRES_DSN, ADVISORY_LOCK_KEY, DB_POOL_MIN, DB_POOL_MAX, DB_POOL_TIMEOUT,
+    OLLAMA_EMBED_MODEL, QDRANT_COLLECTION
+)
+from .metrics import DB_SECONDS, timed
+from typing import Dict, Iterator, List, Set, Tuple, Optional
+
+_pool: Optional[ThreadedConnectionPool] = None
+_pool_slots = threading.BoundedSemaphore(DB_POOL_MAX)
+_pool_lock = threading.Lock()
+
+# first key of the per-path advisory locks
+_PATH_LOCK_SPACE = 0x1D6E
 
 def get_db_conn():
+    """
+    Open a dedicated, unpooled connection. Use it for long-held sessions such as
+    advisory locks; everything else should go through db_conn().
+    """
     return psycopg2.connect(POSTGRES_DSN)
 
-def ensure_processed_table():
-    sql = """
+def _get_pool() -> ThreadedConnectionPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadedConnectionPool(DB_POOL_MIN, DB_POOL_MAX, POSTGRES_DSN)
+        return _pool
+
+@contextmanager
+def db_conn() -> Iterator[psycopg2.extensions.connection]:
+    """
+    Check out a pooled connection, commit on success and roll back on error.
+    Blocks for up to DB_POOL_TIMEOUT seconds when all DB_POOL_MAX connections are in use.
+    Safe to use from any thread.
+    """
+    if not _pool_slots.acquire(timeout=DB_POOL_TIMEOUT):
+        raise PoolError(f"No DB connection available after {DB_POOL_TIMEOUT}s (DB_POOL_MAX={DB_POOL_MAX})")
+    try:
+        pool = _get_pool()
+        conn = pool.getconn()
+        broken = False
+        try:
+            with timed(DB_SECONDS):
+                yield conn
+                conn.commit()
+        except Exception:
+            try:
+                conn.rollback()
+            except Exception:
+                broken = True
+            raise
+        finally:
+            pool.putconn(conn, close=broken or bool(conn.closed))
+    finally:
+        _pool_slots.release()
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+
+# Current shape of every table; cheap to run while other sessions use them
+_TABLES_SQL = """
     CREATE TABLE IF NOT EXISTS processed_files (
         id SERIAL PRIMARY KEY,
         file_path TEXT,
-        source_hash TEXT UNIQUE,
+        source_hash TEXT,
         collection TEXT,
+        embed_model TEXT,
         points_count INTEGER,
-        processed_at TIMESTAMP DEFAULT NOW()
+        processed_at TIMESTAMP DEFAULT NOW(),
+        CONSTRAINT processed_files_target UNIQUE (source_hash, collection, embed_model)
+    );
+    CREATE TABLE IF NOT EXISTS scan_manifest (
+        file_path TEXT PRIMARY KEY,
+        size BIGINT NOT NULL,
+        mtime_ns BIGINT NOT NULL,
+        source_hash TEXT NOT NULL,
+        scanned_at TIMESTAMP DEFAULT NOW()
     );
-    CREATE UNIQUE INDEX IF NOT EXISTS processed_files_unique_hash ON processed_files (source_hash);
+    CREATE TABLE IF NOT EXISTS ingest_progress (
+        source_hash TEXT NOT NULL,
+        collection TEXT NOT NULL,
+        embed_model TEXT NOT NULL,
+        file_path TEXT,
+        committed_chunks INTEGER NOT NULL,
+        total_chunks INTEGER NOT NULL,
+        updated_at TIMESTAMP DEFAULT NOW(),
+        PRIMARY KEY (source_hash, collection, embed_model)
+    );
+    CREATE TABLE IF NOT EXISTS source_files (
+        file_path TEXT NOT NULL,
+        collection TEXT NOT NULL,
+        source_hash TEXT NOT NULL,
+        updated_at TIMESTAMP DEFAULT NOW(),
+        deleted_at TIMESTAMP,
+        PRIMARY KEY (file_path, collection)
+    );
+    CREATE TABLE IF NOT EXISTS ingest_queue (
+        id BIGSERIAL PRIMARY KEY,
+        file_path TEXT NOT NULL,
+        collection TEXT NOT NULL,
+        embed_model TEXT NOT NULL,
+        job_id TEXT,
+        priority INTEGER NOT NULL DEFAULT 0,
+        status TEXT NOT NULL DEFAULT 'queued',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        lease_owner TEXT,
+        lease_expires_at TIMESTAMP,
+        available_at TIMESTAMP NOT NULL DEFAULT NOW(),
+        last_error TEXT,
+        enqueued_at TIMESTAMP DEFAULT NOW(),
+        started_at TIMESTAMP,
+        finished_at TIMESTAMP
+    );
+    -- needed by enqueue_files' ON CONFLICT; only built when missing, since CREATE INDEX
+    -- locks the table even with IF NOT EXISTS
+    DO $$ BEGIN
+        IF to_regclass('ingest_queue_one_queued') IS NULL THEN
+            CREATE UNIQUE INDEX ingest_queue_one_queued
+                ON ingest_queue (file_path, collection, embed_model) WHERE status = 'queued';
+        END IF;
+    END $$;
+"""
+
+# Upgrades of tables created by older versions, and indexes. ALTER TABLE takes an
+# ACCESS EXCLUSIVE lock even when there is nothing to change, so this runs once at
+# startup (migrate_db), never per ingest run
+_MIGRATION_SQL = """
+    -- one row per content and target; older tables were unique on source_hash alone
+    ALTER TABLE processed_files ADD COLUMN IF NOT EXISTS embed_model TEXT;
+    ALTER TABLE processed_files DROP CONSTRAINT IF EXISTS processed_files_source_hash_key;
+    DROP INDEX IF EXISTS processed_files_unique_hash;
+    UPDATE processed_files SET embed_model = COALESCE(embed_model, %s), collection = COALESCE(collection, %s)
+    WHERE embed_model IS NULL OR collection IS NULL;
+    CREATE UNIQUE INDEX IF NOT EXISTS processed_files_target ON processed_files (source_hash, collection, embed_model);
+    ALTER TABLE ingest_queue ADD COLUMN IF NOT EXISTS job_id TEXT;
+    ALTER TABLE ingest_queue ADD COLUMN IF NOT EXISTS priority INTEGER NOT NULL DEFAULT 0;
+    CREATE UNIQUE INDEX IF NOT EXISTS ingest_queue_one_queued
+        ON ingest_queue (file_path, collection, embed_model) WHERE status = 'queued';
+    CREATE INDEX IF NOT EXISTS ingest_queue_claimable ON ingest_queue (status, available_at);
+    CREATE INDEX IF NOT EXISTS ingest_queue_job ON ingest_queue (job_id);
+    CREATE INDEX IF NOT EXISTS ingest_queue_priority
+        ON ingest_queue (priority DESC, available_at, id) WHERE status = 'queued';
+"""
+
+_tables_ready = False
+
+def ensure_processed_table():
     """
-    conn = get_db_conn()
-    cur = conn.cursor()
-    cur.execute(sql)
-    conn.commit()
-    cur.close()
-    conn.close()
+    Create missing tables, once per process. Safe on the ingest path: it never
+    alters existing tables; upgrades and indexes are left to migrate_db().
+    """
+    global _tables_ready
+    if _tables_ready:
+        return
+    with db_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(_TABLES_SQL)
+        cur.close()
+    _tables_ready = True
 
-def mark_as_processed(file_path: str, source_hash: str, collection: str, points_count: int):
-    conn = get_db_conn()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        INSERT INTO processed_files (file_path, source_hash, collection, points_count, processed_at)
-        VALUES (%s, %s, %s, %s, NOW())
-        ON CONFLICT (source_hash) DO UPDATE SET processed_at = NOW(), file_path = EXCLUDED.file_path, points_count = EXCLUDED.points_count;
-        """,
-        (file_path, source_hash, collection, points_count),
-    )
-    conn.commit()
-    cur.close()
-    conn.close()
+def migrate_db():
+    """
+    Create tables, upgrade ones created by older versions and build the indexes.
+    Run at startup only (see _MIGRATION_SQL); init_db.sql does the same.
+    """
+    global _tables_ready
+    with db_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(_TABLES_SQL)
+        # rows from before per-target tracking were ingested with the configured defaults
+        cur.execute(_MIGRATION_SQL, (OLLAMA_EMBED_MODEL, QDRANT_COLLECTION))
+        cur.close()
+    _tables_ready = True
 
-def already_ingested(source_hash: str) -> bool:
-    conn = get_db_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT id FROM processed_files WHERE source_hash = %s;", (source_hash,))
-    ok = cur.fetchone() is not None
-    cur.close()
-    conn.close()
-    return ok
+def mark_as_processed(file_path: str, source_hash: str, collection: str, embed_model: str, points_count: int):
+    with db_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            INSERT INTO processed_files (file_path, source_hash, collection, embed_model, points_count, processed_at)
+            VALUES (%s, %s, %s, %s, %s, NOW())
+            ON CONFLICT (source_hash, collection, embed_model) DO UPDATE SET processed_at = NOW(), file_path = EXCLUDED.file_path, points_count = EXCLUDED.points_count;
+            """,
+            (file_path, source_hash, collection, embed_model, points_count),
+        )
+        cur.close()
+
+def get_source_file(file_path: str, collection: str) -> Optional[str]:
+    """
+    Return the source_hash currently ingested for a live (not tombstoned) path, or None.
+    """
+    with db_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            "SELECT source_hash FROM source_files WHERE file_path = %s AND collection = %s AND deleted_at IS NULL;",
+            (file_path, collection),
+        )
+        row = cur.fetchone()
+        cur.close()
+    return row[0] if row else None
+
+def get_source_files(file_paths: List[str], collections: List[str]) -> Dict[Tuple[str, str], str]:
+    """
+    Return {(file_path, collection): source_hash} of the live paths among file_paths, in one query.
+    """
+    if not file_paths:
+        return {}
+    with db_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            SELECT file_path, collection, source_hash FROM source_files
+            WHERE file_path = ANY(%s) AND collection = ANY(%s) AND deleted_at IS NULL;
+            """,
+            (file_paths, collections),
+        )
+        found = {(p, c): h for p, c, h in cur.fetchall()}
+        cur.close()
+    return found
+
+def set_source_file(file_path: str, collection: str, source_hash: str, previous_hash: Optional[str] = None):
+    """
+    Record source_hash as the current version of file_path. When it replaces
+    previous_hash, that version's processed_files rows for this path and collection
+    are dropped so the old content is not treated as ingested there anymore.
+    """
+    with db_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            INSERT INTO source_files (file_path, collection, source_hash, updated_at, deleted_at)
+            VALUES (%s, %s, %s, NOW(), NULL)
+            ON CONFLICT (file_path, collection) DO UPDATE SET
+                source_hash = EXCLUDED.source_hash, updated_at = NOW(), deleted_at = NULL;
+            """,
+            (file_path, collection, source_hash),
+        )
+        if previous_hash and previous_hash != source_hash:
+            cur.execute(
+                "DELETE FROM processed_files WHERE file_path = %s AND source_hash = %s AND collection = %s;",
+                (file_path, previous_hash, collection),
+            )
+        cur.close()
+
+def tombstone_source_file(file_path: str, collection: str):
+    """
+    Mark a path as deleted in a collection and forget its processed_files rows
+    there, so the content is ingested again if it reappears.
+    """
+    with db_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            UPDATE source_files SET deleted_at = NOW()
+            WHERE file_path = %s AND collection = %s AND deleted_at IS NULL
+            RETURNING source_hash;
+            """,
+            (file_path, collection),
+        )
+        row = cur.fetchone()
+        if row:
+            cur.execute(
+                "DELETE FROM processed_files WHERE file_path = %s AND source_hash = %s AND collection = %s;",
+                (file_path, row[0], collection),
+            )
+        cur.close()
+
+def list_live_source_files(collection: str, path_prefix: str) -> List[str]:
+    """
+    Paths under path_prefix that are tracked as live for a collection.
+    """
+    with db_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            SELECT file_path FROM source_files
+            WHERE collection = %s AND deleted_at IS NULL AND starts_with(file_path, %s);
+            """,
+            (collection, path_prefix),
+        )
+        paths = [r[0] for r in cur.fetchall()]
+        cur.close()
+    return paths
+
+def get_ingest_progress(source_hash: str, collection: str, embed_model: str) -> Optional[Tuple[int, int, str]]:
+    """
+    Return (committed_chunks, total_chunks, file_path) of an interrupted ingest, or None.
+    """
+    with db_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            SELECT committed_chunks, total_chunks, file_path FROM ingest_progress
+            WHERE source_hash = %s AND collection = %s AND embed_model = %s;
+            """,
+            (source_hash, collection, embed_model),
+        )
+        row = cur.fetchone()
+        cur.close()
+    return (row[0], row[1], row[2]) if row else None
+
+def save_ingest_progress(source_hash: str, collection: str, embed_model: str, file_path: str,
+                         committed_chunks: int, total_chunks: int):
+    with db_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            INSERT INTO ingest_progress (source_hash, collection, embed_model, file_path, committed_chunks, total_chunks, updated_at)
+            VALUES (%s, %s, %s, %s, %s, %s, NOW())
+            ON CONFLICT (source_hash, collection, embed_model) DO UPDATE SET
+                file_path = EXCLUDED.file_path, committed_chunks = EXCLUDED.committed_chunks,
+                total_chunks = EXCLUDED.total_chunks, updated_at = NOW();
+            """,
+            (source_hash, collection, embed_model, file_path, committed_chunks, total_chunks),
+        )
+        cur.close()
+
+def clear_ingest_progress(source_hash: str, collection: str, embed_model: str):
+    with db_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            "DELETE FROM ingest_progress WHERE source_hash = %s AND collection = %s AND embed_model = %s;",
+            (source_hash, collection, embed_model),
+        )
+        cur.close()
+
+def ingested_targets(source_hashes: List[str], collections: List[str]) -> Dict[str, Set[Tuple[str, str]]]:
+    """
+    Return {source_hash: {(embed_model, collection)}} for the given hashes that are
+    already in processed_files for any of the collections, in one query.
+    """
+    if not source_hashes:
+        return {}
+    with db_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            SELECT source_hash, embed_model, collection FROM processed_files
+            WHERE source_hash = ANY(%s) AND collection = ANY(%s);
+            """,
+            (source_hashes, collections),
+        )
+        found: Dict[str, Set[Tuple[str, str]]] = {}
+        for source_hash, embed_model, collection in cur.fetchall():
+            found.setdefault(source_hash, set()).add((embed_model, collection))
+        cur.close()
+    return found
+
+def load_scan_manifest(file_paths: List[str]) -> Dict[str, Tuple[int, int, str]]:
+    """
+    Return {file_path: (size, mtime_ns, source_hash)} for the given paths.
+    """
+    if not file_paths:
+        return {}
+    with db_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            "SELECT file_path, size, mtime_ns, source_hash FROM scan_manifest WHERE file_path = ANY(%s);",
+            (file_paths,),
+        )
+        rows = {r[0]: (r[1], r[2], r[3]) for r in cur.fetchall()}
+        cur.close()
+    return rows
+
+def update_scan_manifest(rows: List[Tuple[str, int, int, str]]):
+    """
+    Upsert (file_path, size, mtime_ns, source_hash) rows into scan_manifest.
+    """
+    if not rows:
+        return
+    with db_conn() as conn:
+        cur = conn.cursor()
+        execute_values(
+            cur,
+            """
+            INSERT INTO scan_manifest (file_path, size, mtime_ns, source_hash)
+            VALUES %s
+            ON CONFLICT (file_path) DO UPDATE SET size = EXCLUDED.size, mtime_ns = EXCLUDED.mtime_ns,
+                source_hash = EXCLUDED.source_hash, scanned_at = NOW();
+            """,
+            rows,
+        )
+        cur.close()
+
+def ensure_embedding_cache_table():
+    sql = """
+    CREATE TABLE IF NOT EXISTS embedding_cache (
+        model TEXT NOT NULL,
+        chunk_hash TEXT NOT NULL,
+        dim INTEGER NOT NULL,
+        vector BYTEA NOT NULL,
+        created_at TIMESTAMP DEFAULT NOW(),
+        last_used_at TIMESTAMP DEFAULT NOW(),
+        PRIMARY KEY (model, chunk_hash)
+    );
+    CREATE INDEX IF NOT EXISTS embedding_cache_last_used ON embedding_cache (last_used_at);
+    """
+    with db_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(sql)
+        cur.close()
+
+def get_cached_embeddings(model: str, chunk_hashes: List[str], touch_seconds: int = 3600) -> Dict[str, bytes]:
+    """
+    Fetch cached vectors for the given chunk hashes in one query. last_used_at
+    is only refreshed for hits last touched more than touch_seconds ago, so a
+    hot cache is not rewritten on every lookup. Returns {chunk_hash: packed_vector}.
+    """
+    if not chunk_hashes:
+        return {}
+    with db_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            "SELECT chunk_hash, vector FROM embedding_cache WHERE model = %s AND chunk_hash = ANY(%s);",
+            (model, chunk_hashes),
+        )
+        rows = {h: bytes(v) for h, v in cur.fetchall()}
+        if rows:
+            cur.execute(
+                """
+                UPDATE embedding_cache SET last_used_at = NOW()
+                WHERE model = %s AND chunk_hash = ANY(%s)
+                  AND last_used_at < NOW() - make_interval(secs => %s);
+                """,
+                (model, list(rows), touch_seconds),
+            )
+        cur.close()
+    return rows
+
+def put_cached_embeddings(model: str, items: List[Tuple[str, int, bytes]]):
+    """
+    Store (chunk_hash, dim, packed_vector) rows for a model; existing rows are kept.
+    """
+    if not items:
+        return
+    with db_conn() as conn:
+        cur = conn.cursor()
+        execute_values(
+            cur,
+            """
+            INSERT INTO embedding_cache (model, chunk_hash, dim, vector)
+            VALUES %s
+            ON CONFLICT (model, chunk_hash) DO NOTHING;
+            """,
+            [(model, h, dim, psycopg2.Binary(v)) for h, dim, v in items],
+        )
+        cur.close()
+
+def evict_embedding_cache(max_entries: int) -> int:
+    """
+    Delete the least recently used cache rows beyond max_entries. Returns rows deleted.
+    """
+    with db_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            DELETE FROM embedding_cache WHERE ctid IN (
+                SELECT ctid FROM embedding_cache ORDER BY last_used_at DESC OFFSET %s
+            );
+            """,
+            (max_entries,),
+        )
+        deleted = cur.rowcount
+        cur.close()
+    return deleted
+
+def enqueue_files(file_paths: List[str], collection: str, embed_model: str, job_id: Optional[str] = None,
+                  priority: int = 0) -> int:
+    """
+    Queue paths for ingestion, tagged with job_id. A path already waiting in the
+    queue is not added twice, but a waiting entry is raised to priority if that is
+    higher; one that is running gets a new entry so later changes are picked up.
+    Returns the number of new entries.
+    """
+    if not file_paths:
+        return 0
+    with db_conn() as conn:
+        cur = conn.cursor()
+        rows = execute_values(
+            cur,
+            """
+            INSERT INTO ingest_queue (file_path, collection, embed_model, job_id, priority)
+            VALUES %s
+            ON CONFLICT (file_path, collection, embed_model) WHERE status = 'queued'
+            DO UPDATE SET priority = EXCLUDED.priority
+                WHERE ingest_queue.priority < EXCLUDED.priority
+            RETURNING id, (xmax = 0) AS inserted;
+            """,
+            # DO UPDATE may not touch a row twice in one statement, so paths go in once
+            [(p, collection, embed_model, job_id, priority) for p in dict.fromkeys(file_paths)],
+            fetch=True,
+        )
+        added = sum(1 for _, inserted in rows if inserted)
+        cur.close()
+    return added
+
+def claim_queue_items(worker_id: str, limit: int, lease_seconds: float,
+                      max_attempts: int, min_priority: int = 0) -> List[Tuple[int, str, str, str, int, int]]:
+    """
+    Claim up to limit queued entries (or running ones whose lease expired) for
+    worker_id with FOR UPDATE SKIP LOCKED, so concurrent workers get disjoint
+    entries. Higher priority entries are claimed first, and only entries with at
+    least min_priority are claimed. Expired entries that already used
+    max_attempts are dead-lettered instead.
+    Returns [(id, file_path, embed_model, collection, attempts, priority)].
+    """
+    with db_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            UPDATE ingest_queue SET status = 'dead', finished_at = NOW(), lease_owner = NULL,
+                last_error = COALESCE(last_error, 'lease expired')
+            WHERE status = 'running' AND lease_expires_at < NOW() AND attempts >= %s;
+            """,
+            (max_attempts,),
+        )
+        cur.execute(
+            """
+            UPDATE ingest_queue q SET status = 'running', lease_owner = %s, attempts = q.attempts + 1,
+                lease_expires_at = NOW() + make_interval(secs => %s), started_at = NOW()
+            WHERE q.id IN (
+                SELECT id FROM ingest_queue
+                WHERE ((status = 'queued' AND available_at <= NOW())
+                    OR (status = 'running' AND lease_expires_at < NOW()))
+                  AND priority >= %s
+                ORDER BY priority DESC, available_at, id
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING q.id, q.file_path, q.embed_model, q.collection, q.attempts, q.priority;
+            """,
+            (worker_id, lease_seconds, min_priority, limit),
+        )
+        rows = cur.fetchall()
+        cur.close()
+    return rows
+
+def heartbeat_queue_items(worker_id: str, ids: List[int], lease_seconds: float) -> int:
+    """
+    Extend the lease of entries still held by worker_id. Returns how many are still held.
+    """
+    if not ids:
+        return 0
+    with db_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            UPDATE ingest_queue SET lease_expires_at = NOW() + make_interval(secs => %s)
+            WHERE id = ANY(%s) AND lease_owner = %s AND status = 'running';
+            """,
+            (lease_seconds, ids, worker_id),
+        )
+        held = cur.rowcount
+        cur.close()
+    return held
+
+def complete_queue_item(item_id: int, worker_id: str):
+    with db_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            UPDATE ingest_queue SET status = 'done', finished_at = NOW(), lease_owner = NULL, last_error = NULL
+            WHERE id = %s AND lease_owner = %s;
+            """,
+            (item_id, worker_id),
+        )
+        cur.close()
+
+def fail_queue_item(item_id: int, worker_id: str, error: str, max_attempts: int, retry_delay: float):
+    """
+    Put a failed entry back in the queue with exponential backoff, or dead-letter
+    it once it has used max_attempts. Dropped instead if the path was queued
+    again while it ran, since only one queued entry per path and target may
+    exist and the queued one retries it anyway.
+    """
+    with db_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            WITH dup AS (
+                DELETE FROM ingest_queue q
+                WHERE q.id = %s AND q.lease_owner = %s AND EXISTS (
+                    SELECT 1 FROM ingest_queue o
+                    WHERE o.status = 'queued' AND o.file_path = q.file_path
+                      AND o.collection = q.collection AND o.embed_model = q.embed_model
+                )
+                RETURNING q.id
+            )
+            UPDATE ingest_queue SET
+                status = CASE WHEN attempts >= %s THEN 'dead' ELSE 'queued' END,
+                finished_at = CASE WHEN attempts >= %s THEN NOW() END,
+                available_at = NOW() + make_interval(secs => %s * power(2, GREATEST(attempts - 1, 0))),
+                lease_owner = NULL, lease_expires_at = NULL, last_error = %s
+            WHERE id = %s AND lease_owner = %s AND NOT EXISTS (SELECT 1 FROM dup);
+            """,
+            (item_id, worker_id, max_attempts, max_attempts, retry_delay, error, item_id, worker_id),
+        )
+        cur.close()
+
+def defer_queue_item(item_id: int, worker_id: str, delay: float):
+    """
+    Put an entry back in the queue after delay without counting the attempt, for
+    files another run was ingesting. Dropped instead if the path was queued again
+    meanwhile, since only one queued entry per path and target may exist.
+    """
+    with db_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            WITH dup AS (
+                DELETE FROM ingest_queue q
+                WHERE q.id = %s AND q.lease_owner = %s AND EXISTS (
+                    SELECT 1 FROM ingest_queue o
+                    WHERE o.status = 'queued' AND o.file_path = q.file_path
+                      AND o.collection = q.collection AND o.embed_model = q.embed_model
+                )
+                RETURNING q.id
+            )
+            UPDATE ingest_queue SET status = 'queued', attempts = GREATEST(attempts - 1, 0),
+                available_at = NOW() + make_interval(secs => %s),
+                lease_owner = NULL, lease_expires_at = NULL
+            WHERE id = %s AND lease_owner = %s AND NOT EXISTS (SELECT 1 FROM dup);
+            """,
+            (item_id, worker_id, delay, item_id, worker_id),
+        )
+        cur.close()
+
+def queue_counts() -> Dict[str, int]:
+    with db_conn() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT status, count(*) FROM ingest_queue GROUP BY status;")
+        counts = {status: n for status, n in cur.fetchall()}
+        cur.close()
+    return counts
+
+def queue_job_files(job_id: str) -> List[Tuple]:
+    """
+    Queue entries of a job with the checkpoint of files still being ingested:
+    [(file_path, embed_model, status, attempts, last_error, enqueued_at, started_at,
+      finished_at, committed_chunks, total_chunks)], timestamps as epoch seconds.
+    """
+    with db_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            SELECT q.file_path, q.embed_model, q.status, q.attempts, q.last_error,
+                   extract(epoch FROM q.enqueued_at), extract(epoch FROM q.started_at),
+                   extract(epoch FROM q.finished_at), p.committed_chunks, p.total_chunks
+            FROM ingest_queue q
+            LEFT JOIN ingest_progress p ON q.status = 'running' AND p.file_path = q.file_path
+                AND p.collection = q.collection AND p.embed_model = q.embed_model
+            WHERE q.job_id = %s
+            ORDER BY q.id;
+            """,
+            (job_id,),
+        )
+        rows = cur.fetchall()
+        cur.close()
+    return rows
+
+def list_queue_jobs(limit: int) -> List[Tuple[str, int, int, int, float]]:
+    """
+    Most recent queued jobs: [(job_id, entries, finished, dead, enqueued_at epoch)].
+    """
+    with db_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            SELECT job_id, count(*), count(*) FILTER (WHERE status IN ('done', 'dead')),
+                   count(*) FILTER (WHERE status = 'dead'), extract(epoch FROM min(enqueued_at))
+            FROM ingest_queue WHERE job_id IS NOT NULL
+            GROUP BY job_id ORDER BY min(enqueued_at) DESC LIMIT %s;
+            """,
+            (limit,),
+        )
+        rows = cur.fetchall()
+        cur.close()
+    return rows
+
+def purge_queue(retention_hours: float) -> int:
+    """
+    Delete finished (done) entries older than retention_hours. Dead entries are kept for inspection.
+    """
+    with db_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            "DELETE FROM ingest_queue WHERE status = 'done' AND finished_at < NOW() - make_interval(secs => %s);",
+            (retention_hours * 3600,),
+        )
+        deleted = cur.rowcount
+        cur.close()
+    return deleted
 
 def try_acquire_advisory_lock(key: int = ADVISORY_LOCK_KEY) -> Tuple[Optional[psycopg2.extensions.connection], bool]:
     """
@@ -88,4 +739,23 @@ def release_advisory_lock(conn: psycopg2.extensions.connection, key: int = ADVIS
             conn.close()
         except Exception:
             pass
-    return ok
\ No newline at end of file
+    return ok
+
+def try_lock_path(conn: psycopg2.extensions.connection, path: str) -> bool:
+    """
+    Try to take the advisory lock of one file path on conn, a dedicated
+    connection from get_db_conn(). Path locks use the two-key form, so they never
+    collide with the single-key ADVISORY_LOCK_KEY.
+    """
+    cur = conn.cursor()
+    cur.execute("SELECT pg_try_advisory_lock(%s, hashtext(%s));", (_PATH_LOCK_SPACE, path))
+    got = cur.fetchone()[0]
+    cur.close()
+    return got
+
+def unlock_path(conn: psycopg2.extensions.connection, path: str) -> bool:
+    cur = conn.cursor()
+    cur.execute("SELECT pg_advisory_unlock(%s, hashtext(%s));", (_PATH_LOCK_SPACE, path))
+    ok = cur.fetchone()[0]
+    cur.close()
+    return ok
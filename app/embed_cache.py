@@ -0,0 +1,128 @@
+import asyncio
+import threading
+from array import array
+from hashlib import sha3_256
+from typing import Dict, List, Optional, Tuple
+from .logger import setup_logging
+from .config import EMBED_CACHE_ENABLED, EMBED_CACHE_MAX_ENTRIES, EMBED_CACHE_EVICT_EVERY, EMBED_CACHE_TOUCH_SECONDS
+from .db import ensure_embedding_cache_table, get_cached_embeddings, put_cached_embeddings, evict_embedding_cache
+from .clients.ollama_client import embed_texts, aembed_texts
+from .metrics import EMBED_CACHE
+
+log = setup_logging()
+
+_lock = threading.Lock()
+_table_ready = False
+_inserts_since_evict = 0
+_stats = {"hits": 0, "misses": 0, "stored": 0, "evicted": 0, "errors": 0}
+
+def chunk_hash(text: str) -> str:
+    return sha3_256(text.encode("utf-8")).hexdigest()
+
+def _pack(vec: List[float]) -> bytes:
+    return array("f", vec).tobytes()
+
+def _unpack(data: bytes) -> List[float]:
+    vec = array("f")
+    vec.frombytes(data)
+    return vec.tolist()
+
+def _ensure_table():
+    global _table_ready
+    if not _table_ready:
+        ensure_embedding_cache_table()
+        _table_ready = True
+
+def _lookup(model: str, hashes: List[str]) -> Dict[str, bytes]:
+    try:
+        _ensure_table()
+        return get_cached_embeddings(model, hashes, EMBED_CACHE_TOUCH_SECONDS)
+    except Exception as e:
+        log.warning(f"Embedding cache lookup failed, embedding without cache: {e}")
+        with _lock:
+            _stats["errors"] += 1
+        return {}
+
+def _store(model: str, items: Dict[str, List[float]]):
+    global _inserts_since_evict
+    try:
+        put_cached_embeddings(model, [(h, len(v), _pack(v)) for h, v in items.items()])
+        with _lock:
+            _stats["stored"] += len(items)
+            _inserts_since_evict += len(items)
+            evict = _inserts_since_evict >= EMBED_CACHE_EVICT_EVERY
+            if evict:
+                _inserts_since_evict = 0
+        if evict:
+            deleted = evict_embedding_cache(EMBED_CACHE_MAX_ENTRIES)
+            with _lock:
+                _stats["evicted"] += deleted
+            if deleted:
+                log.info(f"Embedding cache evicted {deleted} least recently used entries")
+    except Exception as e:
+        log.warning(f"Embedding cache store failed: {e}")
+        with _lock:
+            _stats["errors"] += 1
+
+def _split(texts: List[str], model: str, hashes: Optional[List[str]]) -> Tuple[List[str], Dict[str, List[float]], Dict[str, str]]:
+    """
+    Look up all chunk hashes at once. Returns (hashes, found vectors, distinct missing texts).
+    """
+    hashes = hashes or [chunk_hash(t) for t in texts]
+    cached = _lookup(model, list(set(hashes)))
+
+    found: Dict[str, List[float]] = {h: _unpack(v) for h, v in cached.items()}
+    missing: Dict[str, str] = {}
+    for h, t in zip(hashes, texts):
+        if h not in found and h not in missing:
+            missing[h] = t
+
+    hits = sum(1 for h in hashes if h in found)
+    EMBED_CACHE.labels("hit").inc(hits)
+    EMBED_CACHE.labels("miss").inc(len(hashes) - hits)
+    with _lock:
+        _stats["hits"] += hits
+        _stats["misses"] += len(hashes) - hits
+    return hashes, found, missing
+
+def cached_embed_texts(texts: List[str], model: str, hashes: Optional[List[str]] = None) -> List[List[float]]:
+    """
+    Embed texts, serving repeated chunk contents from the embedding cache.
+    Only cache misses are sent to Ollama (each distinct text once); results come
+    back in input order. Cache failures never fail the embedding itself.
+    """
+    if not EMBED_CACHE_ENABLED:
+        return embed_texts(texts, model=model)
+
+    hashes, found, missing = _split(texts, model, hashes)
+    if missing:
+        fresh = embed_texts(list(missing.values()), model=model)
+        fresh_by_hash = dict(zip(missing.keys(), fresh))
+        _store(model, fresh_by_hash)
+        found.update(fresh_by_hash)
+
+    return [found[h] for h in hashes]
+
+async def acached_embed_texts(texts: List[str], model: str, hashes: Optional[List[str]] = None) -> List[List[float]]:
+    """
+    Async cached_embed_texts: cache queries run in a worker thread, misses are embedded with aembed_texts.
+    """
+    if not EMBED_CACHE_ENABLED:
+        return await aembed_texts(texts, model=model)
+
+    hashes, found, missing = await asyncio.to_thread(_split, texts, model, hashes)
+    if missing:
+        fresh = await aembed_texts(list(missing.values()), model=model)
+        fresh_by_hash = dict(zip(missing.keys(), fresh))
+        await asyncio.to_thread(_store, model, fresh_by_hash)
+        found.update(fresh_by_hash)
+
+    return [found[h] for h in hashes]
+
+def cache_stats() -> Dict[str, int]:
+    with _lock:
+        stats = dict(_stats)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else None
+    stats["enabled"] = EMBED_CACHE_ENABLED
+    return stats
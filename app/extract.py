@@ -0,0 +1,225 @@
+import asyncio
+import gzip
+import os
+import tempfile
+import threading
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+from .logger import setup_logging
+from .config import (
+    IO_BUFFER_SIZE, LOCAL_EXTRACT_ENABLED, LOCAL_EXTRACT_SUFFIXES, LOCAL_EXTRACT_MAX_BYTES,
+    EXTRACT_CACHE_ENABLED, EXTRACT_CACHE_DIR, EXTRACT_CACHE_MAX_BYTES
+)
+from .clients.tika_client import extract_text_from_path, aextract_text_from_path, decode_stream
+from .metrics import STAGE_SECONDS, EXTRACT, timed
+
+log = setup_logging()
+
+_HTML_SUFFIXES = {".html", ".htm"}
+# evict down to this fraction of EXTRACT_CACHE_MAX_BYTES, so eviction does not run on every store
+_EVICT_TO = 0.9
+
+_lock = threading.Lock()
+_evict_lock = threading.Lock()
+_cache_bytes: Optional[int] = None  # size on disk, known after the first eviction scan
+_stats = {"local": 0, "hits": 0, "misses": 0, "stored": 0, "evicted": 0, "errors": 0}
+
+class _HTMLText(HTMLParser):
+    """
+    Collect the text of an HTML document: script and style content is dropped
+    and block-level tags become line breaks, close to Tika's text/plain output.
+    """
+    _SKIP = {"script", "style", "noscript", "template"}
+    _BLOCK = {"p", "div", "br", "li", "tr", "td", "th", "h1", "h2", "h3", "h4", "h5", "h6", "title",
+              "section", "article", "header", "footer", "pre", "blockquote", "table", "ul", "ol"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self._skipping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self._SKIP:
+            self._skipping += 1
+        elif tag in self._BLOCK:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in self._SKIP:
+            self._skipping = max(0, self._skipping - 1)
+        elif tag in self._BLOCK:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if not self._skipping:
+            self.parts.append(data)
+
+def _count(key: str, n: int = 1):
+    with _lock:
+        _stats[key] += n
+
+def _read_chunks(path: Path) -> Iterator[bytes]:
+    with open(path, "rb") as fh:
+        while True:
+            chunk = fh.read(IO_BUFFER_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+def is_local_format(path: Path) -> bool:
+    """
+    Whether path is a plain-text format small enough to be decoded in-process.
+    """
+    if not LOCAL_EXTRACT_ENABLED or path.suffix.lower() not in LOCAL_EXTRACT_SUFFIXES:
+        return False
+    try:
+        return path.stat().st_size <= LOCAL_EXTRACT_MAX_BYTES
+    except OSError:
+        return False
+
+def extract_local(path: Path) -> str:
+    """
+    Decode a plain-text file without Tika: UTF-8 first, falling back to
+    charset-normalizer detection like the Tika client. HTML is reduced to its text.
+    """
+    with timed(STAGE_SECONDS, "extract"):
+        text = decode_stream(_read_chunks(path)).removeprefix("\ufeff")
+        if path.suffix.lower() in _HTML_SUFFIXES:
+            parser = _HTMLText()
+            parser.feed(text)
+            parser.close()
+            text = "".join(parser.parts)
+    EXTRACT.labels("local").inc()
+    _count("local")
+    return text
+
+def _cache_path(source_hash: str) -> Path:
+    return EXTRACT_CACHE_DIR / source_hash[:2] / f"{source_hash}.txt.gz"
+
+def _cache_get(source_hash: str) -> Optional[str]:
+    path = _cache_path(source_hash)
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as fh:
+            text = fh.read()
+        # mtime is the last use: eviction drops the least recently used entries
+        os.utime(path)
+    except FileNotFoundError:
+        _count("misses")
+        return None
+    except (OSError, EOFError, UnicodeDecodeError) as e:
+        log.warning(f"Extraction cache entry {path} is unreadable, extracting again: {e}")
+        _count("errors")
+        return None
+    EXTRACT.labels("cache").inc()
+    _count("hits")
+    return text
+
+def _cache_put(source_hash: str, text: str):
+    global _cache_bytes
+    path = _cache_path(source_hash)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # written to a temp file and renamed, so readers never see a partial entry
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6) as gz:
+                gz.write(text.encode("utf-8"))
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        size = path.stat().st_size
+    except OSError as e:
+        log.warning(f"Extraction cache store failed: {e}")
+        _count("errors")
+        return
+    with _lock:
+        _stats["stored"] += 1
+        if _cache_bytes is not None:
+            _cache_bytes += size
+        over = _cache_bytes is None or _cache_bytes > EXTRACT_CACHE_MAX_BYTES
+    if over:
+        evict_cache()
+
+def evict_cache() -> int:
+    """
+    Rescan the cache directory and delete least recently used entries until it
+    fits in EXTRACT_CACHE_MAX_BYTES. Returns the number of entries deleted.
+    """
+    global _cache_bytes
+    if not _evict_lock.acquire(blocking=False):
+        return 0  # another thread is already evicting
+    try:
+        entries = []
+        for p in EXTRACT_CACHE_DIR.glob("*/*.txt.gz"):
+            try:
+                st = p.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, p))
+        total = sum(size for _, size, _ in entries)
+        deleted = 0
+        if total > EXTRACT_CACHE_MAX_BYTES:
+            entries.sort()
+            for _, size, p in entries:
+                if total <= EXTRACT_CACHE_MAX_BYTES * _EVICT_TO:
+                    break
+                try:
+                    p.unlink()
+                except FileNotFoundError:
+                    pass
+                total -= size
+                deleted += 1
+            log.info(f"Extraction cache evicted {deleted} least recently used entries")
+        with _lock:
+            _cache_bytes = total
+            _stats["evicted"] += deleted
+        return deleted
+    finally:
+        _evict_lock.release()
+
+def extract_file_text(path: Path, source_hash: Optional[str] = None) -> str:
+    """
+    Text of a file. Plain-text formats are decoded locally; everything else goes
+    through Tika, with its output cached by source_hash when one is given.
+    """
+    if is_local_format(path):
+        return extract_local(path)
+    use_cache = EXTRACT_CACHE_ENABLED and source_hash
+    if use_cache:
+        text = _cache_get(source_hash)
+        if text is not None:
+            return text
+    text = extract_text_from_path(path)
+    EXTRACT.labels("tika").inc()
+    if use_cache:
+        _cache_put(source_hash, text)
+    return text
+
+async def aextract_file_text(path: Path, source_hash: Optional[str] = None) -> str:
+    """
+    Async extract_file_text: local decoding and cache I/O run in worker threads.
+    """
+    if is_local_format(path):
+        return await asyncio.to_thread(extract_local, path)
+    use_cache = EXTRACT_CACHE_ENABLED and source_hash
+    if use_cache:
+        text = await asyncio.to_thread(_cache_get, source_hash)
+        if text is not None:
+            return text
+    text = await aextract_text_from_path(path)
+    EXTRACT.labels("tika").inc()
+    if use_cache:
+        await asyncio.to_thread(_cache_put, source_hash, text)
+    return text
+
+def extract_stats() -> Dict[str, Any]:
+    with _lock:
+        stats = dict(_stats)
+        stats["cache_bytes"] = _cache_bytes
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else None
+    stats["local_enabled"] = LOCAL_EXTRACT_ENABLED
+    stats["cache_enabled"] = EXTRACT_CACHE_ENABLED
+    return stats
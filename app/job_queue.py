@@ -0,0 +1,287 @@
+import os
+import socket
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from .logger import setup_logging
+from .config import (
+    UPLOADS_DIR, ADVISORY_LOCK_KEY, INCREMENTAL_INGEST,
+    QUEUE_WORKERS, QUEUE_INTERACTIVE_WORKERS, QUEUE_CLAIM_BATCH, QUEUE_LEASE_SECONDS, QUEUE_HEARTBEAT_SECONDS,
+    QUEUE_MAX_ATTEMPTS, QUEUE_RETRY_DELAY, QUEUE_POLL_INTERVAL, QUEUE_RETENTION_HOURS
+)
+from .db import (
+    ensure_processed_table, enqueue_files, claim_queue_items, heartbeat_queue_items,
+    complete_queue_item, fail_queue_item, defer_queue_item, queue_counts, purge_queue,
+    queue_job_files, list_queue_jobs,
+    try_acquire_advisory_lock, release_advisory_lock
+)
+from .lanes import PRIORITY, INTERACTIVE, LaneRun, lane_for_priority
+from .processor import (
+    Target, list_files, prefilter_files, process_paths, remove_deleted_files,
+    resolve_targets, target_collections
+)
+
+log = setup_logging()
+
+# Identifies this process as lease owner; unique per replica and restart
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+QueueItem = Tuple[int, str, str, str, int, int]
+
+def new_job_id() -> str:
+    return uuid.uuid4().hex
+
+def enqueue_paths(paths: List[Path], embed_model: str = None, job_id: str = None,
+                  targets: List[Target] = None) -> Dict[str, Any]:
+    """
+    Queue paths once per target (see processor.resolve_targets), ahead of scan
+    entries: they are claimed first and run in the interactive lane.
+    """
+    added = sum(enqueue_files([str(p) for p in paths], collection, model, job_id, PRIORITY[INTERACTIVE])
+                for model, collection in resolve_targets(embed_model, targets))
+    result = {"status": "queued", "enqueued": added, "requested": len(paths)}
+    if job_id:
+        result["job_id"] = job_id
+    return result
+
+def enqueue_all(upload_dir: Path = UPLOADS_DIR, embed_model: str = None, job_id: str = None,
+                targets: List[Target] = None) -> Dict[str, Any]:
+    """
+    Scan upload_dir and queue every new or changed file for each target it is
+    missing from; files that disappeared are removed. The scan holds the advisory lock so only one replica scans at a
+    time, while ingestion itself is spread over the workers of every replica.
+    """
+    conn, got = try_acquire_advisory_lock(ADVISORY_LOCK_KEY)
+    if not got:
+        log.info("Scan already running (advisory lock held). Skipping this run.")
+        return {"status": "locked", "message": "Another scan is currently running"}
+    try:
+        ensure_processed_table()
+        targets = resolve_targets(embed_model, targets)
+        files = list_files(upload_dir)
+        todo, skipped = prefilter_files(files, targets)
+        by_target: Dict[Target, List[Path]] = {}
+        for f, _, pending in todo:
+            for target in pending:
+                by_target.setdefault(target, []).append(f)
+        enqueued = sum(enqueue_files([str(f) for f in paths], collection, model, job_id)
+                       for (model, collection), paths in by_target.items())
+        result = {"status": "queued", "enqueued": enqueued, "requested": len(todo), "skipped": len(skipped)}
+        if job_id:
+            result["job_id"] = job_id
+        if INCREMENTAL_INGEST:
+            result["deleted"] = len(remove_deleted_files(upload_dir, files, target_collections(targets)))
+        log.info(f"Scan queued {result['enqueued']} of {len(files)} files")
+        return result
+    except Exception as e:
+        log.exception("Error during enqueue_all")
+        return {"status": "error", "error": str(e)}
+    finally:
+        release_advisory_lock(conn, ADVISORY_LOCK_KEY)
+
+class QueueWorker:
+    """
+    Claims entries from ingest_queue and ingests them, QUEUE_WORKERS threads per
+    process plus QUEUE_INTERACTIVE_WORKERS that only claim interactive entries, so
+    path ingests never wait for a scan's backlog. Claims use SKIP LOCKED, so any
+    number of replicas work on disjoint files. Held entries are kept alive by a
+    heartbeat that renews their lease; an entry whose worker died is claimed
+    again once its lease expires. Failures are
+    retried with exponential backoff and dead-lettered after QUEUE_MAX_ATTEMPTS;
+    files another run is ingesting are put back without counting the attempt.
+    """
+
+    def __init__(self, workers: int = QUEUE_WORKERS, interactive_workers: int = QUEUE_INTERACTIVE_WORKERS):
+        self.workers = workers
+        self.interactive_workers = interactive_workers
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._held: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        self.stats = {"claimed": 0, "done": 0, "failed": 0, "dead": 0, "deferred": 0, "lost_leases": 0}
+
+    def start(self):
+        for i in range(self.workers):
+            self._spawn(self._work_loop, f"queue-worker-{i}")
+        for i in range(self.interactive_workers):
+            self._spawn(lambda: self._work_loop(PRIORITY[INTERACTIVE]), f"queue-interactive-{i}")
+        self._spawn(self._heartbeat_loop, "queue-heartbeat")
+        log.info(f"Queue workers started: {self.workers} + {self.interactive_workers} interactive threads "
+                 f"as {WORKER_ID}")
+
+    def stop(self):
+        self._stop.set()
+        for t in self._threads:
+            t.join(timeout=5)
+
+    def _spawn(self, target, name: str):
+        t = threading.Thread(target=target, name=name, daemon=True)
+        t.start()
+        self._threads.append(t)
+
+    def _count(self, key: str, n: int = 1):
+        with self._lock:
+            self.stats[key] += n
+
+    def _work_loop(self, min_priority: int = 0):
+        while not self._stop.is_set():
+            try:
+                items = claim_queue_items(WORKER_ID, QUEUE_CLAIM_BATCH, QUEUE_LEASE_SECONDS, QUEUE_MAX_ATTEMPTS,
+                                          min_priority)
+            except Exception:
+                log.exception("Claiming from ingest_queue failed")
+                items = []
+            if not items:
+                self._stop.wait(QUEUE_POLL_INTERVAL)
+                continue
+            self._count("claimed", len(items))
+            with self._lock:
+                self._held.update({item[0]: item[1] for item in items})
+            try:
+                # entries of one path are extracted once for all their targets, and
+                # paths with the same lane and set of targets are ingested together
+                by_path: Dict[str, List[QueueItem]] = {}
+                for item in items:
+                    by_path.setdefault(item[1], []).append(item)
+                by_targets: Dict[Tuple[str, Tuple[Target, ...]], List[QueueItem]] = {}
+                for group in by_path.values():
+                    lane = lane_for_priority(max(item[5] for item in group))
+                    key = tuple(sorted((model, collection) for _, _, model, collection, _, _ in group))
+                    by_targets.setdefault((lane, key), []).extend(group)
+                # interactive groups first
+                for lane, targets in sorted(by_targets, key=lambda k: k[0] != INTERACTIVE):
+                    try:
+                        self._run(lane, list(targets), by_targets[(lane, targets)])
+                    except Exception:
+                        # entries left running are claimed again once their lease expires
+                        log.exception(f"Queue group of {len(by_targets[(lane, targets)])} entries failed")
+            except Exception:
+                log.exception("Queue batch failed")
+            finally:
+                with self._lock:
+                    for item in items:
+                        self._held.pop(item[0], None)
+
+    def _run(self, lane: str, targets: List[Target], group: List[QueueItem]):
+        paths = list(dict.fromkeys(p for _, p, _, _, _, _ in group))
+        busy = set()
+        try:
+            with LaneRun(lane) as run:
+                results = process_paths([Path(p) for p in paths], targets=targets, lane=run)
+            errors = {r["path"]: r["error"] for r in results.get("errors", [])}
+            busy = {r["path"] for r in results.get("busy", [])}
+        except Exception as e:
+            log.exception(f"Queue batch of {len(paths)} files failed")
+            errors = {p: str(e) for p in paths}
+        for item_id, path, _, _, attempts, _ in group:
+            if path in busy:
+                defer_queue_item(item_id, WORKER_ID, QUEUE_RETRY_DELAY)
+                self._count("deferred")
+            elif path in errors:
+                fail_queue_item(item_id, WORKER_ID, errors[path], QUEUE_MAX_ATTEMPTS, QUEUE_RETRY_DELAY)
+                self._count("failed")
+                if attempts >= QUEUE_MAX_ATTEMPTS:
+                    log.error(f"Dead-lettered {path} after {attempts} attempts: {errors[path]}")
+                    self._count("dead")
+            else:
+                complete_queue_item(item_id, WORKER_ID)
+                self._count("done")
+
+    def _heartbeat_loop(self):
+        last_purge = 0.0
+        while not self._stop.wait(QUEUE_HEARTBEAT_SECONDS):
+            with self._lock:
+                ids = list(self._held)
+            try:
+                held = heartbeat_queue_items(WORKER_ID, ids, QUEUE_LEASE_SECONDS)
+                if held < len(ids):
+                    log.warning(f"Lost the lease on {len(ids) - held} queue entries")
+                    self._count("lost_leases", len(ids) - held)
+                if time.monotonic() - last_purge >= 3600:
+                    last_purge = time.monotonic()
+                    purged = purge_queue(QUEUE_RETENTION_HOURS)
+                    if purged:
+                        log.info(f"Purged {purged} finished queue entries")
+            except Exception:
+                log.exception("Queue heartbeat failed")
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"worker_id": WORKER_ID, "workers": self.workers, "interactive_workers": self.interactive_workers,
+                    "held": len(self._held), **self.stats}
+
+_worker: Optional[QueueWorker] = None
+
+def start_queue_workers(workers: int = QUEUE_WORKERS,
+                        interactive_workers: int = QUEUE_INTERACTIVE_WORKERS) -> Optional[QueueWorker]:
+    global _worker
+    if workers <= 0 and interactive_workers <= 0:
+        return None
+    _worker = QueueWorker(max(0, workers), max(0, interactive_workers))
+    _worker.start()
+    return _worker
+
+def stop_queue_workers():
+    global _worker
+    if _worker:
+        _worker.stop()
+        _worker = None
+        log.info("Queue workers stopped")
+
+def queue_stats() -> Dict[str, Any]:
+    stats: Dict[str, Any] = {"local": _worker.snapshot() if _worker else None}
+    try:
+        stats["counts"] = queue_counts()
+    except Exception:
+        log.exception("Reading queue counts failed")
+    return stats
+
+def queue_job_snapshot(job_id: str, files: bool = False) -> Optional[Dict[str, Any]]:
+    """
+    Progress of a queued job, read from ingest_queue so any replica can report it.
+    Same shape as jobs.Job.snapshot, without per-stage timings.
+    """
+    rows = queue_job_files(job_id)
+    if not rows:
+        return None
+    counts = {"queued": 0, "running": 0, "done": 0, "dead": 0}
+    chunks_done = chunks_total = 0
+    for _, _, status, _, _, _, _, _, committed, total in rows:
+        counts[status] = counts.get(status, 0) + 1
+        chunks_done += committed or 0
+        chunks_total += total or 0
+    finished = counts["done"] + counts["dead"]
+    enqueued_at = float(min(r[5] for r in rows))
+    last_finish = max((float(r[7]) for r in rows if r[7] is not None), default=None)
+    running = finished < len(rows)
+    elapsed = (time.time() if running else (last_finish or time.time())) - enqueued_at
+    files_rate = finished / elapsed if elapsed > 0 else 0.0
+    snap = {
+        "id": job_id,
+        "kind": "queue",
+        "embed_model": rows[0][1],
+        "status": "running" if running else ("finished" if not counts["dead"] else "finished_with_errors"),
+        "created_at": enqueued_at,
+        "finished_at": None if running else last_finish,
+        "elapsed_s": round(elapsed, 3),
+        "files": {"total": len(rows), "finished": finished, **counts},
+        # checkpointed chunks of the files still running
+        "chunks": {"total": chunks_total, "embedded": chunks_done},
+        "files_per_sec": round(files_rate, 3),
+        "eta_s": round((len(rows) - finished) / files_rate, 1) if running and files_rate > 0 else None,
+        "errors": [{"path": r[0], "attempts": r[3], "error": r[4]} for r in rows if r[4]][:100],
+    }
+    if files:
+        snap["file_detail"] = [
+            {"path": r[0], "state": r[2], "attempts": r[3], "error": r[4],
+             "chunks": r[9], "chunks_done": r[8]} for r in rows
+        ]
+    return snap
+
+def queue_jobs(limit: int = 50) -> List[Dict[str, Any]]:
+    return [
+        {"id": job_id, "files": {"total": total, "finished": finished, "dead": dead}, "created_at": float(created)}
+        for job_id, total, finished, dead, created in list_queue_jobs(limit)
+    ]
@@ -0,0 +1,168 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Dict, List, Optional
+from .logger import setup_logging
+from .config import JOBS_MAX_RETAINED
+
+log = setup_logging()
+
+# Per-file states, in processing order; the last four are final
+FILE_STATES = ("queued", "extract", "clean", "embed", "upsert", "done", "skipped", "deleted", "error")
+FINAL_STATES = ("done", "skipped", "deleted", "error")
+# per-file errors listed in every snapshot, like the queue-backed job view
+MAX_ERRORS = 100
+
+class Job:
+    """
+    Progress of one ingest run in this process. The processor reports into it
+    (job dicts carry it as "tracker") from any thread: which stage each file is
+    in, chunks embedded so far, and the final result of every file. snapshot()
+    turns that into counts, rates, an ETA and the time spent per stage.
+    """
+
+    def __init__(self, kind: str, embed_model: str):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.embed_model = embed_model
+        self.status = "pending"
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.error: Optional[str] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self._files: Dict[str, Dict[str, Any]] = {}
+        self._stage_seconds: Dict[str, float] = {}
+        self._chunks_done = 0
+        self._lock = threading.Lock()
+
+    def _file(self, path: str) -> Dict[str, Any]:
+        f = self._files.get(path)
+        if f is None:
+            f = self._files[path] = {"state": "queued", "since": time.monotonic(), "chunks": None, "chunks_done": 0}
+        return f
+
+    def _move(self, f: Dict[str, Any], state: str):
+        now = time.monotonic()
+        if f["state"] not in FINAL_STATES and f["state"] != "queued":
+            self._stage_seconds[f["state"]] = self._stage_seconds.get(f["state"], 0.0) + now - f["since"]
+        f["state"], f["since"] = state, now
+
+    def add_files(self, paths: List[str]):
+        with self._lock:
+            for p in paths:
+                self._file(p)
+
+    def file_state(self, path: str, state: str):
+        with self._lock:
+            self._move(self._file(path), state)
+
+    def set_chunks(self, path: str, total: int):
+        with self._lock:
+            self._file(path)["chunks"] = total
+
+    def add_chunks(self, path: str, n: int):
+        with self._lock:
+            self._file(path)["chunks_done"] += n
+            self._chunks_done += n
+
+    def finish_file(self, path: str, result: Dict[str, Any]):
+        if result.get("error") is not None:
+            state = "error"
+        elif result.get("deleted"):
+            state = "deleted"
+        elif result.get("skipped"):
+            state = "skipped"
+        else:
+            state = "done"
+        with self._lock:
+            f = self._file(path)
+            if f["state"] != state:
+                self._move(f, state)
+            if state == "error":
+                f["error"] = result["error"]
+            if "points" in result:
+                f["points"] = result["points"]
+
+    async def arun(self, run: Awaitable[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Await an ingest run (a guarded_* call) and record its outcome.
+        """
+        self.status, self.started_at = "running", time.time()
+        try:
+            out = await run
+        except Exception as e:
+            log.exception(f"Job {self.id} failed")
+            out = {"status": "error", "error": str(e)}
+        self.finished_at = time.time()
+        self.status = out.get("status", "finished")
+        self.error = out.get("error")
+        self.result = out
+        return {**out, "job_id": self.id}
+
+    def snapshot(self, files: bool = False) -> Dict[str, Any]:
+        with self._lock:
+            counts = {s: 0 for s in FILE_STATES}
+            chunks_total = 0
+            for f in self._files.values():
+                counts[f["state"]] += 1
+                chunks_total += f["chunks"] or 0
+            total = len(self._files)
+            finished = sum(counts[s] for s in FINAL_STATES)
+            chunks_done = self._chunks_done
+            stage_seconds = {k: round(v, 3) for k, v in self._stage_seconds.items()}
+            errors = [{"path": p, "error": f["error"]} for p, f in self._files.items() if f["state"] == "error"]
+            detail = [
+                {"path": p, **{k: v for k, v in f.items() if k != "since"}} for p, f in self._files.items()
+            ] if files else None
+
+        end = self.finished_at or time.time()
+        elapsed = end - self.started_at if self.started_at else 0.0
+        files_rate = finished / elapsed if elapsed > 0 else 0.0
+        eta = None
+        if self.status == "running" and files_rate > 0:
+            eta = round((total - finished) / files_rate, 1)
+        snap = {
+            "id": self.id,
+            "kind": self.kind,
+            "embed_model": self.embed_model,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "elapsed_s": round(elapsed, 3),
+            "files": {"total": total, "finished": finished, **counts},
+            "chunks": {"total": chunks_total, "embedded": chunks_done},
+            "files_per_sec": round(files_rate, 3),
+            "chunks_per_sec": round(chunks_done / elapsed, 3) if elapsed > 0 else 0.0,
+            "eta_s": eta,
+            # time files spent in each stage, summed; in-flight counts above show where work piles up
+            "stage_seconds": stage_seconds,
+            "error": self.error,
+            "errors": errors[:MAX_ERRORS],
+        }
+        if detail is not None:
+            snap["file_detail"] = detail
+        return snap
+
+_jobs: "OrderedDict[str, Job]" = OrderedDict()
+_jobs_lock = threading.Lock()
+
+def create_job(kind: str, embed_model: str) -> Job:
+    job = Job(kind, embed_model)
+    with _jobs_lock:
+        _jobs[job.id] = job
+        # forget the oldest finished jobs beyond JOBS_MAX_RETAINED
+        excess = len(_jobs) - JOBS_MAX_RETAINED
+        for jid in [j.id for j in _jobs.values() if j.finished_at is not None][:max(0, excess)]:
+            del _jobs[jid]
+    return job
+
+def get_job(job_id: str) -> Optional[Job]:
+    with _jobs_lock:
+        return _jobs.get(job_id)
+
+def list_jobs() -> List[Job]:
+    with _jobs_lock:
+        return list(reversed(_jobs.values()))
@@ -0,0 +1,220 @@
+import asyncio
+import threading
+import time
+from typing import Any, Dict, Set
+from .logger import setup_logging
+from .config import (
+    LANE_INTERACTIVE_MAX_FILES, LANE_BULK_MAX_FILES, LANE_BULK_YIELD_SECONDS, LANE_PATH_LOCK_WAIT
+)
+from .db import get_db_conn, try_lock_path, unlock_path
+
+log = setup_logging()
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+
+# ingest_queue priority of each lane; higher is claimed first
+PRIORITY = {INTERACTIVE: 10, BULK: 0}
+
+# how often a waiting interactive run retries a path held by another run
+_LOCK_POLL_SECONDS = 0.25
+# how often an async run re-checks for a free lane slot or the end of interactive runs
+_SLOT_POLL_SECONDS = 0.05
+
+class Lane:
+    """
+    Scheduling state of one priority class in this process: how many runs are
+    active, a cap on files in flight (None = no cap) and counters for /health.
+    """
+
+    def __init__(self, name: str, max_files: int):
+        self.name = name
+        self.max_files = max_files if max_files > 0 else None
+        self._slots = threading.BoundedSemaphore(max_files) if max_files > 0 else None
+        self.active_runs = 0
+        self.in_flight = 0
+        self.stats = {"runs": 0, "files": 0, "busy": 0, "yielded": 0, "yield_seconds": 0.0}
+
+    def snapshot(self) -> Dict[str, Any]:
+        with _cond:
+            return {"max_files": self.max_files, "active_runs": self.active_runs,
+                    "in_flight": self.in_flight, **self.stats,
+                    "yield_seconds": round(self.stats["yield_seconds"], 3)}
+
+# guards the lane counters; bulk runs wait on it for interactive runs to finish
+_cond = threading.Condition()
+_lanes = {
+    INTERACTIVE: Lane(INTERACTIVE, LANE_INTERACTIVE_MAX_FILES),
+    BULK: Lane(BULK, LANE_BULK_MAX_FILES),
+}
+
+def lane_for_priority(priority: int) -> str:
+    return INTERACTIVE if priority > PRIORITY[BULK] else BULK
+
+class LaneRun:
+    """
+    One ingest run in a lane. The processor calls acquire_file() before a file
+    and release_file() once it is finished:
+
+    - a bulk run waits while interactive runs are active in this process, up to
+      LANE_BULK_YIELD_SECONDS per file, so path ingests are not stuck behind a scan
+    - every file takes a slot of its lane (LANE_*_MAX_FILES)
+    - every file takes a per-path advisory lock on the run's own connection, so
+      two runs, in this or another replica, never ingest the same path at once;
+      an interactive run waits up to LANE_PATH_LOCK_WAIT for it, a bulk run skips
+      the path (it is picked up by the next scan)
+
+    acquire_file() returns False when the file should be reported as busy.
+    """
+
+    def __init__(self, lane: str):
+        self.lane = _lanes[lane]
+        self._conn = None
+        self._conn_lock = threading.Lock()
+        self._held: Set[str] = set()
+        self._started = False
+
+    def begin(self) -> "LaneRun":
+        with _cond:
+            self.lane.active_runs += 1
+            self.lane.stats["runs"] += 1
+        self._started = True
+        return self
+
+    def end(self):
+        if not self._started:
+            return
+        self._started = False
+        for path in list(self._held):
+            self.release_file(path)
+        with self._conn_lock:
+            if self._conn is not None:
+                try:
+                    self._conn.close()
+                except Exception:
+                    pass
+                self._conn = None
+        with _cond:
+            self.lane.active_runs -= 1
+            _cond.notify_all()
+
+    def __enter__(self) -> "LaneRun":
+        return self.begin()
+
+    def __exit__(self, *exc):
+        self.end()
+
+    def _yield_to_interactive(self):
+        interactive = _lanes[INTERACTIVE]
+        with _cond:
+            if not interactive.active_runs:
+                return
+            t0 = time.monotonic()
+            _cond.wait_for(lambda: not interactive.active_runs, timeout=LANE_BULK_YIELD_SECONDS)
+            self.lane.stats["yielded"] += 1
+            self.lane.stats["yield_seconds"] += time.monotonic() - t0
+
+    def _try_lock(self, path: str) -> bool:
+        with self._conn_lock:
+            if self._conn is None:
+                self._conn = get_db_conn()
+                self._conn.autocommit = True
+            if try_lock_path(self._conn, path):
+                self._held.add(path)
+                return True
+            return False
+
+    def _unlock(self, path: str):
+        # callers hold _conn_lock
+        try:
+            unlock_path(self._conn, path)
+        except Exception:
+            log.exception(f"Releasing the path lock of {path} failed")
+        self._held.discard(path)
+
+    def _release_slot(self):
+        if self.lane._slots is not None:
+            self.lane._slots.release()
+
+    def _account(self, path: str, got: bool) -> bool:
+        with _cond:
+            if got:
+                self.lane.in_flight += 1
+                self.lane.stats["files"] += 1
+            else:
+                self.lane.stats["busy"] += 1
+        if not got:
+            self._release_slot()
+            log.info(f"{path} is being ingested by another run; {self.lane.name} run skips it")
+        return got
+
+    def acquire_file(self, path) -> bool:
+        path = str(path)
+        if self.lane.name == BULK:
+            self._yield_to_interactive()
+        if self.lane._slots is not None:
+            self.lane._slots.acquire()
+        try:
+            got = self._try_lock(path)
+            if not got and self.lane.name == INTERACTIVE:
+                deadline = time.monotonic() + LANE_PATH_LOCK_WAIT
+                while not got and time.monotonic() < deadline:
+                    time.sleep(_LOCK_POLL_SECONDS)
+                    got = self._try_lock(path)
+        except BaseException:
+            self._release_slot()
+            raise
+        return self._account(path, got)
+
+    def release_file(self, path):
+        path = str(path)
+        with self._conn_lock:
+            if path not in self._held:
+                return
+            self._unlock(path)
+        with _cond:
+            self.lane.in_flight -= 1
+        self._release_slot()
+
+    # The async variants wait on the event loop rather than in worker threads:
+    # a slot is only freed by arelease_file(), which itself needs a thread of the
+    # loop's default executor, so blocking those threads on a slot can deadlock.
+    # Only the short, non-blocking lock attempts go through asyncio.to_thread.
+
+    async def _ayield_to_interactive(self):
+        interactive = _lanes[INTERACTIVE]
+        if not interactive.active_runs:
+            return
+        t0 = time.monotonic()
+        deadline = t0 + LANE_BULK_YIELD_SECONDS
+        while interactive.active_runs and time.monotonic() < deadline:
+            await asyncio.sleep(_SLOT_POLL_SECONDS)
+        with _cond:
+            self.lane.stats["yielded"] += 1
+            self.lane.stats["yield_seconds"] += time.monotonic() - t0
+
+    async def aacquire_file(self, path) -> bool:
+        path = str(path)
+        if self.lane.name == BULK:
+            await self._ayield_to_interactive()
+        slots = self.lane._slots
+        if slots is not None:
+            while not slots.acquire(blocking=False):
+                await asyncio.sleep(_SLOT_POLL_SECONDS)
+        try:
+            got = await asyncio.to_thread(self._try_lock, path)
+            if not got and self.lane.name == INTERACTIVE:
+                deadline = time.monotonic() + LANE_PATH_LOCK_WAIT
+                while not got and time.monotonic() < deadline:
+                    await asyncio.sleep(_LOCK_POLL_SECONDS)
+                    got = await asyncio.to_thread(self._try_lock, path)
+        except BaseException:
+            self._release_slot()
+            raise
+        return self._account(path, got)
+
+    async def arelease_file(self, path):
+        await asyncio.to_thread(self.release_file, path)
+
+def lane_stats() -> Dict[str, Any]:
+    return {name: lane.snapshot() for name, lane in _lanes.items()}
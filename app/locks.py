@@ -1,14 +1,17 @@
-from .processor import process_file, process_all
+import asyncio
+from .processor import process_paths, process_all, aprocess_paths, aprocess_all
 from .db import try_acquire_advisory_lock, release_advisory_lock
+from .lanes import INTERACTIVE, BULK, LaneRun
 from .config import ADVISORY_LOCK_KEY, UPLOADS_DIR
 
 import logging
 
 log = logging.getLogger("ingest-service")
 
-def guarded_process_all(upload_dir=UPLOADS_DIR, embed_model=None):
+def guarded_process_all(upload_dir=UPLOADS_DIR, embed_model=None, tracker=None, targets=None):
     """
     Try to obtain a Postgres advisory lock, and only run process_all if lock obtained.
+    The scan runs in the bulk lane (see lanes.LaneRun), so it yields to path ingests.
     Returns a dict with a status field: 'started', 'locked', or results.
     """
     conn, got = try_acquire_advisory_lock(ADVISORY_LOCK_KEY)
@@ -17,7 +20,8 @@ def guarded_process_all(upload_dir=UPLOADS_DIR, embed_model=None):
         return {"status": "locked", "message": "Another ingest is currently running"}
     try:
         log.info("Advisory lock acquired — starting ingestion")
-        results = process_all(upload_dir, embed_model=embed_model)
+        with LaneRun(BULK) as lane:
+            results = process_all(upload_dir, embed_model=embed_model, tracker=tracker, targets=targets, lane=lane)
         return {"status": "finished", "results": results}
     except Exception as e:
         log.exception("Error during guarded_process_all")
@@ -26,19 +30,44 @@ def guarded_process_all(upload_dir=UPLOADS_DIR, embed_model=None):
         released = release_advisory_lock(conn, ADVISORY_LOCK_KEY)
         log.info(f"Advisory lock released: {released}")
 
-def guarded_process_all_for_paths(paths, embed_model=None):
-    conn, got = try_acquire_advisory_lock(ADVISORY_LOCK_KEY)
+def guarded_process_all_for_paths(paths, embed_model=None, tracker=None, targets=None):
+    """
+    Ingest paths in the interactive lane. This does not take the scan lock: a
+    running scan yields to it, and per-path locks keep the two off the same file.
+    """
+    with LaneRun(INTERACTIVE) as lane:
+        results = process_paths(paths, embed_model=embed_model, tracker=tracker, targets=targets, lane=lane)
+    return {"status": "finished", "results": results}
+
+async def aguarded_process_all(upload_dir=UPLOADS_DIR, embed_model=None, tracker=None, targets=None):
+    """
+    Async guarded_process_all: the advisory lock is taken in a worker thread and
+    ingestion runs on the event loop.
+    """
+    conn, got = await asyncio.to_thread(try_acquire_advisory_lock, ADVISORY_LOCK_KEY)
     if not got:
-        return {"status": "locked"}
+        log.info("Ingest already running (advisory lock held). Skipping this run.")
+        return {"status": "locked", "message": "Another ingest is currently running"}
     try:
-        results = {"processed": [], "skipped": []}
-        for p in paths:
-            if p.exists() and p.is_file():
-                r = process_file(p, embed_model=embed_model)
-                if r.get("skipped"):
-                    results["skipped"].append(r)
-                else:
-                    results["processed"].append(r)
+        log.info("Advisory lock acquired — starting ingestion")
+        lane = LaneRun(BULK).begin()
+        try:
+            results = await aprocess_all(upload_dir, embed_model=embed_model, tracker=tracker, targets=targets,
+                                         lane=lane)
+        finally:
+            await asyncio.to_thread(lane.end)
         return {"status": "finished", "results": results}
+    except Exception as e:
+        log.exception("Error during aguarded_process_all")
+        return {"status": "error", "error": str(e)}
+    finally:
+        released = await asyncio.to_thread(release_advisory_lock, conn, ADVISORY_LOCK_KEY)
+        log.info(f"Advisory lock released: {released}")
+
+async def aguarded_process_all_for_paths(paths, embed_model=None, tracker=None, targets=None):
+    lane = LaneRun(INTERACTIVE).begin()
+    try:
+        results = await aprocess_paths(paths, embed_model=embed_model, tracker=tracker, targets=targets, lane=lane)
     finally:
-        release_advisory_lock(conn, ADVISORY_LOCK_KEY)
+        await asyncio.to_thread(lane.end)
+    return {"status": "finished", "results": results}
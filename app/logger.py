@@ -8,4 +8,6 @@ def setup_logging():
         format="%(asctime)s %(levelname)s [%(name)s] %(message)s",
     )
     # extra loggers can be configured here if needed
+    # httpx logs every request at INFO; keep that out of ingest logs
+    logging.getLogger("httpx").setLevel(max(level, logging.WARNING))
     return logging.getLogger("ingest-service")
\ No newline at end of file
@@ -0,0 +1,113 @@
+import time
+from contextlib import nullcontext
+from typing import Any, Iterable, Optional
+from .config import METRICS_ENABLED
+from .logger import setup_logging
+
+try:
+    import prometheus_client
+    from prometheus_client.core import GaugeMetricFamily
+except ImportError:  # optional: metrics are disabled without it
+    prometheus_client = None
+
+log = setup_logging()
+
+ENABLED = METRICS_ENABLED and prometheus_client is not None
+if METRICS_ENABLED and prometheus_client is None:
+    log.warning("METRICS_ENABLED is set but prometheus_client is not installed; metrics are disabled")
+
+# Ingest latencies range from milliseconds (DB, small upserts) to minutes (Tika on large files)
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+class _Noop:
+    """
+    Stands in for every metric when metrics are disabled.
+    """
+    def labels(self, *args, **kwargs):
+        return self
+
+    def observe(self, value: float):
+        pass
+
+    def inc(self, value: float = 1):
+        pass
+
+_NOOP = _Noop()
+_NULL = nullcontext()
+
+def _histogram(name: str, doc: str, labels: Iterable[str] = ()):
+    if not ENABLED:
+        return _NOOP
+    return prometheus_client.Histogram(name, doc, list(labels), buckets=LATENCY_BUCKETS)
+
+def _counter(name: str, doc: str, labels: Iterable[str] = ()):
+    if not ENABLED:
+        return _NOOP
+    return prometheus_client.Counter(name, doc, list(labels))
+
+# stage: read_hash, extract, clean, chunk, embed, upsert
+STAGE_SECONDS = _histogram("ingest_stage_seconds", "Time per ingest stage call", ["stage"])
+EMBED_REQUEST_SECONDS = _histogram("ingest_embed_request_seconds", "Latency of one Ollama /api/embed request")
+EMBED_CHUNK_SECONDS = _histogram("ingest_embed_chunk_seconds", "Ollama request latency divided by chunks in the batch")
+DB_SECONDS = _histogram("ingest_db_seconds", "Time a pooled DB connection is held per db_conn() block")
+BACKEND_SECONDS = _histogram("ingest_backend_request_seconds", "Latency per backend request, incl. retries", ["backend"])
+
+# kind: hashed (bytes read for hashing), extract (bytes sent to Tika), upsert (bytes sent to Qdrant)
+BYTES = _counter("ingest_bytes", "Bytes processed", ["kind"])
+# result: processed, skipped, deleted, error
+FILES = _counter("ingest_files", "Files by outcome", ["result"])
+# source: embedded (sent to Ollama), reused (taken from the previous version of a file)
+CHUNKS = _counter("ingest_chunks", "Chunks by where their vector came from", ["source"])
+EMBED_CACHE = _counter("ingest_embed_cache", "Embedding cache lookups", ["result"])
+# source: local (decoded in-process), cache (extraction cache hit), tika
+EXTRACT = _counter("ingest_extract", "Text extractions by source", ["source"])
+RETRIES = _counter("ingest_http_retries", "HTTP retries", ["backend"])
+BACKEND_ERRORS = _counter("ingest_backend_errors", "Backend requests that failed after retries", ["backend"])
+
+class _Timer:
+    __slots__ = ("metric", "t0")
+
+    def __init__(self, metric):
+        self.metric = metric
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metric.observe(time.perf_counter() - self.t0)
+        return False
+
+def timed(metric, *labels: str):
+    """
+    Context manager observing the block's duration on a histogram; a shared
+    null context when metrics are disabled.
+    """
+    if not ENABLED:
+        return _NULL
+    return _Timer(metric.labels(*labels) if labels else metric)
+
+class _BackendCollector:
+    """
+    In-flight requests and current limit of every backend, read from the limiters at scrape time.
+    """
+    def collect(self):
+        from .clients.adaptive import limiter_stats
+        in_flight = GaugeMetricFamily("ingest_backend_in_flight", "Requests in flight per backend", labels=["backend"])
+        limit = GaugeMetricFamily("ingest_backend_limit", "Current in-flight limit per backend", labels=["backend"])
+        for name, s in limiter_stats().items():
+            in_flight.add_metric([name], s["in_flight"])
+            limit.add_metric([name], s["limit"])
+        yield in_flight
+        yield limit
+
+if ENABLED:
+    prometheus_client.REGISTRY.register(_BackendCollector())
+
+def render() -> Optional[Any]:
+    """
+    (body, content type) of the Prometheus exposition, or None when disabled.
+    """
+    if not ENABLED:
+        return None
+    return prometheus_client.generate_latest(prometheus_client.REGISTRY), prometheus_client.CONTENT_TYPE_LATEST
@@ -0,0 +1,88 @@
+import queue
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from .logger import setup_logging
+
+log = setup_logging()
+
+Job = Dict[str, Any]
+Stage = Tuple[str, Callable[[Job], Job], int]
+
+_DONE = object()
+
+def run_pipeline(jobs: Iterable[Job], stages: List[Stage], queue_size: int = 8,
+                 on_finish: Optional[Callable[[Job], None]] = None) -> List[Job]:
+    """
+    Run jobs through a chain of stages, each with its own pool of worker threads.
+    Stages are connected by bounded queues, so a slow stage applies backpressure
+    upstream instead of letting work pile up in memory.
+
+    stages is a list of (name, func, workers). func takes a job dict and returns it.
+    A job that carries a "result" key is finished and passes through the remaining
+    stages untouched. An exception in a stage finishes the job with an error result.
+    on_finish, if given, is called with each job as it leaves the last stage.
+    Returns the finished jobs in input order.
+    """
+    queues = [queue.Queue(maxsize=max(1, queue_size)) for _ in range(len(stages) + 1)]
+    threads: List[threading.Thread] = []
+
+    def feed():
+        for i, job in enumerate(jobs):
+            job["_index"] = i
+            queues[0].put(job)
+        for _ in range(max(1, stages[0][2])):
+            queues[0].put(_DONE)
+
+    def make_worker(stage_idx: int, remaining: List[int], lock: threading.Lock):
+        name, func, _ = stages[stage_idx]
+        inbox, outbox = queues[stage_idx], queues[stage_idx + 1]
+        next_workers = max(1, stages[stage_idx + 1][2]) if stage_idx + 1 < len(stages) else 1
+
+        def work():
+            while True:
+                job = inbox.get()
+                if job is _DONE:
+                    break
+                if "result" not in job:
+                    try:
+                        job = func(job)
+                    except Exception as exc:
+                        log.exception(f"Error in pipeline stage '{name}' for {job.get('path')}: {exc}")
+                        job["result"] = {"path": str(job.get("path")), "error": str(exc)}
+                outbox.put(job)
+            # the last worker of a stage to finish signals every worker of the next one
+            with lock:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last:
+                for _ in range(next_workers):
+                    outbox.put(_DONE)
+
+        return work
+
+    threads.append(threading.Thread(target=feed, name="pipeline-feed", daemon=True))
+    for stage_idx, (name, _, workers) in enumerate(stages):
+        workers = max(1, workers)
+        remaining, lock = [workers], threading.Lock()
+        for n in range(workers):
+            threads.append(threading.Thread(
+                target=make_worker(stage_idx, remaining, lock),
+                name=f"pipeline-{name}-{n}",
+                daemon=True,
+            ))
+    for t in threads:
+        t.start()
+
+    finished: List[Job] = []
+    while True:
+        job = queues[-1].get()
+        if job is _DONE:
+            break
+        if on_finish is not None:
+            on_finish(job)
+        finished.append(job)
+    for t in threads:
+        t.join()
+
+    finished.sort(key=lambda j: j["_index"])
+    return finished
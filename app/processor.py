@@ -1,24 +1,100 @@
+import asyncio
+import mmap
 import uuid
 import datetime
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Tuple
 from .logger import setup_logging
 from .config import (
-    CHUNK_MAX_CHARS, CHUNK_OVERLAP, UPSERT_BATCH_SIZE,
-    UPLOADS_DIR, OLLAMA_EMBED_MODEL, QDRANT_COLLECTION
+    CHECKPOINT_CHUNKS,
+    UPLOADS_DIR, QDRANT_COLLECTION, INGEST_TARGETS,
+    PIPELINE_ENABLED, PIPELINE_EXTRACT_WORKERS, PIPELINE_CLEAN_WORKERS,
+    PIPELINE_EMBED_WORKERS, PIPELINE_UPSERT_WORKERS, PIPELINE_QUEUE_SIZE,
+    IO_BUFFER_SIZE, HASH_MMAP_THRESHOLD, ASYNC_FILE_CONCURRENCY, INCREMENTAL_INGEST, QDRANT_NORMALIZE_VECTORS
 )
-from .db import ensure_processed_table, already_ingested, mark_as_processed
-from .clients.tika_client import extract_text
-from .clients.ollama_client import embed_text
-from .clients.qdrant_client import upsert_points
-from .chunker import chunk_text
-from .cleaner import clean_text
+from .db import (
+    ensure_processed_table, mark_as_processed,
+    get_ingest_progress, save_ingest_progress, clear_ingest_progress,
+    ingested_targets, load_scan_manifest, update_scan_manifest,
+    get_source_file, get_source_files, set_source_file, tombstone_source_file, list_live_source_files
+)
+from .extract import extract_file_text, aextract_file_text
+from .clients.qdrant_client import (
+    upsert_points_parallel, aupsert_points_parallel, scroll_points, delete_points_by_filter, normalize_vector
+)
+from .cpu_pool import run_clean_and_chunk, arun_clean_and_chunk
+from .embed_cache import cached_embed_texts, acached_embed_texts, chunk_hash
+from .tokens import chunk_limits
+from .pipeline import run_pipeline
+from .metrics import STAGE_SECONDS, BYTES, FILES, CHUNKS, timed
 from hashlib import sha3_256
 
 log = setup_logging()
 
-def sha3_256_bytes(b: bytes) -> str:
-    return sha3_256(b).hexdigest()
+POINT_ID_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "ingest-service/points")
+
+# (embed_model, collection)
+Target = Tuple[str, str]
+
+def resolve_targets(embed_model: str = None, targets: List[Target] = None) -> List[Target]:
+    """
+    Targets of an ingest run: the given ones, else embed_model into
+    QDRANT_COLLECTION, else INGEST_TARGETS.
+    """
+    if targets:
+        return list(dict.fromkeys(tuple(t) for t in targets))
+    if embed_model:
+        return [(embed_model, QDRANT_COLLECTION)]
+    return list(INGEST_TARGETS)
+
+def target_collections(targets: List[Target]) -> List[str]:
+    return list(dict.fromkeys(c for _, c in targets))
+
+def _pending_targets(files: List[Tuple[str, str]], targets: List[Target]) -> Dict[str, List[Target]]:
+    """
+    {path: targets it still has to be ingested into} for (path, source_hash) pairs,
+    in bulk queries. A target is pending while the content is not ingested there;
+    with INCREMENTAL_INGEST also while it is not the path's current version in the
+    target's collection (new, renamed or changed paths, including content that is
+    already ingested under another path).
+    """
+    collections = target_collections(targets)
+    done = ingested_targets(list({h for _, h in files}), collections)
+    current = get_source_files(list({p for p, _ in files}), collections) if INCREMENTAL_INGEST else {}
+    pending = {}
+    for path, source_hash in files:
+        pending[path] = [
+            t for t in targets
+            if t not in done.get(source_hash, ()) or (INCREMENTAL_INGEST and current.get((path, t[1])) != source_hash)
+        ]
+    return pending
+
+def sha3_256_file(path: Path, buf_size: int = IO_BUFFER_SIZE) -> str:
+    """
+    Hash a file without loading it: large files through mmap, others in buf_size reads.
+    """
+    h = sha3_256()
+    with timed(STAGE_SECONDS, "read_hash"), open(path, "rb") as fh:
+        size = fh.seek(0, 2)
+        BYTES.labels("hashed").inc(size)
+        fh.seek(0)
+        if size >= HASH_MMAP_THRESHOLD:
+            with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                view = memoryview(mm)
+                try:
+                    for i in range(0, size, buf_size):
+                        h.update(view[i:i + buf_size])
+                finally:
+                    view.release()
+        else:
+            buf = bytearray(buf_size)
+            view = memoryview(buf)
+            while True:
+                n = fh.readinto(buf)
+                if not n:
+                    break
+                h.update(view[:n])
+    return h.hexdigest()
 
 def list_files(upload_dir: Path) -> List[Path]:
     files = []
@@ -27,62 +103,595 @@ def list_files(upload_dir: Path) -> List[Path]:
             files.append(p)
     return sorted(files)
 
-def process_file(path: Path, embed_model: str = None) -> Dict[str, Any]:
-    embed_model = embed_model or OLLAMA_EMBED_MODEL
+def prefilter_files(files: List[Path], targets: List[Target] = None) -> Tuple[List[Tuple[Path, str, List[Target]]], List[Dict[str, Any]]]:
+    """
+    Decide which files need processing with as little I/O as possible.
+    Files whose size and mtime match the scan manifest are not read again: their
+    recorded hash is used. Only the rest are read and hashed, and all hash
+    lookups run as bulk queries. A file is skipped once it is ingested into every
+    target (see _pending_targets).
+    Returns ([(path, source_hash, pending targets) to process], [skipped results]).
+    """
+    targets = resolve_targets(targets=targets)
+    stats = {}
+    for f in files:
+        try:
+            st = f.stat()
+        except FileNotFoundError:
+            continue
+        stats[str(f)] = (f, st.st_size, st.st_mtime_ns)
+
+    manifest = load_scan_manifest(list(stats.keys()))
+    skipped: List[Dict[str, Any]] = []
+    candidates: List[Tuple[Path, str, bool]] = []
+    manifest_rows = []
+    for key, (f, size, mtime_ns) in stats.items():
+        known = manifest.get(key)
+        if known and known[0] == size and known[1] == mtime_ns:
+            candidates.append((f, known[2], False))
+            continue
+        source_hash = sha3_256_file(f)
+        candidates.append((f, source_hash, True))
+        manifest_rows.append((key, size, mtime_ns, source_hash))
+
+    pending = _pending_targets([(str(f), h) for f, h, _ in candidates], targets)
+    todo: List[Tuple[Path, str, List[Target]]] = []
+    for f, source_hash, was_hashed in candidates:
+        if pending[str(f)]:
+            todo.append((f, source_hash, pending[str(f)]))
+            continue
+        if was_hashed:
+            log.info(f"Skipping (already ingested): {f}")
+        skipped.append({"skipped": True, "path": str(f)})
+    update_scan_manifest(manifest_rows)
+    log.info(f"Prefilter: {len(stats)} files, {len(stats) - len(manifest_rows)} known by stat, "
+             f"{len(manifest_rows)} hashed, {len(todo)} to process")
+    return todo, skipped
+
+# Stage functions. Each takes a job dict and returns it; a job carrying a "result"
+# key is finished. process_file runs them back to back (with embed and upsert
+# fused per checkpoint window), process_all can run them as a pipeline with one
+# worker pool per stage. Extraction and cleaning run once per file; the chunks are
+# then embedded and upserted once per target, each through its own target job
+# (the file job plus embed_model and collection) in job["target_jobs"].
+
+def _track(job: Dict[str, Any], event: str, *args):
+    """
+    Report progress to the job's tracker (see jobs.Job), if it has one.
+    """
+    tracker = job.get("tracker")
+    if tracker is not None:
+        getattr(tracker, event)(str(job["path"]), *args)
+
+def _busy(path: Path) -> Dict[str, Any]:
+    # another run holds the path (see lanes.LaneRun); it is left for that run
+    return {"skipped": True, "busy": True, "path": str(path)}
+
+def _release_lane(job: Dict[str, Any]):
+    lane = job.get("lane")
+    if lane is not None:
+        lane.release_file(job["path"])
+
+def _stage_extract(job: Dict[str, Any]) -> Dict[str, Any]:
+    path = job["path"]
+    lane = job.get("lane")
+    if lane is not None and not lane.acquire_file(path):
+        job["result"] = _busy(path)
+        return job
     log.info(f"Processing file {path}")
-    text_bytes = path.read_bytes()
-    source_hash = sha3_256_bytes(text_bytes)
-    if already_ingested(source_hash):
-        log.info(f"Skipping (already ingested): {path}")
-        return {"skipped": True, "path": str(path)}
-
-    dirty_text = extract_text(text_bytes)
-    text = clean_text(dirty_text)
-    if not text or not text.strip():
+    _track(job, "file_state", "extract")
+    if not job.get("source_hash"):
+        # not prefiltered: hash and check this file on its own
+        job["source_hash"] = sha3_256_file(path)
+        job["targets"] = _pending_targets([(str(path), job["source_hash"])], job["targets"])[str(path)]
+        if not job["targets"]:
+            log.info(f"Skipping (already ingested): {path}")
+            job["result"] = {"skipped": True, "path": str(path)}
+            return job
+    job["dirty_text"] = extract_file_text(path, job["source_hash"])
+    return job
+
+def _target_job(job: Dict[str, Any], target: Target) -> Dict[str, Any]:
+    embed_model, collection = target
+    tjob = {"path": job["path"], "source_hash": job["source_hash"], "tracker": job.get("tracker"),
+            "chunks": job["chunks"], "chunk_hashes": job["chunk_hashes"],
+            "embed_model": embed_model, "collection": collection}
+    if INCREMENTAL_INGEST:
+        _plan_incremental(tjob)
+    return tjob
+
+def _set_chunks(job: Dict[str, Any], chunks: List[str]) -> Dict[str, Any]:
+    path = job["path"]
+    job["chunks"] = chunks
+    job["chunk_hashes"] = [chunk_hash(c) for c in chunks]
+    _track(job, "set_chunks", len(chunks) * len(job["targets"]))
+    job["target_jobs"] = [_target_job(job, t) for t in job["targets"]]
+    if not chunks:
         log.warning(f"No text extracted for {path}; marking as processed with 0 points.")
-        mark_as_processed(str(path), source_hash, QDRANT_COLLECTION, 0)
-        return {"skipped": False, "path": str(path), "points": 0}
+        for tjob in job["target_jobs"]:
+            _finish(tjob, 0)
+        return _finish_file(job)
+    log.info(f"File {path} produced {len(job['chunks'])} chunks for {len(job['targets'])} target(s).")
+    return job
+
+def _chunk_limits(job: Dict[str, Any]) -> Tuple[int, int]:
+    # chunks are shared by all targets, so they are sized for the tightest model
+    return chunk_limits([model for model, _ in job["targets"]])
+
+def _stage_clean_chunk(job: Dict[str, Any]) -> Dict[str, Any]:
+    _track(job, "file_state", "clean")
+    return _set_chunks(job, run_clean_and_chunk(job.pop("dirty_text"), *_chunk_limits(job)))
+
+def _source_file_filter(path: str, exclude_hash: str = None, only_hash: str = None) -> Dict[str, Any]:
+    flt: Dict[str, Any] = {"must": [{"key": "source_file", "match": {"value": path}}]}
+    if only_hash:
+        flt["must"].append({"key": "source_hash", "match": {"value": only_hash}})
+    if exclude_hash:
+        flt["must_not"] = [{"key": "source_hash", "match": {"value": exclude_hash}}]
+    return flt
+
+def _plan_incremental(job: Dict[str, Any]):
+    """
+    Load vectors that can be copied instead of embedded: chunks of this path's
+    previous version that also appear in the new one, and, when the same content
+    is already ingested under another path (a rename or a copy), all of its chunks.
+    """
+    path, collection = str(job["path"]), job["collection"]
+    previous = get_source_file(path, collection)
+    job["previous_hash"] = previous
+    if previous == job["source_hash"] or not job["chunks"]:
+        return
+    sources = []
+    if previous:
+        sources.append(_source_file_filter(path, only_hash=previous))
+    if (job["embed_model"], collection) in ingested_targets([job["source_hash"]], [collection]).get(job["source_hash"], ()):
+        sources.append({"must": [{"key": "source_hash", "match": {"value": job["source_hash"]}}]})
+    wanted = set(job["chunk_hashes"])
+    reuse: Dict[str, List[float]] = {}
+    for flt in sources:
+        for point in scroll_points(collection, flt, with_payload=["chunk_hash", "embed_model"], with_vector=True):
+            payload = point.get("payload") or {}
+            h = payload.get("chunk_hash")
+            if h in wanted and payload.get("embed_model") == job["embed_model"] and isinstance(point.get("vector"), list):
+                reuse[h] = point["vector"]
+        if len(reuse) == len(wanted):
+            break
+    if sources:
+        job["reuse_vectors"] = reuse
+        log.info(f"{path}: reusing {len(reuse)} of {len(wanted)} distinct chunks already stored in {collection}")
+
+def _delete_stale_tail(job: Dict[str, Any], points_count: int):
+    """
+    Delete points of this version beyond its last chunk. An earlier run that was
+    interrupted under different chunk boundaries (its checkpoint no longer matches,
+    so ingest restarted at 0) can have left them behind.
+    """
+    flt = {"must": [
+        {"key": "source_hash", "match": {"value": job["source_hash"]}},
+        {"key": "embed_model", "match": {"value": job["embed_model"]}},
+        {"key": "chunkIndex", "range": {"gte": points_count}},
+    ]}
+    if INCREMENTAL_INGEST:
+        flt["must"].append({"key": "source_file", "match": {"value": str(job["path"])}})
+    delete_points_by_filter(job["collection"], flt)
+
+def _replace_previous(job: Dict[str, Any]):
+    """
+    Make this version the current one for its path: drop the previous version's
+    points (unchanged chunks were re-upserted under the new source_hash).
+    """
+    path, previous, collection = str(job["path"]), job.get("previous_hash"), job["collection"]
+    if previous and previous != job["source_hash"]:
+        delete_points_by_filter(collection, _source_file_filter(path, exclude_hash=job["source_hash"]))
+        log.info(f"Deleted points of previous version {previous[:12]} of {path} from {collection}")
+    elif not previous and job["chunks"]:
+        # first version tracked for this path: drop copies stored under content-only point IDs
+        flt = _source_file_filter(path, only_hash=job["source_hash"])
+        flt["must_not"] = [{"has_id": [point_id(job["source_hash"], i, job["embed_model"], path)
+                                       for i in range(len(job["chunks"]))]}]
+        delete_points_by_filter(collection, flt)
+    set_source_file(path, collection, job["source_hash"], previous_hash=previous)
+
+def forget_paths(paths: List[str], collections: List[str] = None) -> List[Dict[str, Any]]:
+    """
+    Delete the points of files that no longer exist and leave a tombstone for them,
+    in every collection (default: those of INGEST_TARGETS).
+    """
+    deleted = []
+    for path in paths:
+        forgotten = False
+        for collection in collections or target_collections(INGEST_TARGETS):
+            if get_source_file(path, collection) is None:
+                continue
+            delete_points_by_filter(collection, _source_file_filter(path))
+            tombstone_source_file(path, collection)
+            forgotten = True
+        if forgotten:
+            log.info(f"Removed deleted file {path}")
+            deleted.append({"path": path, "deleted": True})
+    return deleted
+
+def remove_deleted_files(upload_dir: Path, present: List[Path], collections: List[str] = None) -> List[Dict[str, Any]]:
+    """
+    Tombstone every tracked path under upload_dir that is not in present.
+    """
+    prefix = str(upload_dir).rstrip("/") + "/"
+    present_set = {str(p) for p in present}
+    collections = collections or target_collections(INGEST_TARGETS)
+    gone = {p for c in collections for p in list_live_source_files(c, prefix) if p not in present_set}
+    return forget_paths(sorted(gone), collections)
+
+def _split_reused(job: Dict[str, Any], start: int, chunks: List[str]) -> Tuple[List[Any], List[int], List[str]]:
+    """
+    Vectors for chunks[start:...] reusable from the previous version (None where
+    not), plus the indices and hashes that still need embedding.
+    """
+    hashes = job["chunk_hashes"][start:start + len(chunks)]
+    reuse = job.get("reuse_vectors") or {}
+    vectors = [reuse.get(h) for h in hashes]
+    missing = [i for i, v in enumerate(vectors) if v is None]
+    if reuse:
+        CHUNKS.labels("reused").inc(len(chunks) - len(missing))
+    return vectors, missing, hashes
+
+def _embed_window(job: Dict[str, Any], start: int, chunks: List[str]) -> List[List[float]]:
+    vectors, missing, hashes = _split_reused(job, start, chunks)
+    if missing:
+        fresh = cached_embed_texts([chunks[i] for i in missing], model=job["embed_model"],
+                                   hashes=[hashes[i] for i in missing])
+        for i, vec in zip(missing, fresh):
+            vectors[i] = vec
+    _track(job, "add_chunks", len(chunks))
+    return vectors
+
+async def _aembed_window(job: Dict[str, Any], start: int, chunks: List[str]) -> List[List[float]]:
+    vectors, missing, hashes = _split_reused(job, start, chunks)
+    if missing:
+        fresh = await acached_embed_texts([chunks[i] for i in missing], model=job["embed_model"],
+                                          hashes=[hashes[i] for i in missing])
+        for i, vec in zip(missing, fresh):
+            vectors[i] = vec
+    _track(job, "add_chunks", len(chunks))
+    return vectors
+
+def point_id(source_hash: str, chunk_index: int, embed_model: str, source_file: str = None) -> str:
+    """
+    Deterministic point ID, so re-ingesting the same chunk overwrites its point
+    instead of adding a copy. With INCREMENTAL_INGEST points belong to a path
+    (source_file), so two paths with the same content keep their own points.
+    """
+    key = f"{source_hash}:{chunk_index}:{embed_model}"
+    if source_file:
+        key = f"{source_file}:{key}"
+    return str(uuid.uuid5(POINT_ID_NAMESPACE, key))
 
-    chunks = chunk_text(text, CHUNK_MAX_CHARS, CHUNK_OVERLAP)
-    log.info(f"File {path} produced {len(chunks)} chunks.")
+def _resume_point(job: Dict[str, Any]) -> int:
+    """
+    Index of the first chunk not yet committed by an earlier, interrupted run.
+    """
+    progress = get_ingest_progress(job["source_hash"], job["collection"], job["embed_model"])
+    start = 0
+    # with INCREMENTAL_INGEST a checkpoint only covers the points of its own path
+    if progress and progress[1] == len(job["chunks"]) and (not INCREMENTAL_INGEST or progress[2] == str(job["path"])):
+        start = progress[0]
+        log.info(f"Resuming {job['path']} at chunk {start}/{len(job['chunks'])} for {job['embed_model']}@{job['collection']}")
+    job["start_chunk"] = start
+    return start
 
+def _build_points(job: Dict[str, Any], start: int, chunks: List[str], vectors: List[List[float]]) -> List[Dict[str, Any]]:
+    path, source_hash = job["path"], job["source_hash"]
     points = []
-    for idx, chunk in enumerate(chunks):
-        vec = embed_text(chunk, model=embed_model)
-        point_id = str(uuid.uuid4())
+    for idx, (chunk, vec) in enumerate(zip(chunks, vectors), start):
+        if QDRANT_NORMALIZE_VECTORS:
+            vec = normalize_vector(vec)
         points.append({
-            "id": point_id,
+            "id": point_id(source_hash, idx, job["embed_model"], str(path) if INCREMENTAL_INGEST else None),
             "vector": vec,
             "payload": {
                 "source_file": str(path),
                 "filename": str(path.name),
                 "source_hash": source_hash,
                 "chunkIndex": idx,
+                "chunk_hash": job["chunk_hashes"][idx],
+                "embed_model": job["embed_model"],
                 "text": chunk,
                 "ingested_at": datetime.datetime.utcnow().isoformat()
             }
         })
+    return points
 
-    for i in range(0, len(points), UPSERT_BATCH_SIZE):
-        batch = points[i:i+UPSERT_BATCH_SIZE]
-        upsert_points(batch, collection=QDRANT_COLLECTION)
+def _upsert_window(job: Dict[str, Any], start: int, chunks: List[str], vectors: List[List[float]]):
+    """
+    Upsert the points of chunks[start:start+len(chunks)] and checkpoint the file past them.
+    """
+    upsert_points_parallel(_build_points(job, start, chunks, vectors), collection=job["collection"])
+    save_ingest_progress(job["source_hash"], job["collection"], job["embed_model"], str(job["path"]),
+                         start + len(chunks), len(job["chunks"]))
 
-    mark_as_processed(str(path), source_hash, QDRANT_COLLECTION, len(points))
-    return {"skipped": False, "path": str(path), "points": len(points)}
+def _finish(job: Dict[str, Any], points_count: int) -> Dict[str, Any]:
+    """
+    Finish one target job: make it the current version and record it as processed.
+    The replacement comes first, so a crash in between leaves the file unprocessed
+    and the next run replaces the previous version again (both steps are idempotent).
+    """
+    path = job["path"]
+    _delete_stale_tail(job, points_count)
+    if INCREMENTAL_INGEST:
+        _replace_previous(job)
+    mark_as_processed(str(path), job["source_hash"], job["collection"], job["embed_model"], points_count)
+    clear_ingest_progress(job["source_hash"], job["collection"], job["embed_model"])
+    job.pop("reuse_vectors", None)
+    job.pop("chunks", None)
+    job["result"] = {"embed_model": job["embed_model"], "collection": job["collection"], "points": points_count}
+    return job
 
-def process_all(upload_dir: Path = None, embed_model: str = None):
+def _finish_file(job: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Finish a file job once every target job has finished.
+    """
+    per_target = [t.pop("result") for t in job.pop("target_jobs")]
+    job.pop("chunks", None)
+    job["result"] = {"skipped": False, "path": str(job["path"]), "points": sum(r["points"] for r in per_target)}
+    if len(per_target) > 1:
+        job["result"]["targets"] = per_target
+    _track(job, "finish_file", job["result"])
+    return job
+
+def _stage_embed(job: Dict[str, Any]) -> Dict[str, Any]:
+    _track(job, "file_state", "embed")
+    for tjob in job["target_jobs"]:
+        start = _resume_point(tjob)
+        tjob["vectors"] = _embed_window(tjob, start, tjob["chunks"][start:])
+    return job
+
+def _stage_upsert(job: Dict[str, Any]) -> Dict[str, Any]:
+    _track(job, "file_state", "upsert")
+    for tjob in job["target_jobs"]:
+        chunks, vectors, start = tjob["chunks"], tjob.pop("vectors"), tjob["start_chunk"]
+        for w in range(start, len(chunks), CHECKPOINT_CHUNKS):
+            window = chunks[w:w+CHECKPOINT_CHUNKS]
+            _upsert_window(tjob, w, window, vectors[w-start:w-start+len(window)])
+        _finish(tjob, len(chunks))
+    return _finish_file(job)
+
+def _stage_embed_upsert(job: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Sequential embed + upsert, one target and checkpoint window at a time, so a
+    crash loses at most CHECKPOINT_CHUNKS chunks of embedding work.
+    """
+    _track(job, "file_state", "embed")
+    for tjob in job["target_jobs"]:
+        chunks = tjob["chunks"]
+        for w in range(_resume_point(tjob), len(chunks), CHECKPOINT_CHUNKS):
+            window = chunks[w:w+CHECKPOINT_CHUNKS]
+            _upsert_window(tjob, w, window, _embed_window(tjob, w, window))
+        _finish(tjob, len(chunks))
+    return _finish_file(job)
+
+_STAGES = [_stage_extract, _stage_clean_chunk, _stage_embed_upsert]
+
+def process_file(path: Path, embed_model: str = None, source_hash: str = None, tracker=None,
+                 targets: List[Target] = None) -> Dict[str, Any]:
+    """
+    Ingest one file into every target (see resolve_targets). Pass source_hash when
+    the file was already hashed and targets narrowed to those it is missing from
+    (see prefilter_files), and a jobs.Job as tracker to report progress into it.
+    """
+    job = {"path": path, "source_hash": source_hash, "targets": resolve_targets(embed_model, targets),
+           "tracker": tracker}
+    for stage in _STAGES:
+        job = stage(job)
+        if "result" in job:
+            break
+    return job["result"]
+
+def _collect(results: Dict[str, list], r: Dict[str, Any], tracker=None):
+    if tracker is not None:
+        tracker.finish_file(r["path"], r)
+    if r.get("error") is not None:
+        results.setdefault("errors", []).append(r)
+        FILES.labels("error").inc()
+    elif r.get("busy"):
+        results.setdefault("busy", []).append(r)
+        FILES.labels("busy").inc()
+    elif r.get("skipped"):
+        results["skipped"].append(r)
+        FILES.labels("skipped").inc()
+    else:
+        results["processed"].append(r)
+        FILES.labels("processed").inc()
+
+def process_all_pipelined(files: List[Tuple[Path, str, List[Target]]], tracker=None,
+                          lane=None) -> Dict[str, list]:
+    """
+    Process prefiltered files through the staged pipeline: extraction,
+    cleaning/chunking, embedding and upsert each run on their own worker pool, so
+    Tika, Ollama and Qdrant are kept busy at the same time. With a lanes.LaneRun,
+    a file takes its lane slot and path lock when it enters extraction and gives
+    them back when it leaves the pipeline. Returns the same shape as process_all.
+    """
+    stages = [
+        ("extract", _stage_extract, PIPELINE_EXTRACT_WORKERS),
+        ("clean", _stage_clean_chunk, PIPELINE_CLEAN_WORKERS),
+        ("embed", _stage_embed, PIPELINE_EMBED_WORKERS),
+        ("upsert", _stage_upsert, PIPELINE_UPSERT_WORKERS),
+    ]
+    jobs = [{"path": f, "source_hash": h, "targets": targets, "tracker": tracker, "lane": lane}
+            for f, h, targets in files]
+    results = {"processed": [], "skipped": []}
+    for job in run_pipeline(jobs, stages, queue_size=PIPELINE_QUEUE_SIZE, on_finish=_release_lane):
+        _collect(results, job["result"], tracker)
+    return results
+
+def _track_prefilter(tracker, files: List[Path], skipped: List[Dict[str, Any]]):
+    FILES.labels("skipped").inc(len(skipped))
+    if tracker is not None:
+        tracker.add_files([str(f) for f in files])
+        for r in skipped:
+            tracker.finish_file(r["path"], r)
+
+def process_files(files: List[Path], embed_model: str = None, tracker=None,
+                  targets: List[Target] = None, lane=None) -> Dict[str, list]:
+    """
+    Prefilter files in bulk, then ingest the remaining ones sequentially or
+    through the pipeline (PIPELINE_ENABLED). With a lanes.LaneRun, each file is
+    ingested under its lane's limits and path lock; files held by another run are
+    returned under "busy".
+    """
+    todo, skipped = prefilter_files(files, resolve_targets(embed_model, targets))
+    _track_prefilter(tracker, files, skipped)
+    if PIPELINE_ENABLED:
+        results = process_all_pipelined(todo, tracker=tracker, lane=lane)
+    else:
+        results = {"processed": [], "skipped": []}
+        for f, source_hash, pending in todo:
+            if lane is not None and not lane.acquire_file(f):
+                _collect(results, _busy(f), tracker)
+                continue
+            try:
+                r = process_file(f, source_hash=source_hash, tracker=tracker, targets=pending)
+                _collect(results, r, tracker)
+            except Exception as exc:
+                log.exception(f"Error processing {f}: {exc}")
+                _collect(results, {"path": str(f), "error": str(exc)}, tracker)
+            finally:
+                if lane is not None:
+                    lane.release_file(f)
+    results["skipped"] = skipped + results["skipped"]
+    return results
+
+def _collect_deleted(results: Dict[str, list], deleted: List[Dict[str, Any]], tracker=None):
+    if deleted:
+        results["deleted"] = deleted
+        FILES.labels("deleted").inc(len(deleted))
+    if tracker is not None:
+        for r in deleted:
+            tracker.finish_file(r["path"], r)
+
+def process_paths(paths: List[Path], embed_model: str = None, tracker=None,
+                  targets: List[Target] = None, lane=None) -> Dict[str, list]:
+    """
+    Ingest the given paths; with INCREMENTAL_INGEST, paths that no longer exist are
+    removed first, so a renamed file is ingested under its new path before the next scan.
+    """
+    targets = resolve_targets(embed_model, targets)
+    files = [p for p in paths if p.exists() and p.is_file()]
+    deleted = []
+    if INCREMENTAL_INGEST:
+        gone = [str(p) for p in paths if not p.exists()]
+        deleted = forget_paths(gone, target_collections(targets))
+    results = process_files(files, tracker=tracker, targets=targets, lane=lane)
+    _collect_deleted(results, deleted, tracker)
+    return results
+
+def process_all(upload_dir: Path = None, embed_model: str = None, tracker=None, targets: List[Target] = None,
+                lane=None):
     ensure_processed_table()
+    targets = resolve_targets(embed_model, targets)
     upload_dir = upload_dir or UPLOADS_DIR
     files = list_files(upload_dir)
+    deleted = remove_deleted_files(upload_dir, files, target_collections(targets)) if INCREMENTAL_INGEST else []
+    results = process_files(files, tracker=tracker, targets=targets, lane=lane)
+    _collect_deleted(results, deleted, tracker)
+    return results
+
+
+# Async path: network stages are awaited on the shared async clients, blocking
+# DB/file work runs in worker threads and cleaning on the process pool.
+
+async def _aembed_upsert_target(tjob: Dict[str, Any]):
+    chunks = tjob["chunks"]
+    start = await asyncio.to_thread(_resume_point, tjob)
+    for w in range(start, len(chunks), CHECKPOINT_CHUNKS):
+        window = chunks[w:w+CHECKPOINT_CHUNKS]
+        vectors = await _aembed_window(tjob, w, window)
+        await aupsert_points_parallel(_build_points(tjob, w, window, vectors), collection=tjob["collection"])
+        await asyncio.to_thread(save_ingest_progress, tjob["source_hash"], tjob["collection"],
+                                tjob["embed_model"], str(tjob["path"]), w + len(window), len(chunks))
+    await asyncio.to_thread(_finish, tjob, len(chunks))
+
+async def aprocess_file(path: Path, embed_model: str = None, source_hash: str = None, tracker=None,
+                        targets: List[Target] = None) -> Dict[str, Any]:
+    """
+    Async process_file; the targets of a file are embedded and upserted concurrently.
+    """
+    job = {"path": path, "source_hash": source_hash, "targets": resolve_targets(embed_model, targets),
+           "tracker": tracker}
+    log.info(f"Processing file {path}")
+    _track(job, "file_state", "extract")
+    if not job["source_hash"]:
+        source_hash = job["source_hash"] = await asyncio.to_thread(sha3_256_file, path)
+        pending = await asyncio.to_thread(_pending_targets, [(str(path), source_hash)], job["targets"])
+        job["targets"] = pending[str(path)]
+        if not job["targets"]:
+            log.info(f"Skipping (already ingested): {path}")
+            return {"skipped": True, "path": str(path)}
+
+    dirty_text = await aextract_file_text(path, job["source_hash"])
+    _track(job, "file_state", "clean")
+    chunks = await arun_clean_and_chunk(dirty_text, *_chunk_limits(job))
+    del dirty_text
+    job = await asyncio.to_thread(_set_chunks, job, chunks)
+    if "result" in job:
+        return job["result"]
+
+    _track(job, "file_state", "embed")
+    await asyncio.gather(*(_aembed_upsert_target(tjob) for tjob in job["target_jobs"]))
+    return _finish_file(job)["result"]
+
+async def aprocess_files(files: List[Path], embed_model: str = None, tracker=None,
+                         targets: List[Target] = None, lane=None) -> Dict[str, list]:
+    """
+    Async process_files: up to ASYNC_FILE_CONCURRENCY files are in flight at once,
+    bounded further by each backend's in-flight limit.
+    """
+    todo, skipped = await asyncio.to_thread(prefilter_files, files, resolve_targets(embed_model, targets))
+    _track_prefilter(tracker, files, skipped)
+    sem = asyncio.Semaphore(max(1, ASYNC_FILE_CONCURRENCY))
+
     results = {"processed": [], "skipped": []}
-    for f in files:
-        try:
-            r = process_file(f, embed_model=embed_model)
-            if r.get("skipped"):
-                results["skipped"].append(r)
-            else:
-                results["processed"].append(r)
-        except Exception as exc:
-            log.exception(f"Error processing {f}: {exc}")
-            results.setdefault("errors", []).append({"path": str(f), "error": str(exc)})
-    return results
\ No newline at end of file
+
+    async def run_one(f: Path, source_hash: str, pending: List[Target]):
+        async with sem:
+            if lane is not None and not await lane.aacquire_file(f):
+                _collect(results, _busy(f), tracker)
+                return
+            try:
+                r = await aprocess_file(f, source_hash=source_hash, tracker=tracker, targets=pending)
+            except Exception as exc:
+                log.exception(f"Error processing {f}: {exc}")
+                r = {"path": str(f), "error": str(exc)}
+            finally:
+                if lane is not None:
+                    await lane.arelease_file(f)
+            # collected as each file finishes, so progress and metrics stay current
+            _collect(results, r, tracker)
+
+    await asyncio.gather(*(run_one(f, h, pending) for f, h, pending in todo))
+    results["skipped"] = skipped + results["skipped"]
+    return results
+
+async def aprocess_paths(paths: List[Path], embed_model: str = None, tracker=None,
+                         targets: List[Target] = None, lane=None) -> Dict[str, list]:
+    targets = resolve_targets(embed_model, targets)
+    files = [p for p in paths if p.exists() and p.is_file()]
+    deleted = []
+    if INCREMENTAL_INGEST:
+        gone = [str(p) for p in paths if not p.exists()]
+        deleted = await asyncio.to_thread(forget_paths, gone, target_collections(targets))
+    results = await aprocess_files(files, tracker=tracker, targets=targets, lane=lane)
+    _collect_deleted(results, deleted, tracker)
+    return results
+
+async def aprocess_all(upload_dir: Path = None, embed_model: str = None, tracker=None,
+                       targets: List[Target] = None, lane=None):
+    await asyncio.to_thread(ensure_processed_table)
+    targets = resolve_targets(embed_model, targets)
+    upload_dir = upload_dir or UPLOADS_DIR
+    files = await asyncio.to_thread(list_files, upload_dir)
+    deleted = []
+    if INCREMENTAL_INGEST:
+        deleted = await asyncio.to_thread(remove_deleted_files, upload_dir, files, target_collections(targets))
+    results = await aprocess_files(files, tracker=tracker, targets=targets, lane=lane)
+    _collect_deleted(results, deleted, tracker)
+    return results
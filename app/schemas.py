@@ -1,7 +1,13 @@
 from pydantic import BaseModel
 from typing import Optional, List
 
+class IngestTarget(BaseModel):
+    model_id: str
+    collection: Optional[str] = None
+
 class IngestRequest(BaseModel):
     model_id: Optional[str] = None
+    # several (model, collection) targets; each file is extracted once for all of them
+    targets: Optional[List[IngestTarget]] = None
     paths: Optional[List[str]] = None
     sync: Optional[bool] = False
\ No newline at end of file
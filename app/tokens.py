@@ -0,0 +1,122 @@
+import math
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+from .config import (
+    CHUNK_MODE, CHUNK_MAX_CHARS, CHUNK_OVERLAP, CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS,
+    CHUNK_CHARS_PER_TOKEN, CHUNK_TOKEN_MARGIN, EMBED_BATCH_SIZE, EMBED_BATCH_MAX_CHARS
+)
+
+# Weight of each new /api/embed call in a model's running chars-per-token average
+_ALPHA = 0.2
+# Calls whose prompt_eval_count reaches this share of inputs * context were likely truncated
+_TRUNCATED = 0.98
+# Chunks are shrunk by at most this share so that one more fits into a char-bounded batch
+_MAX_PACK_SHRINK = 0.1
+
+# Fixed sample, shaped like cleaned text (lowercased, stopwords removed), whose
+# token count calibrates the chars-per-token estimate that sizes chunks
+CALIBRATION_TEXT = (
+    "artículo 1 . objeto . presente ley tiene objeto regular procedimiento administrativo común "
+    "administración pública , requisito validez eficacia acto administrativo , "
+    "responsabilidad patrimonial potestad sancionadora . artículo 2 . ámbito aplicación . "
+    "ley aplicará sector público , comprende administración general estado , "
+    "administración comunidad autónoma entidad integran administración local . "
+    "interesado podrá interponer recurso alzada plazo mes , contado día siguiente "
+    "notificación resolución , conforme dispuesto artículo 121 122 ley 39/2015 ."
+)
+
+_lock = threading.Lock()
+# per model: the frozen estimate that sizes chunks, and the live average reported by /health
+_calibrated: Dict[str, float] = {}
+_chars_per_token: Dict[str, float] = {}
+_samples: Dict[str, int] = {}
+_context: Dict[str, int] = {}
+
+def set_context_length(model: str, tokens: int):
+    with _lock:
+        _context[model] = tokens
+
+def context_length(model: str) -> Optional[int]:
+    with _lock:
+        return _context.get(model)
+
+def calibrate(model: str, chars: int, tokens: int):
+    """
+    Fix the model's chars-per-token estimate for chunk sizing from one embed call
+    of CALIBRATION_TEXT. It never moves afterwards, so the same document always
+    gets the same chunk boundaries (and chunk hashes) for a model.
+    """
+    if chars <= 0 or not tokens or tokens <= 0:
+        return
+    with _lock:
+        _calibrated[model] = chars / tokens
+
+def observe(model: str, chars: int, tokens: int, inputs: int):
+    """
+    Fold one /api/embed call (characters sent, prompt_eval_count) into the
+    model's live average, which is only reported. Calls that look truncated at
+    the context length are ignored, since they undercount tokens.
+    """
+    if chars <= 0 or not tokens or tokens <= 0:
+        return
+    with _lock:
+        ctx = _context.get(model)
+        if ctx and tokens >= inputs * ctx * _TRUNCATED:
+            return
+        ratio = chars / tokens
+        prev = _chars_per_token.get(model)
+        _chars_per_token[model] = ratio if prev is None else prev + _ALPHA * (ratio - prev)
+        _samples[model] = _samples.get(model, 0) + 1
+
+def chars_per_token(model: str) -> float:
+    """
+    The calibrated estimate of a model, or CHUNK_CHARS_PER_TOKEN until it is calibrated.
+    """
+    with _lock:
+        return _calibrated.get(model, CHUNK_CHARS_PER_TOKEN)
+
+def max_tokens(model: str) -> int:
+    ctx = context_length(model)
+    return min(CHUNK_MAX_TOKENS, ctx) if ctx else CHUNK_MAX_TOKENS
+
+def _pack(max_chars: int) -> int:
+    """
+    When embed batches are bounded by EMBED_BATCH_MAX_CHARS rather than by
+    EMBED_BATCH_SIZE, shrink max_chars slightly if that lets one more full-size
+    chunk fit into each batch.
+    """
+    if max_chars * EMBED_BATCH_SIZE <= EMBED_BATCH_MAX_CHARS:
+        return max_chars
+    packed = EMBED_BATCH_MAX_CHARS // math.ceil(EMBED_BATCH_MAX_CHARS / max_chars)
+    return packed if packed >= max_chars * (1 - _MAX_PACK_SHRINK) else max_chars
+
+def chunk_limits(models: List[str]) -> Tuple[int, int]:
+    """
+    (max_chars, overlap) for text embedded by all of models. In tokens mode the
+    tightest model decides, sized with its calibrated chars-per-token estimate
+    rounded down to 0.1.
+    """
+    if CHUNK_MODE != "tokens" or not models:
+        return CHUNK_MAX_CHARS, CHUNK_OVERLAP
+    max_chars = overlap = None
+    for model in models:
+        cpt = math.floor(chars_per_token(model) * 10) / 10
+        m = max(1, int(max_tokens(model) * cpt * CHUNK_TOKEN_MARGIN))
+        o = int(CHUNK_OVERLAP_TOKENS * cpt)
+        max_chars = m if max_chars is None else min(max_chars, m)
+        overlap = o if overlap is None else min(overlap, o)
+    max_chars = _pack(max_chars)
+    # a chunk ends at least 30% into its window (see chunker), so this keeps start advancing
+    return max_chars, min(overlap, max_chars // 4)
+
+def token_stats() -> Dict[str, Any]:
+    with _lock:
+        models = set(_calibrated) | set(_chars_per_token) | set(_context)
+        per_model = {
+            m: {"chars_per_token": round(_calibrated.get(m, CHUNK_CHARS_PER_TOKEN), 3),
+                "calibrated": m in _calibrated,
+                "observed_chars_per_token": round(_chars_per_token[m], 3) if m in _chars_per_token else None,
+                "samples": _samples.get(m, 0), "context_length": _context.get(m)}
+            for m in sorted(models)
+        }
+    return {"mode": CHUNK_MODE, "models": per_model}
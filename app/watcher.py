@@ -0,0 +1,242 @@
+import os
+import stat
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from .logger import setup_logging
+from .config import (
+    WATCH_BACKEND, WATCH_DEBOUNCE_SECONDS, WATCH_STABLE_SECONDS, WATCH_POLL_INTERVAL, WATCH_BATCH_MAX
+)
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:  # optional: the polling watcher is used instead
+    Observer = None
+    FileSystemEventHandler = object
+
+log = setup_logging()
+
+# Partial uploads and editor temp files are never ingested
+IGNORED_SUFFIXES = (".part", ".tmp", ".crdownload", ".swp", "~")
+
+FileStat = Optional[Tuple[int, int]]
+_UNSEEN = object()
+
+def _ignored(path: str) -> bool:
+    name = os.path.basename(path)
+    return name.startswith(".") or name.endswith(IGNORED_SUFFIXES)
+
+def _stat(path: str) -> FileStat:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    if not stat.S_ISREG(st.st_mode):
+        return None
+    return st.st_size, st.st_mtime_ns
+
+def _walk(root: str) -> Dict[str, FileStat]:
+    """
+    (size, mtime) of every file under root, from directory entries only (no reads).
+    """
+    found: Dict[str, FileStat] = {}
+    stack = [root]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.is_file() and not _ignored(entry.path):
+                            st = entry.stat()
+                            found[entry.path] = (st.st_size, st.st_mtime_ns)
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+    return found
+
+class ChangeDebouncer:
+    """
+    Collects changed paths and releases each one once it has settled: no event
+    for `debounce` seconds and size/mtime unchanged for `stable` seconds, so a
+    file still being copied is not ingested half-written. Deleted paths are
+    released after the debounce alone.
+    """
+
+    def __init__(self, debounce: float, stable: float):
+        self.debounce = debounce
+        self.stable = stable
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def touch(self, path: str):
+        if _ignored(path):
+            return
+        now = time.monotonic()
+        with self._lock:
+            entry = self._pending.get(path)
+            if entry is None:
+                self._pending[path] = {"event": now, "stat": _UNSEEN, "since": now}
+            else:
+                entry["event"] = now
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def ready(self, limit: int) -> List[str]:
+        now = time.monotonic()
+        out = []
+        with self._lock:
+            for path, entry in list(self._pending.items()):
+                if len(out) >= limit:
+                    break
+                if now - entry["event"] < self.debounce:
+                    continue
+                st = _stat(path)
+                if st != entry["stat"]:
+                    entry["stat"], entry["since"] = st, now
+                    if st is not None:
+                        continue
+                elif st is not None and now - entry["since"] < self.stable:
+                    continue
+                del self._pending[path]
+                out.append(path)
+        return out
+
+class _EventHandler(FileSystemEventHandler):
+    def __init__(self, debouncer: ChangeDebouncer):
+        self.debouncer = debouncer
+
+    def on_any_event(self, event):
+        if event.event_type not in ("created", "modified", "moved", "deleted", "closed"):
+            return
+        targets = [event.src_path]
+        if event.event_type == "moved":
+            targets.append(event.dest_path)
+        if event.is_directory:
+            # a directory moved or copied in only reports itself
+            if event.event_type in ("created", "moved"):
+                for path in _walk(targets[-1]):
+                    self.debouncer.touch(path)
+            return
+        for path in targets:
+            self.debouncer.touch(path)
+
+class FileWatcher:
+    """
+    Feeds settled changes under root to handler(paths) in batches of at most
+    WATCH_BATCH_MAX. Events come from inotify (watchdog) when available, or from
+    a stat-only poll of the tree every WATCH_POLL_INTERVAL seconds. A batch the
+    handler reports as 'locked' is queued again.
+    """
+
+    def __init__(self, root: Path, handler: Callable[[List[Path]], Dict[str, Any]], backend: str = WATCH_BACKEND):
+        self.root = str(root)
+        self.handler = handler
+        self.debouncer = ChangeDebouncer(WATCH_DEBOUNCE_SECONDS, WATCH_STABLE_SECONDS)
+        self.backend = self._pick_backend(backend)
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._observer = None
+        self.stats = {"batches": 0, "paths": 0, "requeued": 0, "errors": 0, "last_batch_at": None}
+
+    @staticmethod
+    def _pick_backend(backend: str) -> str:
+        if backend == "polling":
+            return "polling"
+        if Observer is None:
+            if backend == "watchdog":
+                log.warning("WATCH_BACKEND=watchdog but watchdog is not installed; falling back to polling")
+            return "polling"
+        return "watchdog"
+
+    def start(self):
+        if self.backend == "watchdog":
+            self._observer = Observer()
+            self._observer.schedule(_EventHandler(self.debouncer), self.root, recursive=True)
+            self._observer.daemon = True
+            self._observer.start()
+        else:
+            self._spawn(self._poll_loop, "watch-poll")
+        self._spawn(self._dispatch_loop, "watch-dispatch")
+        log.info(f"Watching {self.root} for changes ({self.backend})")
+
+    def stop(self):
+        self._stop.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join(timeout=5)
+        for t in self._threads:
+            t.join(timeout=5)
+
+    def _spawn(self, target, name: str):
+        t = threading.Thread(target=target, name=name, daemon=True)
+        t.start()
+        self._threads.append(t)
+
+    def _poll_loop(self):
+        snapshot = _walk(self.root)
+        while not self._stop.wait(WATCH_POLL_INTERVAL):
+            current = _walk(self.root)
+            for path, st in current.items():
+                if snapshot.get(path) != st:
+                    self.debouncer.touch(path)
+            for path in snapshot.keys() - current.keys():
+                self.debouncer.touch(path)
+            snapshot = current
+
+    def _dispatch_loop(self):
+        tick = max(0.1, min(WATCH_DEBOUNCE_SECONDS, WATCH_STABLE_SECONDS, 1.0) / 2)
+        while not self._stop.wait(tick):
+            paths = self.debouncer.ready(WATCH_BATCH_MAX)
+            if paths:
+                self._dispatch(paths)
+
+    def _dispatch(self, paths: List[str]):
+        log.info(f"Watcher: ingesting {len(paths)} changed path(s)")
+        try:
+            result = self.handler([Path(p) for p in paths]) or {}
+        except Exception:
+            log.exception("Watcher batch failed")
+            self.stats["errors"] += 1
+            return
+        if result.get("status") == "locked":
+            # another ingest holds the lock; retry these once it is done
+            for p in paths:
+                self.debouncer.touch(p)
+            self.stats["requeued"] += len(paths)
+            return
+        # files another run was ingesting are looked at again once it is done
+        busy = [r["path"] for r in (result.get("results") or {}).get("busy", [])]
+        for p in busy:
+            self.debouncer.touch(p)
+        self.stats["requeued"] += len(busy)
+        self.stats["batches"] += 1
+        self.stats["paths"] += len(paths)
+        self.stats["last_batch_at"] = time.time()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"backend": self.backend, "root": self.root, "pending": self.debouncer.pending(), **self.stats}
+
+_watcher: Optional[FileWatcher] = None
+
+def start_watcher(root: Path, handler: Callable[[List[Path]], Dict[str, Any]]) -> FileWatcher:
+    global _watcher
+    _watcher = FileWatcher(root, handler)
+    _watcher.start()
+    return _watcher
+
+def stop_watcher():
+    global _watcher
+    if _watcher:
+        _watcher.stop()
+        _watcher = None
+        log.info("Watcher stopped")
+
+def watcher_stats() -> Optional[Dict[str, Any]]:
+    return _watcher.snapshot() if _watcher else None
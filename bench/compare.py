@@ -0,0 +1,67 @@
+"""
+Compare two bench.run reports and flag regressions.
+
+    python -m bench.compare baseline.json candidate.json --threshold 0.10
+
+Throughput metrics (*_per_sec) regress when they drop, time and memory metrics
+(*_s, peak RSS) when they grow, by more than the threshold. Exits with 1 when
+any metric regressed.
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Dict, Iterator, Tuple
+
+def _flatten(obj, prefix: str = "") -> Iterator[Tuple[str, float]]:
+    if isinstance(obj, dict):
+        for k, v in obj.items():
+            yield from _flatten(v, f"{prefix}.{k}" if prefix else k)
+    elif isinstance(obj, (int, float)) and not isinstance(obj, bool):
+        yield prefix, float(obj)
+
+def _direction(key: str) -> int:
+    """
+    +1 if higher is better, -1 if lower is better, 0 if not compared.
+    """
+    leaf = key.rsplit(".", 1)[-1]
+    if leaf.endswith("_per_sec"):
+        return 1
+    if key.startswith("peak_rss_mb") or leaf in ("elapsed_s", "min_s", "median_s", "mean_s", "p50", "p95", "max"):
+        return -1
+    return 0
+
+def compare(base: Dict, cand: Dict, threshold: float):
+    a = dict(_flatten({"results": base.get("results", {}), "stages": base.get("stages", {}),
+                       "peak_rss_mb": base.get("peak_rss_mb", {})}))
+    b = dict(_flatten({"results": cand.get("results", {}), "stages": cand.get("stages", {}),
+                       "peak_rss_mb": cand.get("peak_rss_mb", {})}))
+    rows = []
+    for key in sorted(a.keys() & b.keys()):
+        direction = _direction(key)
+        if not direction or not a[key]:
+            continue
+        change = (b[key] - a[key]) / abs(a[key])
+        regressed = change * direction < -threshold
+        rows.append((key, a[key], b[key], change, regressed))
+    return rows
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Compare two benchmark reports")
+    parser.add_argument("baseline", type=Path)
+    parser.add_argument("candidate", type=Path)
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative change tolerated (default 10%%)")
+    parser.add_argument("--json", action="store_true", help="print the comparison as JSON")
+    args = parser.parse_args(argv)
+
+    rows = compare(json.loads(args.baseline.read_text()), json.loads(args.candidate.read_text()), args.threshold)
+    if args.json:
+        print(json.dumps([{"metric": k, "baseline": a, "candidate": b, "change": round(c, 4), "regressed": r}
+                          for k, a, b, c, r in rows], indent=2))
+    else:
+        for key, a, b, change, regressed in rows:
+            print(f"{'REGRESSED ' if regressed else '          '}{key:70s} {a:14.4f} -> {b:14.4f} ({change:+.1%})")
+    return 1 if any(r[4] for r in rows) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
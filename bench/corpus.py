@@ -0,0 +1,78 @@
+"""
+Synthetic Spanish legal corpus: deterministic for a given seed, with the
+structure the cleaner and chunker see in production (titles, numbered
+articles, long sentences, citations, stray URLs and blank-line runs).
+"""
+import argparse
+import random
+from pathlib import Path
+from typing import List
+
+SUBJECTS = [
+    "el arrendatario", "la parte demandada", "el juzgado de primera instancia", "la administración pública",
+    "el contratista", "la sociedad mercantil", "el órgano de contratación", "la persona interesada",
+    "el tribunal superior de justicia", "el ministerio fiscal", "la comunidad de propietarios", "el trabajador",
+]
+VERBS = [
+    "deberá notificar", "podrá interponer", "estará obligado a presentar", "tendrá derecho a reclamar",
+    "acreditará", "resolverá sobre", "quedará exento de", "deberá abonar", "podrá solicitar la suspensión de",
+]
+OBJECTS = [
+    "el recurso de apelación", "la indemnización correspondiente", "los daños y perjuicios ocasionados",
+    "la documentación justificativa", "el plazo de prescripción", "las costas procesales",
+    "la resolución del contrato", "la fianza depositada", "el expediente sancionador", "los intereses de demora",
+]
+TAILS = [
+    "en el plazo de quince días hábiles", "conforme a lo dispuesto en el artículo {n} de la Ley {l}/{y}",
+    "sin perjuicio de las acciones civiles que procedan", "de acuerdo con la jurisprudencia del Tribunal Supremo",
+    "salvo pacto en contrario entre las partes", "a contar desde el día siguiente a su notificación",
+    "según consta en la sentencia de {d} de {m} de {y}", "véase https://www.boe.es/buscar/act.php?id=BOE-A-{y}-{n}",
+]
+MONTHS = ["enero", "febrero", "marzo", "abril", "mayo", "junio", "julio", "agosto",
+          "septiembre", "octubre", "noviembre", "diciembre"]
+
+def sentence(rng: random.Random) -> str:
+    tail = rng.choice(TAILS).format(n=rng.randint(1, 400), l=rng.randint(1, 60), y=rng.randint(1978, 2024),
+                                    d=rng.randint(1, 28), m=rng.choice(MONTHS))
+    s = f"{rng.choice(SUBJECTS)} {rng.choice(VERBS)} {rng.choice(OBJECTS)} {tail}"
+    return s[0].upper() + s[1:] + "."
+
+def document(rng: random.Random, target_chars: int) -> str:
+    parts: List[str] = [f"LEY {rng.randint(1, 60)}/{rng.randint(1978, 2024)}, DE {rng.randint(1, 28)} DE "
+                        f"{rng.choice(MONTHS).upper()}\n\n"]
+    size, article = len(parts[0]), 1
+    while size < target_chars:
+        para = f"Artículo {article}.- " + " ".join(sentence(rng) for _ in range(rng.randint(3, 9)))
+        para += "\n" * rng.choice((1, 2, 2, 3, 4))
+        parts.append(para)
+        size += len(para)
+        article += 1
+    return "".join(parts)
+
+def generate(out_dir: Path, files: int, min_chars: int, max_chars: int, seed: int = 42, salt: str = "") -> List[Path]:
+    """
+    Write `files` documents of min_chars..max_chars characters to out_dir.
+    A non-empty salt is appended to each document so its hash is new while the
+    chunks stay the same as for other salts.
+    """
+    out_dir.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(seed)
+    paths = []
+    for i in range(files):
+        text = document(rng, rng.randint(min_chars, max_chars))
+        if salt:
+            text += f"\n\nRef. {salt}-{i}\n"
+        path = out_dir / f"doc_{i:05d}.txt"
+        path.write_text(text, encoding="utf-8")
+        paths.append(path)
+    return paths
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic Spanish legal corpus")
+    parser.add_argument("out_dir", type=Path)
+    parser.add_argument("--files", type=int, default=100)
+    parser.add_argument("--min-chars", type=int, default=5000)
+    parser.add_argument("--max-chars", type=int, default=50000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    generate(args.out_dir, args.files, args.min_chars, args.max_chars, args.seed)
@@ -0,0 +1,202 @@
+"""
+Local stand-ins for Tika, Ollama and Qdrant on one port, with configurable
+latency and error injection. Runs in its own process so its CPU does not
+compete with the code under test.
+
+    PUT  /tika                                   echoes the body as text/plain
+    POST /api/embed                              deterministic vectors per input
+    POST /api/show                               context length of every model
+    GET  /api/tags                               lists every model
+    PUT  /collections/{c}                        create collection
+    PUT  /collections/{c}/index                  create payload index
+    PUT  /collections/{c}/points                 upsert (counts points)
+    POST /collections/{c}/points/scroll          no points
+    POST /collections/{c}/points/delete          ok
+    GET  /_stats                                 request/point counters
+"""
+import argparse
+import json
+import multiprocessing
+import random
+import threading
+import time
+import zlib
+from dataclasses import dataclass, asdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+@dataclass
+class FakeConfig:
+    port: int = 0
+    dim: int = 768
+    tika_latency: float = 0.0           # seconds per request
+    tika_latency_per_mb: float = 0.0    # extra seconds per MB uploaded
+    embed_latency: float = 0.0          # seconds per request
+    embed_latency_per_input: float = 0.0
+    qdrant_latency: float = 0.0
+    error_rate: float = 0.0             # fraction of requests answered with 503
+    seed: int = 0
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "_Server"
+
+    def log_message(self, *args):
+        pass
+
+    def _body(self) -> bytes:
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            parts = []
+            while True:
+                size = int(self.rfile.readline().split(b";")[0].strip() or b"0", 16)
+                if size == 0:
+                    self.rfile.readline()
+                    break
+                parts.append(self.rfile.read(size))
+                self.rfile.readline()
+            return b"".join(parts)
+        return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+    def _send(self, status: int, body: bytes, content_type: str = "application/json"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _json(self, obj, status: int = 200):
+        self._send(status, json.dumps(obj).encode())
+
+    def _fail(self) -> bool:
+        cfg = self.server.cfg
+        if cfg.error_rate and self.server.rng.random() < cfg.error_rate:
+            self.server.count("errors_injected")
+            self._json({"error": "injected"}, 503)
+            return True
+        return False
+
+    def do_GET(self):
+        if self.path.startswith("/_stats"):
+            return self._json(self.server.snapshot())
+        if self.path.startswith("/api/tags"):
+            return self._json({"models": [{"name": "bench"}]})
+        if self.path.startswith("/tika"):
+            return self._send(200, b"fake tika", "text/plain")
+        self._json({"result": {"status": "green"}, "status": "ok"})
+
+    def do_PUT(self):
+        body = self._body()
+        cfg = self.server.cfg
+        if self.path.startswith("/tika"):
+            self.server.count("tika_requests")
+            time.sleep(cfg.tika_latency + cfg.tika_latency_per_mb * len(body) / 1e6)
+            if self._fail():
+                return
+            return self._send(200, body, "text/plain; charset=UTF-8")
+        if "/points" in self.path:
+            self.server.count("qdrant_requests")
+            time.sleep(cfg.qdrant_latency)
+            if self._fail():
+                return
+            self.server.count("points", body.count(b'"id"'))
+            return self._json({"result": {"operation_id": 0, "status": "completed"}, "status": "ok"})
+        self._json({"result": True, "status": "ok"})
+
+    def do_POST(self):
+        body = self._body()
+        cfg = self.server.cfg
+        if self.path.startswith("/api/embed"):
+            inputs = json.loads(body or b"{}").get("input") or []
+            if isinstance(inputs, str):
+                inputs = [inputs]
+            self.server.count("embed_requests")
+            self.server.count("embed_inputs", len(inputs))
+            time.sleep(cfg.embed_latency + cfg.embed_latency_per_input * len(inputs))
+            if self._fail():
+                return
+            return self._json({"model": "bench", "embeddings": [self.server.vector(t) for t in inputs],
+                               "prompt_eval_count": sum(len(t) // 4 + 2 for t in inputs)})
+        if self.path.startswith("/api/show"):
+            return self._json({"parameters": "", "model_info": {"bench.context_length": 2048}})
+        if self.path.endswith("/points/scroll"):
+            return self._json({"result": {"points": [], "next_page_offset": None}, "status": "ok"})
+        if self.path.endswith("/points/delete"):
+            self.server.count("qdrant_deletes")
+            return self._json({"result": {"operation_id": 0, "status": "completed"}, "status": "ok"})
+        self._json({"status": "ok"})
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, cfg: FakeConfig):
+        super().__init__(("127.0.0.1", cfg.port), _Handler)
+        self.cfg = cfg
+        self.rng = random.Random(cfg.seed)
+        self._lock = threading.Lock()
+        self._stats: Dict[str, int] = {}
+
+    def count(self, key: str, n: int = 1):
+        with self._lock:
+            self._stats[key] = self._stats.get(key, 0) + n
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats)
+
+    def vector(self, text: str):
+        # cheap and deterministic; values only need to be stable, not meaningful
+        h = zlib.crc32(text.encode("utf-8"))
+        return [((h >> (i % 24)) & 0xff) / 255.0 for i in range(self.cfg.dim)]
+
+def _serve(cfg: FakeConfig, ready):
+    server = _Server(cfg)
+    ready.put(server.server_address[1])
+    server.serve_forever()
+
+class FakeServers:
+    """
+    Start the fake backends in a child process; use as a context manager.
+    """
+
+    def __init__(self, cfg: Optional[FakeConfig] = None):
+        self.cfg = cfg or FakeConfig()
+        self.port: Optional[int] = None
+        self._proc: Optional[multiprocessing.Process] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self) -> "FakeServers":
+        ctx = multiprocessing.get_context("spawn")
+        ready = ctx.Queue()
+        self._proc = ctx.Process(target=_serve, args=(self.cfg, ready), daemon=True)
+        self._proc.start()
+        self.port = ready.get(timeout=30)
+        return self
+
+    def stop(self):
+        if self._proc is not None:
+            self._proc.terminate()
+            self._proc.join(timeout=5)
+            self._proc = None
+
+    def stats(self) -> Dict[str, int]:
+        import requests
+        return requests.get(f"{self.url}/_stats", timeout=5).json()
+
+    def __enter__(self) -> "FakeServers":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the fake Tika/Ollama/Qdrant backends")
+    for field, value in asdict(FakeConfig()).items():
+        parser.add_argument(f"--{field.replace('_', '-')}", type=type(value), default=value)
+    args = parser.parse_args()
+    cfg = FakeConfig(**vars(args))
+    server = _Server(cfg)
+    print(f"Fake backends listening on http://127.0.0.1:{server.server_address[1]}", flush=True)
+    server.serve_forever()
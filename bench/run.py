@@ -0,0 +1,289 @@
+"""
+Benchmark harness for the ingest hot path, fully offline.
+
+    python -m bench.run micro
+    python -m bench.run ingest --files 200 --embed-latency 0.02 --set PIPELINE_ENABLED=true
+    python -m bench.run all --out results.json
+
+micro    clean_text and chunk_text on the synthetic corpus (needs the NLTK data).
+ingest   process_all (or aprocess_all with --async) over the corpus.
+file     process_file on each file, with per-file latency percentiles.
+
+Tika, Ollama and Qdrant are replaced by bench.fake_servers with the given
+latency and error rate. ingest and file need a real Postgres (POSTGRES_DSN);
+rows for the corpus are deleted afterwards. The run writes one JSON document
+(to --out or stdout) that bench.compare can diff against another run.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List
+
+from .corpus import generate
+from .fake_servers import FakeConfig, FakeServers
+
+def _configure_env(args, fake_url: str, corpus_dir: Path, collection: str):
+    """
+    The service reads its configuration at import time, so this must run before
+    any app module is imported.
+    """
+    os.environ.update({
+        "TIKA_URL": f"{fake_url}/tika",
+        "OLLAMA_URL": fake_url,
+        "QDRANT_URL": fake_url,
+        "QDRANT_COLLECTION": collection,
+        "UPLOADS_DIR": str(corpus_dir),
+        "METRICS_ENABLED": "true",
+        "EMBED_CACHE_ENABLED": "true" if args.embed_cache else "false",
+        # the corpus is plain text: keep it going through the (fake) Tika, uncached
+        "LOCAL_EXTRACT_ENABLED": "false",
+        "EXTRACT_CACHE_ENABLED": "false",
+    })
+    for item in args.set:
+        key, _, value = item.partition("=")
+        os.environ[key] = value
+
+def _peak_rss_mb() -> Dict[str, float]:
+    # ru_maxrss is in KiB on Linux
+    return {
+        "self": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "children": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1),
+    }
+
+def _git_rev() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=Path(__file__).resolve().parent, timeout=5).stdout.strip()
+    except Exception:
+        return ""
+
+def _histograms() -> Dict[str, Dict[str, Dict[str, float]]]:
+    """
+    count/sum/mean of every ingest_* histogram, by label value.
+    """
+    from app import metrics
+    if not metrics.ENABLED:
+        return {}
+    out: Dict[str, Dict[str, Dict[str, float]]] = {}
+    for family in metrics.prometheus_client.REGISTRY.collect():
+        if family.type != "histogram" or not family.name.startswith("ingest_"):
+            continue
+        for sample in family.samples:
+            if not sample.name.endswith(("_sum", "_count")):
+                continue
+            label = next(iter(sample.labels.values()), "all")
+            entry = out.setdefault(family.name, {}).setdefault(label, {})
+            entry["count" if sample.name.endswith("_count") else "sum_s"] = sample.value
+    for family in out.values():
+        for entry in family.values():
+            entry["sum_s"] = round(entry.get("sum_s", 0.0), 4)
+            entry["mean_s"] = round(entry["sum_s"] / entry["count"], 6) if entry.get("count") else 0.0
+    return out
+
+def _counters() -> Dict[str, Dict[str, float]]:
+    from app import metrics
+    if not metrics.ENABLED:
+        return {}
+    out: Dict[str, Dict[str, float]] = {}
+    for family in metrics.prometheus_client.REGISTRY.collect():
+        if family.type != "counter" or not family.name.startswith("ingest_"):
+            continue
+        for sample in family.samples:
+            if sample.name.endswith("_total"):
+                out.setdefault(family.name, {})[next(iter(sample.labels.values()), "all")] = sample.value
+    return out
+
+def _timeit(func, repeat: int) -> Dict[str, float]:
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - t0)
+    return {"min_s": round(min(times), 6), "median_s": round(statistics.median(times), 6)}
+
+def bench_micro(files: List[Path], repeat: int) -> Dict[str, Any]:
+    from app.chunker import chunk_text
+    from app.cleaner import clean_text
+    from app.config import CHUNK_MAX_CHARS, CHUNK_OVERLAP
+
+    texts = [p.read_text(encoding="utf-8") for p in files]
+    chars = sum(len(t) for t in texts)
+    out: Dict[str, Any] = {"documents": len(texts), "chars": chars}
+
+    r = _timeit(lambda: [chunk_text(t, CHUNK_MAX_CHARS, CHUNK_OVERLAP) for t in texts], repeat)
+    r["chars_per_sec"] = round(chars / r["min_s"]) if r["min_s"] else None
+    r["chunks"] = sum(len(chunk_text(t, CHUNK_MAX_CHARS, CHUNK_OVERLAP)) for t in texts)
+    out["chunk_text"] = r
+
+    try:
+        clean_text(texts[0][:1000])  # loads NLTK data outside the timed runs
+        r = _timeit(lambda: [clean_text(t) for t in texts], repeat)
+        r["chars_per_sec"] = round(chars / r["min_s"]) if r["min_s"] else None
+        out["clean_text"] = r
+    except LookupError as e:
+        out["clean_text"] = {"error": str(e)}
+    return out
+
+def _summarize(results: Dict[str, list], elapsed: float, corpus_bytes: int) -> Dict[str, Any]:
+    processed = results.get("processed", [])
+    chunks = sum(r.get("points", 0) for r in processed)
+    done = len(processed) + len(results.get("skipped", []))
+    return {
+        "elapsed_s": round(elapsed, 4),
+        "files": {"processed": len(processed), "skipped": len(results.get("skipped", [])),
+                  "errors": len(results.get("errors", []))},
+        "chunks": chunks,
+        "files_per_sec": round(done / elapsed, 3) if elapsed else None,
+        "chunks_per_sec": round(chunks / elapsed, 3) if elapsed else None,
+        "mb_per_sec": round(corpus_bytes / 1e6 / elapsed, 3) if elapsed else None,
+        "errors": [r.get("error") for r in results.get("errors", [])][:10],
+    }
+
+def bench_ingest(corpus_dir: Path, corpus_bytes: int, use_async: bool) -> Dict[str, Any]:
+    from app.config import OLLAMA_EMBED_MODEL
+    from app.db import migrate_db
+    from app.jobs import Job
+    from app.processor import process_all, aprocess_all
+
+    migrate_db()
+    job = Job("bench", OLLAMA_EMBED_MODEL)
+    job.status, job.started_at = "running", time.time()
+    t0 = time.perf_counter()
+    if use_async:
+        results = asyncio.run(aprocess_all(corpus_dir, tracker=job))
+    else:
+        results = process_all(corpus_dir, tracker=job)
+    elapsed = time.perf_counter() - t0
+    job.status, job.finished_at = "finished", time.time()
+    out = _summarize(results, elapsed, corpus_bytes)
+    out["mode"] = "async" if use_async else "sync"
+    # summed time files spent in each stage, from the job tracker
+    out["job_stage_seconds"] = job.snapshot()["stage_seconds"]
+    return out
+
+def bench_files(files: List[Path], corpus_bytes: int) -> Dict[str, Any]:
+    from app.db import migrate_db
+    from app.processor import process_file
+
+    migrate_db()
+    results: Dict[str, list] = {"processed": [], "skipped": []}
+    latencies = []
+    t0 = time.perf_counter()
+    for f in files:
+        t = time.perf_counter()
+        try:
+            r = process_file(f)
+            results["skipped" if r.get("skipped") else "processed"].append(r)
+        except Exception as e:
+            results.setdefault("errors", []).append({"path": str(f), "error": str(e)})
+        latencies.append(time.perf_counter() - t)
+    out = _summarize(results, time.perf_counter() - t0, corpus_bytes)
+    latencies.sort()
+    pick = lambda q: round(latencies[min(len(latencies) - 1, int(q * len(latencies)))], 4)
+    out["latency_s"] = {"p50": pick(0.5), "p95": pick(0.95), "max": round(latencies[-1], 4)}
+    return out
+
+def _cleanup_db(corpus_dir: Path):
+    from app.db import db_conn
+    prefix = str(corpus_dir).rstrip("/") + "/"
+    with db_conn() as conn:
+        cur = conn.cursor()
+        for table in ("processed_files", "scan_manifest", "source_files", "ingest_progress", "ingest_queue"):
+            cur.execute(f"DELETE FROM {table} WHERE starts_with(file_path, %s);", (prefix,))
+        cur.close()
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("mode", choices=["micro", "ingest", "file", "all"])
+    parser.add_argument("--files", type=int, default=50)
+    parser.add_argument("--min-chars", type=int, default=5000)
+    parser.add_argument("--max-chars", type=int, default=50000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--corpus", type=Path, help="use this directory instead of generating a corpus")
+    parser.add_argument("--repeat", type=int, default=3, help="repetitions of each micro-benchmark")
+    parser.add_argument("--async", dest="use_async", action="store_true", help="ingest with aprocess_all")
+    parser.add_argument("--embed-cache", action="store_true", help="keep the embedding cache enabled")
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--tika-latency", type=float, default=0.0)
+    parser.add_argument("--tika-latency-per-mb", type=float, default=0.0)
+    parser.add_argument("--embed-latency", type=float, default=0.0)
+    parser.add_argument("--embed-latency-per-input", type=float, default=0.0)
+    parser.add_argument("--qdrant-latency", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE",
+                        help="service setting to override, e.g. PIPELINE_ENABLED=true (repeatable)")
+    parser.add_argument("--out", type=Path, help="write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    run_id = uuid.uuid4().hex[:8]
+    tmp = None
+    if args.corpus:
+        corpus_dir = args.corpus.resolve()
+        files = sorted(p for p in corpus_dir.rglob("*") if p.is_file())
+    else:
+        tmp = Path(tempfile.mkdtemp(prefix="ingest-bench-"))
+        corpus_dir = tmp / "corpus"
+        # salted per run so documents are new to processed_files every time
+        files = generate(corpus_dir, args.files, args.min_chars, args.max_chars, args.seed, salt=run_id)
+    corpus_bytes = sum(p.stat().st_size for p in files)
+
+    fake_cfg = FakeConfig(dim=args.dim, tika_latency=args.tika_latency, tika_latency_per_mb=args.tika_latency_per_mb,
+                          embed_latency=args.embed_latency, embed_latency_per_input=args.embed_latency_per_input,
+                          qdrant_latency=args.qdrant_latency, error_rate=args.error_rate, seed=args.seed)
+    report: Dict[str, Any] = {
+        "schema": 1,
+        "run_id": run_id,
+        "timestamp": time.time(),
+        "git_rev": _git_rev(),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "args": {k: (str(v) if isinstance(v, Path) else v) for k, v in vars(args).items()},
+        "corpus": {"files": len(files), "bytes": corpus_bytes},
+        "results": {},
+    }
+    servers = FakeServers(fake_cfg)
+    try:
+        servers.start()
+        _configure_env(args, servers.url, corpus_dir, f"bench_{run_id}")
+        if args.mode in ("micro", "all"):
+            report["results"]["micro"] = bench_micro(files, args.repeat)
+        if args.mode in ("ingest", "all"):
+            report["results"]["ingest"] = bench_ingest(corpus_dir, corpus_bytes, args.use_async)
+            _cleanup_db(corpus_dir)
+        if args.mode in ("file", "all"):
+            report["results"]["file"] = bench_files(files, corpus_bytes)
+            _cleanup_db(corpus_dir)
+        report["stages"] = _histograms()
+        report["counters"] = _counters()
+        report["backends"] = servers.stats()
+    finally:
+        servers.stop()
+        try:
+            from app.cpu_pool import shutdown_pool
+            shutdown_pool()
+        except Exception:
+            pass
+        if tmp is not None:
+            shutil.rmtree(tmp, ignore_errors=True)
+    report["peak_rss_mb"] = _peak_rss_mb()
+
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.out:
+        args.out.write_text(text + "\n")
+    else:
+        print(text)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,83 @@
 CREATE TABLE IF NOT EXISTS processed_files (
   id SERIAL PRIMARY KEY,
   file_path TEXT,
-  source_hash TEXT UNIQUE,
+  source_hash TEXT,
   collection TEXT,
+  embed_model TEXT,
   points_count INTEGER,
-  processed_at TIMESTAMP DEFAULT NOW()
+  processed_at TIMESTAMP DEFAULT NOW(),
+  CONSTRAINT processed_files_target UNIQUE (source_hash, collection, embed_model)
 );
 
-CREATE UNIQUE INDEX IF NOT EXISTS processed_files_unique_hash ON processed_files (source_hash);
\ No newline at end of file
+-- one row per content and target (embed_model, collection); older tables were
+-- unique on source_hash alone. The app backfills rows without embed_model or
+-- collection with its configured defaults at startup
+ALTER TABLE processed_files ADD COLUMN IF NOT EXISTS embed_model TEXT;
+ALTER TABLE processed_files DROP CONSTRAINT IF EXISTS processed_files_source_hash_key;
+DROP INDEX IF EXISTS processed_files_unique_hash;
+CREATE UNIQUE INDEX IF NOT EXISTS processed_files_target ON processed_files (source_hash, collection, embed_model);
+
+CREATE TABLE IF NOT EXISTS scan_manifest (
+  file_path TEXT PRIMARY KEY,
+  size BIGINT NOT NULL,
+  mtime_ns BIGINT NOT NULL,
+  source_hash TEXT NOT NULL,
+  scanned_at TIMESTAMP DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS ingest_progress (
+  source_hash TEXT NOT NULL,
+  collection TEXT NOT NULL,
+  embed_model TEXT NOT NULL,
+  file_path TEXT,
+  committed_chunks INTEGER NOT NULL,
+  total_chunks INTEGER NOT NULL,
+  updated_at TIMESTAMP DEFAULT NOW(),
+  PRIMARY KEY (source_hash, collection, embed_model)
+);
+
+CREATE TABLE IF NOT EXISTS embedding_cache (
+  model TEXT NOT NULL,
+  chunk_hash TEXT NOT NULL,
+  dim INTEGER NOT NULL,
+  vector BYTEA NOT NULL,
+  created_at TIMESTAMP DEFAULT NOW(),
+  last_used_at TIMESTAMP DEFAULT NOW(),
+  PRIMARY KEY (model, chunk_hash)
+);
+
+CREATE INDEX IF NOT EXISTS embedding_cache_last_used ON embedding_cache (last_used_at);
+
+CREATE TABLE IF NOT EXISTS source_files (
+  file_path TEXT NOT NULL,
+  collection TEXT NOT NULL,
+  source_hash TEXT NOT NULL,
+  updated_at TIMESTAMP DEFAULT NOW(),
+  deleted_at TIMESTAMP,
+  PRIMARY KEY (file_path, collection)
+);
+CREATE TABLE IF NOT EXISTS ingest_queue (
+  id BIGSERIAL PRIMARY KEY,
+  file_path TEXT NOT NULL,
+  collection TEXT NOT NULL,
+  embed_model TEXT NOT NULL,
+  job_id TEXT,
+  priority INTEGER NOT NULL DEFAULT 0,
+  status TEXT NOT NULL DEFAULT 'queued',
+  attempts INTEGER NOT NULL DEFAULT 0,
+  lease_owner TEXT,
+  lease_expires_at TIMESTAMP,
+  available_at TIMESTAMP NOT NULL DEFAULT NOW(),
+  last_error TEXT,
+  enqueued_at TIMESTAMP DEFAULT NOW(),
+  started_at TIMESTAMP,
+  finished_at TIMESTAMP
+);
+ALTER TABLE ingest_queue ADD COLUMN IF NOT EXISTS job_id TEXT;
+ALTER TABLE ingest_queue ADD COLUMN IF NOT EXISTS priority INTEGER NOT NULL DEFAULT 0;
+CREATE UNIQUE INDEX IF NOT EXISTS ingest_queue_one_queued
+  ON ingest_queue (file_path, collection, embed_model) WHERE status = 'queued';
+CREATE INDEX IF NOT EXISTS ingest_queue_claimable ON ingest_queue (status, available_at);
+CREATE INDEX IF NOT EXISTS ingest_queue_job ON ingest_queue (job_id);
+CREATE INDEX IF NOT EXISTS ingest_queue_priority
+  ON ingest_queue (priority DESC, available_at, id) WHERE status = 'queued';
@@ -0,0 +1,65 @@
+import random
+from typing import List
+import pytest
+from app.chunker import chunk_text, iter_chunks, normalize_text
+
+# Copy of the original chunker: chunk_text must keep producing exactly these
+# chunks, or every existing collection would be re-chunked on its next ingest.
+
+def _baseline_find_safe_break(s: str, start: int, end: int, max_chars: int) -> int:
+    slice_ = s[start:end]
+    idx = max(
+        slice_.rfind(". "),
+        slice_.rfind("? "),
+        slice_.rfind("! "),
+        slice_.rfind("\n\n"),
+    )
+    if idx > int(max_chars * 0.3):
+        return start + idx + 1
+    return end
+
+def _baseline_chunk_text(raw: str, max_chars: int, overlap: int) -> List[str]:
+    text = raw.replace("\r\n", "\n")
+    while "\n\n\n" in text:
+        text = text.replace("\n\n\n", "\n\n")
+    text = text.strip()
+    if not text:
+        return []
+    chunks: List[str] = []
+    start = 0
+    L = len(text)
+    while start < L:
+        end = min(start + max_chars, L)
+        if end < L:
+            end = _baseline_find_safe_break(text, start, end, max_chars)
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+        start = max(0, end - overlap)
+        if end == L:
+            break
+    return chunks
+
+_PIECES = ["ley", "artículo", "señor", "a", "bb", " ", "  ", "\t", ". ", "? ", "! ", ".", "\n",
+           "\n\n", "\n\n\n", "\n\n\n\n\n", "\r\n", "\r\n\r\n\r\n", " \n \n\n"]
+
+def _random_text(rng: random.Random) -> str:
+    return "".join(rng.choice(_PIECES) for _ in range(rng.randint(0, 300)))
+
+@pytest.mark.parametrize("seed", range(20))
+def test_chunk_text_matches_baseline(seed):
+    rng = random.Random(seed)
+    for _ in range(200):
+        raw = _random_text(rng)
+        max_chars = rng.randint(1, 200)
+        overlap = rng.randint(0, int(max_chars * 0.3))
+        assert chunk_text(raw, max_chars, overlap) == _baseline_chunk_text(raw, max_chars, overlap)
+
+def test_iter_chunks_offsets_point_into_normalized_text():
+    rng = random.Random(1234)
+    for _ in range(500):
+        raw = _random_text(rng)
+        max_chars = rng.randint(1, 200)
+        text = normalize_text(raw)
+        for offset, chunk in iter_chunks(raw, max_chars, rng.randint(0, int(max_chars * 0.3))):
+            assert text[offset:offset + len(chunk)] == chunk
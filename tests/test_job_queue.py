@@ -0,0 +1,63 @@
+import os
+import uuid
+import pytest
+import app.db as db
+import app.job_queue as jq
+
+def test_work_loop_survives_failing_queue_update(monkeypatch):
+    item = (1, "/uploads/a.txt", "m", "c", 1, 0)
+    claims = []
+    worker = jq.QueueWorker(workers=0, interactive_workers=0)
+
+    def claim(*args):
+        claims.append(args)
+        if len(claims) >= 3:
+            worker._stop.set()
+            return []
+        return [item]
+
+    def fail(*args):
+        raise RuntimeError("unique violation")
+
+    monkeypatch.setattr(jq, "claim_queue_items", claim)
+    monkeypatch.setattr(jq, "process_paths", lambda paths, **kw: {"errors": [{"path": item[1], "error": "boom"}]})
+    monkeypatch.setattr(jq, "fail_queue_item", fail)
+    worker._work_loop()
+    # the first failure did not end the loop: the second batch was claimed too
+    assert len(claims) == 3
+    assert worker.stats["claimed"] == 2
+    assert worker._held == {}
+
+@pytest.fixture
+def pg(monkeypatch):
+    dsn = os.getenv("INGEST_TEST_POSTGRES_DSN")
+    if not dsn:
+        pytest.skip("INGEST_TEST_POSTGRES_DSN is not set")
+    monkeypatch.setattr(db, "POSTGRES_DSN", dsn)
+    monkeypatch.setattr(db, "_pool", None)
+    db.migrate_db()
+    yield
+    db.close_pool()
+
+def _rows(path):
+    with db.db_conn() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT status FROM ingest_queue WHERE file_path = %s ORDER BY id;", (path,))
+        rows = [r[0] for r in cur.fetchall()]
+        cur.close()
+    return rows
+
+def test_fail_after_reenqueue_while_running(pg):
+    path, priority = f"/uploads/{uuid.uuid4().hex}.txt", 1000
+    try:
+        assert db.enqueue_files([path], "c", "m", priority=priority) == 1
+        [(item_id, *_)] = db.claim_queue_items("w1", 10, 60, 5, min_priority=priority)
+        # changed again while running: a second, queued entry
+        assert db.enqueue_files([path], "c", "m", priority=priority) == 1
+        db.fail_queue_item(item_id, "w1", "boom", 5, 0)
+        assert _rows(path) == ["queued"]
+    finally:
+        with db.db_conn() as conn:
+            cur = conn.cursor()
+            cur.execute("DELETE FROM ingest_queue WHERE file_path = %s;", (path,))
+            cur.close()